@@ -10,6 +10,7 @@
 """
 
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -17,22 +18,29 @@ import os
 from werkzeug.security import generate_password_hash
 from dotenv import load_dotenv
 from flask_jwt_extended import JWTManager
-from datetime import timedelta
-from flask_session import Session
+from datetime import date, datetime, time, timedelta
 
 db = SQLAlchemy()
 jwt = JWTManager()
 
-def create_app():
+# serialize DATE and TIME columns in the same 'YYYY-MM-DD' and 'HH:MM' formats the frontend sends
+class SchedulerJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, time):
+            return o.strftime('%H:%M')
+        if isinstance(o, date) and not isinstance(o, datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+def create_app(config=None):
     app = Flask(__name__)
+    app.json = SchedulerJSONProvider(app)
 
     # Allow requests from localhost (React app during development)
     CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}})
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
-    app.config['SESSION_TYPE'] = 'filesystem'  # Store sessions in the filesystem
 
-    Session(app)
-    
     from .auth import auth
     from .admin import admin
     from .student import student
@@ -42,6 +50,13 @@ def create_app():
     from .models import User
     from .user import user
     from .outlook import outlook_calendar_dp
+    from .outbox import outbox_cli
+    from .calendar_jobs import calendar_cli
+    from .open_slots import open_slots_cli
+    from .availability_rules import availability_rules_cli
+    from .perf import perf_cli
+    from .sessions import init_sessions
+    from .instrumentation import init_instrumentation
     
     ##create MySQL database##    
     load_dotenv()
@@ -54,11 +69,31 @@ def create_app():
     app.config["JWT_TOKEN_LOCATION"] = ["cookies"]
     app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=3)
+
+    # compute unbooked appointment slots instead of storing them (see slots.py)
+    app.config['VIRTUAL_APPOINTMENT_SLOTS'] = os.environ.get('VIRTUAL_APPOINTMENT_SLOTS', 'false').lower() == 'true'
+
+    # days ahead that recurring availability rules are stored as availabilities (see availability_rules.py)
+    app.config['AVAILABILITY_RULE_HORIZON_DAYS'] = int(os.environ.get('AVAILABILITY_RULE_HORIZON_DAYS', '28'))
+
+    # server-side session store: 'sqlalchemy' (shared by all workers) or 'memory' (in-process LRU)
+    app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlalchemy')
+
+    # per-request timings (Server-Timing header and log lines) and the slow statement log threshold
+    app.config['PERF_INSTRUMENTATION'] = os.environ.get('PERF_INSTRUMENTATION', 'true').lower() == 'true'
+    app.config['PERF_SLOW_QUERY_MS'] = float(os.environ.get('PERF_SLOW_QUERY_MS', '200'))
+
+    # apply overrides such as the testing database
+    if config is not None:
+        app.config.update(config)
+
     jwt.init_app(app)  # Initialize the JWTManager with the Flask app
     
     # Bind the SQLAlchemy instance to this Flask app
     db.init_app(app)
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, render_as_batch=True)
+    init_sessions(app)
+    init_instrumentation(app)
 
     # Register the Blueprint
     app.register_blueprint(auth, url_prefix='/')
@@ -69,6 +104,13 @@ def create_app():
     app.register_blueprint(feedback, url_prefix='/')
     app.register_blueprint(user, url_prefix='/')
     app.register_blueprint(outlook_calendar_dp, url_prefix='/api')
+
+    # background worker commands (flask --app main outbox work, flask --app main calendar work)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(calendar_cli)
+    app.cli.add_command(open_slots_cli)
+    app.cli.add_command(availability_rules_cli)
+    app.cli.add_command(perf_cli)
     
     with app.app_context():
         db.create_all()
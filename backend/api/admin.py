@@ -14,7 +14,11 @@ from .models import User, ProgramDetails, db
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, set_access_cookies, get_jwt
 from datetime import datetime, timedelta, timezone
 from . import db
-from .user import get_user_data
+from .user import get_user_data, get_user
+from .etag import bump_revision
+from .cache import get_metadata_cache, invalidate_metadata, PROGRAMS
+from .open_slots import refresh_program_open_slots
+from .programs import delete_program_rows, bump_program_courses
 
 admin = Blueprint('admin', __name__)
 allowed_account_types = ["admin", "instructor", "student"]
@@ -41,8 +45,8 @@ def refresh_expiring_jwts(response):
 
 # check if user_id is an admin
 def is_admin(user_id):
-    user = User.query.filter_by(id=user_id).first()
-    if user.account_type != 'admin':
+    user = get_user(user_id)
+    if not user or user.account_type != 'admin':
         return False
     return True
 
@@ -232,7 +236,9 @@ def create_program():
             duration=data.get('duration')
         )
         db.session.add(new_program)
+        bump_program_courses(new_program.course_id, new_program.instructor_id)
         db.session.commit()
+        invalidate_metadata(PROGRAMS)
         return jsonify({"msg": "Program created", "program": new_program.id}), 201
     except Exception as e:
         db.session.rollback()
@@ -251,7 +257,12 @@ def update_program(program_id):
     program.name = data.get('name', program.name)
     program.description = data.get('description', program.description)
     program.duration = data.get('duration', program.duration)
+    bump_revision(ProgramDetails, program.id)
+
+    # the listed slots carry the program's name and, for virtual slots, its duration
+    refresh_program_open_slots(program.id)
     db.session.commit()
+    invalidate_metadata(PROGRAMS)
     return jsonify({"msg": "Program updated"}), 200
 
 # delete the program using its ID
@@ -263,6 +274,19 @@ def delete_program(program_id):
         return jsonify({"msg": "Admin access required"}), 401
 
     program = ProgramDetails.query.get_or_404(program_id)
-    db.session.delete(program)
+
+    # the same delete as the instructor route, so no availability, slot or counter is left behind
+    delete_program_rows(program.id)
     db.session.commit()
-    return jsonify({"msg": "Program deleted"}), 200
\ No newline at end of file
+    invalidate_metadata(PROGRAMS)
+    return jsonify({"msg": "Program deleted"}), 200
+
+# hit/miss counters of the course and program metadata cache in this worker
+@admin.route('/admin/metadata-cache', methods=['GET'])
+@jwt_required()
+def get_metadata_cache_stats():
+    user_id = get_jwt_identity()
+    if not is_admin(user_id):
+        return jsonify({"msg": "Admin access required"}), 401
+
+    return jsonify(get_metadata_cache().stats()), 200
@@ -12,6 +12,7 @@
 
 from flask import Blueprint, request, jsonify
 from .models import User
+from .user import get_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 from email_validator import EmailNotValidError, validate_email
@@ -140,7 +141,7 @@ def logout():
 @jwt_required()
 def get_user_profile():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     
     if user:
         return jsonify({
@@ -0,0 +1,208 @@
+"""
+ * availability_rules.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the recurring availability of a program. An instructor posts a
+ * term range and exception dates once, and one AvailabilityRule (a weekly
+ * RRULE) is stored per ProgramTimes entry. Rules are expanded into
+ * Availability rows only up to AVAILABILITY_RULE_HORIZON_DAYS ahead;
+ * expanded_until records how far each rule has been stored. The reads that
+ * list availability extend only the rules of the programs they list as days
+ * pass, and flask availability-rules expand extends every rule.
+ *
+ * Known Bugs:
+ * - Deleting one expanded availability does not add its date to the rule's
+ *   exception dates, it is just not stored again.
+ *
+"""
+
+import click
+from functools import lru_cache
+from datetime import date, datetime, timedelta
+from dateutil.rrule import rrulestr
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from .models import AvailabilityRule, Availability, Appointment
+from .slots import get_slot_windows, virtual_slots_enabled
+from .open_slots import refresh_availability_open_slots
+from .cache import cached, PROGRAMS
+from . import db
+
+availability_rules_cli = AppGroup('availability-rules', help='Expand recurring availability into the visible window.')
+
+# RRULE weekday of each ProgramTimes day
+WEEKDAY_CODES = {
+    'Monday': 'MO',
+    'Tuesday': 'TU',
+    'Wednesday': 'WE',
+    'Thursday': 'TH',
+    'Friday': 'FR',
+    'Saturday': 'SA',
+    'Sunday': 'SU',
+}
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# last date stored as availabilities, AVAILABILITY_RULE_HORIZON_DAYS from today
+def get_expansion_horizon():
+    return date.today() + timedelta(days=current_app.config.get('AVAILABILITY_RULE_HORIZON_DAYS', 28))
+
+# weekly RRULE for a ProgramTimes day, or None if the day is not a weekday name
+def build_weekly_rrule(day):
+    code = WEEKDAY_CODES.get(day)
+    return f"FREQ=WEEKLY;BYDAY={code}" if code else None
+
+# store exception dates as comma separated YYYY-MM-DD dates
+def format_exdates(exdates):
+    return ','.join(sorted(exdate.isoformat() for exdate in exdates)) or None
+
+# return the exception dates of a rule as a set of dates
+def parse_exdates(exdates):
+    return {datetime.strptime(exdate, "%Y-%m-%d").date() for exdate in exdates.split(',')} if exdates else set()
+
+# every date of a rule in its term (cached, the arguments are the whole rule)
+@lru_cache(maxsize=1024)
+def get_rule_dates(rrule, start_date, end_date, exdates):
+    occurrences = rrulestr(rrule, dtstart=datetime.combine(start_date, datetime.min.time()))
+    skipped = parse_exdates(exdates)
+    return tuple(
+        occurrence.date()
+        for occurrence in occurrences.between(datetime.combine(start_date, datetime.min.time()),
+                                              datetime.combine(end_date, datetime.min.time()), inc=True)
+        if occurrence.date() not in skipped
+    )
+
+# dates of a rule between two dates, both included
+def get_rule_dates_between(rule, first_date, last_date):
+    return [rule_date for rule_date in get_rule_dates(rule.rrule, rule.start_date, rule.end_date, rule.exdates)
+            if first_date <= rule_date <= last_date]
+
+# build one rule per ProgramTimes entry of a program (does not add them)
+def build_program_rules(instructor_id, program, start_date, end_date, exdates, physical_location, meeting_url):
+    return [
+        AvailabilityRule(user_id=instructor_id, program_id=program.id, day=program_time.day,
+                         rrule=build_weekly_rrule(program_time.day), start_date=start_date, end_date=end_date,
+                         start_time=program_time.start_time, end_time=program_time.end_time,
+                         exdates=format_exdates(exdates), status='active',
+                         physical_location=physical_location, meeting_url=meeting_url,
+                         expanded_until=start_date - timedelta(days=1))
+        for program_time in program.program_times
+    ]
+
+# store the availabilities of some rules up to a date and return their ids (does not commit)
+# past dates are never stored, the same as posted availabilities
+def expand_rules(rules, until):
+    today = date.today()
+    availabilities = []
+    for rule in rules:
+        last_date = min(until, rule.end_date)
+        if rule.status != 'active' or rule.expanded_until >= last_date:
+            continue
+        first_date = max(rule.expanded_until + timedelta(days=1), today)
+        for rule_date in get_rule_dates_between(rule, first_date, last_date):
+            availabilities.append(Availability(user_id=rule.user_id, program_id=rule.program_id, rule_id=rule.id,
+                                               date=rule_date, start_time=rule.start_time, end_time=rule.end_time,
+                                               status='active', physical_location=rule.physical_location,
+                                               meeting_url=rule.meeting_url))
+        rule.expanded_until = last_date
+    if not availabilities:
+        db.session.flush()
+        return []
+    db.session.add_all(availabilities)
+    db.session.flush()
+
+    # stored slots are generated like posted availabilities (virtual slots are only stored once they are reserved)
+    if not virtual_slots_enabled():
+        programs = {rule.program_id: rule.program_details for rule in rules}
+        appointments = []
+        for availability in availabilities:
+            program = programs.get(availability.program_id)
+            if not program or program.isDropins:
+                continue
+            appointments.extend(
+                {
+                    'host_id': availability.user_id,
+                    'appointment_date': availability.date,
+                    'start_time': slot_start,
+                    'end_time': slot_end,
+                    'status': 'posted',
+                    'physical_location': availability.physical_location,
+                    'meeting_url': availability.meeting_url,
+                    'availability_id': availability.id,
+                }
+                for slot_start, slot_end in get_slot_windows(availability.date, availability.start_time, availability.end_time, program.duration)
+            )
+        if appointments:
+            db.session.execute(insert(Appointment), appointments)
+
+    return [availability.id for availability in availabilities]
+
+# expand the active rules that stop before the horizon and list the new slots to students (commits)
+# criteria narrow the rules, e.g. to the programs a read lists; without them every rule is expanded
+def expand_availability_rules(until=None, criteria=()):
+    until = until or get_expansion_horizon()
+    rules = AvailabilityRule.query.options(joinedload(AvailabilityRule.program_details)).filter(
+        AvailabilityRule.status == 'active',
+        AvailabilityRule.expanded_until < until,
+        AvailabilityRule.expanded_until < AvailabilityRule.end_date,
+        *criteria
+    ).all()
+    if not rules:
+        return 0
+
+    try:
+        availability_ids = expand_rules(rules, until)
+        refresh_availability_open_slots(availability_ids)
+        db.session.commit()
+        return len(availability_ids)
+    except IntegrityError:
+        # another request expanded the same rules first
+        db.session.rollback()
+        return 0
+
+# expand the rules of the programs a read lists before it lists them, at most once per scope, day and cache lifetime in this process
+# scope names what criteria select (e.g. ('program', program_id)) so other reads never wait on these rules
+def ensure_availability_rules_expanded(scope, *criteria):
+    until = get_expansion_horizon()
+    return cached(PROGRAMS, ('availability_rules_expanded', scope, until), lambda: expand_availability_rules(until, criteria))
+
+# stop expanding a program's active rules, e.g. once its times no longer match them, and return how many (does not commit)
+# the availabilities already stored are kept with their bookings
+def retire_program_rules(program_id):
+    return AvailabilityRule.query.filter_by(program_id=program_id, status='active').update(
+        {'status': 'inactive'}, synchronize_session=False
+    )
+
+# convert a rule to a object
+def format_availability_rule(rule):
+    return {
+        'id': rule.id,
+        'program_id': rule.program_id,
+        'day': rule.day,
+        'rrule': rule.rrule,
+        'start_date': rule.start_date,
+        'end_date': rule.end_date,
+        'start_time': rule.start_time,
+        'end_time': rule.end_time,
+        'exdates': sorted(parse_exdates(rule.exdates)),
+        'status': rule.status,
+        'physical_location': rule.physical_location,
+        'meeting_url': rule.meeting_url,
+        'expanded_until': rule.expanded_until,
+    }
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# store the availabilities of every rule up to the horizon, e.g. from a nightly cron job
+@availability_rules_cli.command('expand')
+@click.option('--days', type=int, default=None, help='Days ahead to store (defaults to AVAILABILITY_RULE_HORIZON_DAYS).')
+def expand_command(days):
+    until = date.today() + timedelta(days=days) if days is not None else None
+    click.echo(f"stored {expand_availability_rules(until)} availabilities")
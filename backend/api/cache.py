@@ -0,0 +1,116 @@
+"""
+ * cache.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the in-process cache for course and program metadata (names, global
+ * programs and their times). Entries live for METADATA_CACHE_TTL_SECONDS and
+ * the write endpoints invalidate the 'courses' or 'programs' namespace after
+ * they commit. Each namespace has a generation number, so a value loaded
+ * while an invalidation happens is not stored.
+ *
+ * Known Bugs:
+ * - Invalidation only reaches the worker process that handled the write,
+ *   other workers see the change once their entries expire.
+ *
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# namespaces invalidated by the write endpoints
+COURSES = 'courses'
+PROGRAMS = 'programs'
+
+# metadata kept in this process, dropping the least recently used once max_entries is reached
+class MetadataCache:
+    def __init__(self, ttl_seconds=60, max_entries=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (namespace, key) -> (expires_at, generation, value)
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    # return the cached value for a key, calling load() and storing its result on a miss
+    def get_or_load(self, namespace, key, load):
+        entry_key = (namespace, key)
+
+        with self.lock:
+            generation = self.generations.get(namespace, 0)
+            entry = self.entries.get(entry_key)
+
+            if entry is not None:
+                expires_at, entry_generation, value = entry
+                if expires_at > time.monotonic() and entry_generation == generation:
+                    self.entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return value
+                del self.entries[entry_key]
+            self.misses += 1
+
+        value = load()
+
+        if self.ttl_seconds <= 0:
+            return value
+
+        with self.lock:
+            # skip storing a value that may predate an invalidation
+            if self.generations.get(namespace, 0) == generation:
+                self.entries[entry_key] = (time.monotonic() + self.ttl_seconds, generation, value)
+                self.entries.move_to_end(entry_key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return value
+
+    # drop every entry of the given namespaces
+    def invalidate(self, *namespaces):
+        with self.lock:
+            for namespace in namespaces:
+                self.generations[namespace] = self.generations.get(namespace, 0) + 1
+            self.entries = OrderedDict(
+                (entry_key, entry) for entry_key, entry in self.entries.items() if entry_key[0] not in namespaces
+            )
+            self.invalidations += 1
+
+    # hit/miss counters for monitoring
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+            }
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# the app's metadata cache, created on first use
+def get_metadata_cache():
+    cache = current_app.extensions.get('metadata_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'metadata_cache',
+            MetadataCache(
+                current_app.config.get('METADATA_CACHE_TTL_SECONDS', 60),
+                current_app.config.get('METADATA_CACHE_SIZE', 1024)
+            )
+        )
+    return cache
+
+# return a cached course or program value, loading it on a miss
+def cached(namespace, key, load):
+    return get_metadata_cache().get_or_load(namespace, key, load)
+
+# drop the cached metadata of a namespace after a write has been committed
+def invalidate_metadata(*namespaces):
+    get_metadata_cache().invalidate(*namespaces)
@@ -0,0 +1,280 @@
+"""
+ * calendar_jobs.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the appointment to Outlook calendar pipeline. Booking, updating
+ * and cancelling an appointment queue a CalendarSyncJob in the same
+ * transaction, and the worker (flask calendar work) writes the jobs to Graph
+ * in $batch requests, sets Appointment.event_id and retries failures with
+ * exponential backoff. Each job has an idempotency key that is sent as the
+ * event's transactionId, so a retried create never makes a second event.
+ * Claiming, backoff and the worker loop are shared with the email outbox
+ * in job_queue.py.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import uuid
+from flask import current_app, session, has_request_context
+from flask.cli import AppGroup
+from .models import CalendarSyncJob, Appointment
+from .graph_batch import GraphBatch
+from .outlook import outlook_calendar_service
+from .reservations import ACTIVE_STATUSES
+from .job_queue import get_backoff_seconds, drain_queue, add_queue_commands
+from . import db
+from datetime import datetime, timedelta
+
+calendar_cli = AppGroup('calendar', help='Write appointment changes to Outlook calendars.')
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# Microsoft account signed in on the current request, if any
+def get_session_account_id():
+    if has_request_context():
+        return session.get('msal_account_id')
+    return None
+
+# the create job behind the appointment's current event, unless a later delete replaced it
+def get_create_job(appointment_id):
+    job = CalendarSyncJob.query.filter(
+        CalendarSyncJob.appointment_id == appointment_id,
+        CalendarSyncJob.action.in_(['create', 'delete']),
+        CalendarSyncJob.status != 'cancelled'
+    ).order_by(CalendarSyncJob.id.desc()).first()
+    return job if job and job.action == 'create' else None
+
+# drop pending updates of an appointment
+def cancel_pending_updates(appointment_id):
+    CalendarSyncJob.query.filter_by(appointment_id=appointment_id, action='update', status='pending').update(
+        {CalendarSyncJob.status: 'cancelled'}, synchronize_session=False
+    )
+
+def add_job(appointment_id, account_id, action, event_id=None):
+    job = CalendarSyncJob(
+        appointment_id=appointment_id,
+        account_id=account_id,
+        action=action,
+        event_id=event_id,
+        idempotency_key=uuid.uuid4().hex,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(job)
+    return job
+
+# queue an Outlook event for a new booking in the signed-in user's calendar (does not commit)
+def enqueue_calendar_create(appointment, account_id=None):
+    account_id = account_id or get_session_account_id()
+    if not account_id:
+        return None
+    return add_job(appointment.id, account_id, 'create')
+
+# queue an update of the appointment's Outlook event (does not commit)
+def enqueue_calendar_update(appointment):
+    create_job = get_create_job(appointment.id)
+    if not create_job and not appointment.event_id:
+        return None
+
+    # a queued create or update already reads the latest details when it runs
+    if create_job and create_job.status == 'pending':
+        return None
+    if CalendarSyncJob.query.filter_by(appointment_id=appointment.id, action='update', status='pending').first():
+        return None
+
+    account_id = create_job.account_id if create_job else get_session_account_id()
+    if not account_id:
+        return None
+    return add_job(appointment.id, account_id, 'update', appointment.event_id)
+
+# queue removal of the appointment's Outlook event (does not commit, call before clearing event_id)
+def enqueue_calendar_delete(appointment):
+    create_job = get_create_job(appointment.id)
+    cancel_pending_updates(appointment.id)
+
+    # the event was never created, so dropping the queued create is enough
+    if create_job and create_job.status == 'pending':
+        create_job.status = 'cancelled'
+        return None
+    if not create_job and not appointment.event_id:
+        return None
+
+    account_id = create_job.account_id if create_job else get_session_account_id()
+    if not account_id:
+        return None
+    event_id = appointment.event_id or (create_job.event_id if create_job else None)
+    return add_job(appointment.id, account_id, 'delete', event_id)
+
+# queue the calendar change that matches an appointment's new status (does not commit)
+def enqueue_calendar_status_change(appointment, new_status):
+    if new_status in ACTIVE_STATUSES:
+        return enqueue_calendar_update(appointment)
+    if new_status in ('canceled', 'rejected'):
+        return enqueue_calendar_delete(appointment)
+    return None
+
+# Graph event body for an appointment
+def build_event_payload(appointment):
+    program = appointment.availability.program_details if appointment.availability else None
+    names = [name for name in (appointment.course.name if appointment.course else None,
+                               program.name if program else None) if name]
+    timezone = current_app.config.get('CALENDAR_TIMEZONE', 'America/Los_Angeles')
+
+    content = appointment.notes or ''
+    if appointment.meeting_url:
+        content += f'<p><a href="{appointment.meeting_url}">{appointment.meeting_url}</a></p>'
+
+    return {
+        'subject': ' - '.join(names) or 'Appointment',
+        'body': {
+            'contentType': 'HTML',
+            'content': content
+        },
+        'start': {
+            'dateTime': datetime.combine(appointment.appointment_date, appointment.start_time).isoformat(),
+            'timeZone': timezone
+        },
+        'end': {
+            'dateTime': datetime.combine(appointment.appointment_date, appointment.end_time).isoformat(),
+            'timeZone': timezone
+        },
+        'location': {
+            'displayName': appointment.physical_location or ''
+        }
+    }
+
+# event a job should update or delete: (event_id, ready), not ready while the create behind it is still queued
+def resolve_event_id(job, appointment):
+    if job.event_id:
+        return job.event_id, True
+    if appointment and appointment.event_id:
+        return appointment.event_id, True
+
+    create_job = CalendarSyncJob.query.filter(
+        CalendarSyncJob.appointment_id == job.appointment_id,
+        CalendarSyncJob.action == 'create',
+        CalendarSyncJob.status != 'cancelled',
+        CalendarSyncJob.id < job.id
+    ).order_by(CalendarSyncJob.id.desc()).first()
+    if create_job and create_job.event_id:
+        return create_job.event_id, True
+    if create_job and create_job.status in ('pending', 'running'):
+        return None, False
+    return None, True
+
+def complete_job(job):
+    job.status = 'done'
+    job.completed_at = datetime.utcnow()
+    job.last_error = None
+    return 'done'
+
+# record a failed attempt, scheduling a retry until max_attempts is reached
+def fail_job(job, error, max_attempts):
+    job.attempts += 1
+    job.last_error = error
+
+    if job.attempts >= max_attempts:
+        job.status = 'failed'
+        return 'failed'
+
+    job.status = 'pending'
+    job.next_attempt_at = datetime.utcnow() + timedelta(seconds=get_backoff_seconds('CALENDAR_SYNC', job.attempts))
+    return 'retried'
+
+# wait for another job without counting an attempt
+def defer_job(job):
+    job.status = 'pending'
+    job.next_attempt_at = datetime.utcnow() + timedelta(seconds=get_backoff_seconds('CALENDAR_SYNC', 1))
+    return 'retried'
+
+# write one account's claimed jobs to its calendar in Graph $batch requests
+def run_account_jobs(account_id, jobs, max_attempts):
+    token = outlook_calendar_service.get_token_store().acquire_token(account_id, outlook_calendar_service.SCOPES)
+    if not token:
+        return [fail_job(job, 'No Outlook token for account', max_attempts) for job in jobs]
+
+    appointments = {
+        appointment.id: appointment
+        for appointment in Appointment.query.filter(
+            Appointment.id.in_([job.appointment_id for job in jobs])
+        ).all()
+    }
+
+    outcomes = []
+    batch = GraphBatch()
+    batched_jobs = []
+    for job in jobs:
+        appointment = appointments.get(job.appointment_id)
+
+        if job.action == 'create':
+            # cancelled before the event was written
+            if not appointment or appointment.status not in ACTIVE_STATUSES:
+                outcomes.append(complete_job(job))
+                continue
+            batch.create(dict(build_event_payload(appointment), transactionId=job.idempotency_key), appointment.id)
+        else:
+            event_id, ready = resolve_event_id(job, appointment)
+            if not ready:
+                outcomes.append(defer_job(job))
+                continue
+            if not event_id or (job.action == 'update' and not appointment):
+                outcomes.append(complete_job(job))
+                continue
+            job.event_id = event_id
+            if job.action == 'update':
+                batch.update(event_id, build_event_payload(appointment), appointment.id)
+            else:
+                batch.delete(event_id, job.appointment_id)
+        batched_jobs.append(job)
+
+    if not batched_jobs:
+        return outcomes
+
+    try:
+        results = batch.execute(token['access_token'])
+    except Exception as e:
+        return outcomes + [fail_job(job, str(e), max_attempts) for job in batched_jobs]
+
+    for job, result in zip(batched_jobs, results):
+        appointment = appointments.get(job.appointment_id)
+
+        # an event removed in Outlook needs no update
+        if result.get('ok') or (job.action == 'update' and result['status'] == 404):
+            if job.action == 'create':
+                job.event_id = result['event_id']
+                if appointment:
+                    appointment.event_id = result['event_id']
+            elif job.action == 'delete' and appointment and appointment.event_id == job.event_id:
+                appointment.event_id = None
+            outcomes.append(complete_job(job))
+        else:
+            outcomes.append(fail_job(job, result.get('error'), max_attempts))
+    return outcomes
+
+# run one batch of claimed jobs, grouped by the account whose calendar they write to
+def run_jobs(jobs, max_attempts):
+    jobs_by_account = {}
+    for job in jobs:
+        jobs_by_account.setdefault(job.account_id, []).append(job)
+
+    outcomes = []
+    for account_id, account_jobs in jobs_by_account.items():
+        outcomes.extend(run_account_jobs(account_id, account_jobs, max_attempts))
+    return outcomes
+
+# run every job that is currently due and return how many were done, retried and failed
+def drain_calendar_jobs(batch_size=None, max_attempts=None):
+    return drain_queue(CalendarSyncJob, 'CALENDAR_SYNC', 'running', run_jobs, ['done', 'retried', 'failed'],
+                       batch_size, max_attempts)
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# flask calendar drain runs the jobs that are due once, flask calendar work keeps running them until stopped
+add_queue_commands(calendar_cli, drain_calendar_jobs, 'calendar', 'Jobs')
@@ -0,0 +1,171 @@
+"""
+ * calendar_sync.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the local mirror of each Outlook calendar. The mirror is kept up
+ * to date with Microsoft Graph delta queries on calendarView: the first sync
+ * downloads the whole window, later syncs resume from the stored deltaLink
+ * and only transfer events that changed.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import os
+import json
+import requests
+from flask import current_app
+from .models import CalendarEventMirror, CalendarSyncState
+from . import db
+from .instrumentation import TimedSession
+from dateutil import parser
+from datetime import datetime, timedelta
+
+# Microsoft Graph base url (pointed at a stub server in tests)
+GRAPH_API_ENDPOINT = os.getenv('GRAPH_API_ENDPOINT', 'https://graph.microsoft.com/v1.0')
+
+# one pooled HTTP session for every Graph call so TLS connections are reused (timed per request)
+graph_session = TimedSession('graph')
+graph_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# raised when Graph no longer accepts a stored delta link
+class DeltaTokenExpired(Exception):
+    pass
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# build a Graph url from a path such as '/me/events'
+def graph_url(path):
+    return current_app.config.get('GRAPH_API_ENDPOINT', GRAPH_API_ENDPOINT).rstrip('/') + path
+
+# calendarView window: start of the current month to the end of next year (naive UTC)
+def get_sync_window(now=None):
+    now = now or datetime.utcnow()
+    start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end_date = now.replace(year=now.year + 1, month=12, day=31, hour=23, minute=59, second=59, microsecond=0)
+    return start_date, end_date
+
+# convert a Graph dateTimeTimeZone value (requested in UTC) to a naive UTC datetime
+def parse_graph_datetime(value):
+    if not value or not value.get('dateTime'):
+        return None
+    return parser.parse(value['dateTime']).replace(tzinfo=None)
+
+# fetch one page of a delta query
+def fetch_delta_page(url, access_token):
+    headers = {
+        'Authorization': 'Bearer ' + access_token,
+        'Accept': 'application/json',
+        # every start/end comes back in UTC so they can be stored and sorted as is
+        'Prefer': 'outlook.timezone="UTC"'
+    }
+    response = graph_session.get(url, headers=headers)
+    if response.status_code == 410:
+        raise DeltaTokenExpired(url)
+    response.raise_for_status()
+    return response.json()
+
+# apply one page of delta results to the owner's mirror
+def apply_delta_page(owner_id, events):
+    if not events:
+        return 0
+
+    # one query for the mirrored rows this page touches
+    event_ids = [event['id'] for event in events]
+    mirrored = {
+        row.event_id: row
+        for row in CalendarEventMirror.query.filter(
+            CalendarEventMirror.owner_id == owner_id,
+            CalendarEventMirror.event_id.in_(event_ids)
+        ).all()
+    }
+
+    now = datetime.utcnow()
+    for event in events:
+        row = mirrored.get(event['id'])
+
+        # deleted or moved out of the window
+        if '@removed' in event:
+            if row:
+                db.session.delete(row)
+                mirrored.pop(event['id'])
+            continue
+
+        if not row:
+            row = CalendarEventMirror(owner_id=owner_id, event_id=event['id'])
+            db.session.add(row)
+            mirrored[event['id']] = row
+        row.start_at = parse_graph_datetime(event.get('start'))
+        row.end_at = parse_graph_datetime(event.get('end'))
+        row.data = json.dumps(event)
+        row.synced_at = now
+
+    return len(events)
+
+# drop everything mirrored for an owner so the next sync starts from scratch
+def reset_calendar_mirror(owner_id):
+    CalendarEventMirror.query.filter_by(owner_id=owner_id).delete(synchronize_session=False)
+    CalendarSyncState.query.filter_by(owner_id=owner_id).delete(synchronize_session=False)
+
+# bring the owner's mirror up to date and return the number of changed events received
+def sync_calendar(owner_id, access_token):
+    window_start, window_end = get_sync_window()
+    state = db.session.get(CalendarSyncState, owner_id)
+
+    # a delta link only covers the window it was created for
+    if state and (state.window_start != window_start or state.window_end != window_end):
+        reset_calendar_mirror(owner_id)
+        state = None
+
+    try:
+        return follow_delta(owner_id, access_token, state, window_start, window_end)
+    except DeltaTokenExpired:
+        db.session.rollback()
+        reset_calendar_mirror(owner_id)
+        return follow_delta(owner_id, access_token, None, window_start, window_end)
+
+# follow a delta query to its final page, storing the new delta link in the same commit as the changes
+def follow_delta(owner_id, access_token, state, window_start, window_end):
+    try:
+        if state and state.delta_link:
+            url = state.delta_link
+        else:
+            url = graph_url('/me/calendarView/delta?startDateTime={}Z&endDateTime={}Z'.format(
+                window_start.isoformat(), window_end.isoformat()))
+
+        changed = 0
+        while url:
+            page = fetch_delta_page(url, access_token)
+            changed += apply_delta_page(owner_id, page.get('value', []))
+            url = page.get('@odata.nextLink')
+            delta_link = page.get('@odata.deltaLink')
+
+        if state is None:
+            state = CalendarSyncState(owner_id=owner_id)
+            db.session.add(state)
+        state.delta_link = delta_link
+        state.window_start = window_start
+        state.window_end = window_end
+        state.synced_at = datetime.utcnow()
+        db.session.commit()
+        return changed
+    except Exception:
+        db.session.rollback()
+        raise
+
+# True when the mirror was synced less than max_age_seconds ago
+def is_mirror_fresh(owner_id, max_age_seconds):
+    state = db.session.get(CalendarSyncState, owner_id)
+    if not state or not state.synced_at or state.window_start != get_sync_window()[0]:
+        return False
+    return datetime.utcnow() - state.synced_at < timedelta(seconds=max_age_seconds)
+
+# return the owner's mirrored events in start order
+def get_mirrored_events(owner_id):
+    rows = CalendarEventMirror.query.filter_by(owner_id=owner_id).order_by(
+        CalendarEventMirror.start_at, CalendarEventMirror.id
+    ).all()
+    return [json.loads(row.data) for row in rows]
@@ -0,0 +1,128 @@
+"""
+ * conflicts.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the conflict detection for instructor schedules. An
+ * IntervalIndex holds an instructor's availabilities (stored and not yet
+ * expanded from rules) and booked appointments across every program and
+ * course in a date window, sorted by start with a running maximum of the
+ * ends, so each overlap query is two binary searches. A whole availability
+ * payload is checked against it in one pass.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import or_
+from .models import Availability, AvailabilityRule, Appointment
+from .reservations import ACTIVE_STATUSES
+from .availability_rules import get_rule_dates_between
+from . import db
+
+# half open [start, end) datetime intervals with the row each one came from
+class IntervalIndex:
+    def __init__(self, intervals):
+        self.intervals = sorted((interval for interval in intervals if interval[0] < interval[1]),
+                                key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in self.intervals]
+        # max_ends[i] is the latest end among the first i + 1 intervals, so it never decreases
+        self.max_ends = list(accumulate((interval[1] for interval in self.intervals), max))
+
+    def __len__(self):
+        return len(self.intervals)
+
+    # return an interval overlapping [start, end) as (start, end, item), or None
+    def find_overlap(self, start, end):
+        # only the intervals starting before end can overlap
+        count = bisect_left(self.starts, end)
+        if count == 0 or self.max_ends[count - 1] <= start:
+            return None
+        # the first of them whose running maximum passes start ends after start itself
+        return self.intervals[bisect_right(self.max_ends, start, 0, count)]
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# the datetime bounds of a date and its times
+def get_interval(day, start_time, end_time):
+    return datetime.combine(day, start_time), datetime.combine(day, end_time)
+
+# index an instructor's active availabilities, unexpanded rule dates and booked appointments between two dates
+# rows of exclude_program_ids are left out, e.g. the program whose availability is being replaced
+def build_instructor_index(instructor_id, start_date, end_date, exclude_program_ids=()):
+    exclude_program_ids = [int(program_id) for program_id in exclude_program_ids]
+    intervals = []
+
+    availabilities = db.session.query(
+        Availability.id, Availability.program_id, Availability.date, Availability.start_time, Availability.end_time
+    ).filter(
+        Availability.user_id == instructor_id,
+        Availability.status == 'active',
+        Availability.date.between(start_date, end_date),
+        Availability.program_id.notin_(exclude_program_ids)
+    ).all()
+    for availability in availabilities:
+        intervals.append((*get_interval(availability.date, availability.start_time, availability.end_time),
+                          {'type': 'availability', 'id': availability.id, 'program_id': availability.program_id}))
+
+    # dates of recurring rules that are not stored as availabilities yet
+    rules = AvailabilityRule.query.filter(
+        AvailabilityRule.user_id == instructor_id,
+        AvailabilityRule.status == 'active',
+        AvailabilityRule.expanded_until < end_date,
+        AvailabilityRule.end_date >= start_date,
+        AvailabilityRule.program_id.notin_(exclude_program_ids)
+    ).all()
+    for rule in rules:
+        first_date = max(start_date, rule.expanded_until + timedelta(days=1))
+        for rule_date in get_rule_dates_between(rule, first_date, end_date):
+            intervals.append((*get_interval(rule_date, rule.start_time, rule.end_time),
+                              {'type': 'availability_rule', 'id': rule.id, 'program_id': rule.program_id}))
+
+    # booked meetings count even when their availability was turned off
+    appointments = db.session.query(
+        Appointment.id, Availability.program_id, Appointment.appointment_date, Appointment.start_time, Appointment.end_time
+    ).outerjoin(Availability, Appointment.availability_id == Availability.id).filter(
+        Appointment.host_id == instructor_id,
+        Appointment.status.in_(ACTIVE_STATUSES),
+        Appointment.appointment_date.between(start_date, end_date),
+        or_(Availability.program_id.is_(None), Availability.program_id.notin_(exclude_program_ids))
+    ).all()
+    for appointment in appointments:
+        intervals.append((*get_interval(appointment.appointment_date, appointment.start_time, appointment.end_time),
+                          {'type': 'appointment', 'id': appointment.id, 'program_id': appointment.program_id}))
+
+    return IntervalIndex(intervals)
+
+# split (program_id, date, start_time, end_time) entries into the ones that fit the index and the conflicts of the others
+def filter_conflicting_entries(index, entries):
+    kept = []
+    conflicts = []
+    for entry in entries:
+        program_id, day, start_time, end_time = entry
+        overlap = index.find_overlap(*get_interval(day, start_time, end_time))
+        if overlap is None:
+            kept.append(entry)
+            continue
+        overlap_start, overlap_end, item = overlap
+        conflicts.append({
+            'program_id': program_id,
+            'date': day,
+            'start_time': start_time,
+            'end_time': end_time,
+            'conflict': dict(item, date=overlap_start.date(), start_time=overlap_start.time(), end_time=overlap_end.time()),
+        })
+    return kept, conflicts
+
+# check entries against everything the instructor has scheduled on their dates, returning (kept entries, conflicts)
+def find_availability_conflicts(instructor_id, entries, exclude_program_ids=()):
+    if not entries:
+        return [], []
+    dates = [entry[1] for entry in entries]
+    index = build_instructor_index(instructor_id, min(dates), max(dates), exclude_program_ids)
+    return filter_conflicting_entries(index, entries)
@@ -0,0 +1,68 @@
+"""
+ * etag.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the revision stamps and ETag helpers used by the course and program
+ * endpoints. A GET request whose If-None-Match still matches the current
+ * revisions is answered with 304 Not Modified before the response is built.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import hashlib
+from flask import request, make_response
+from sqlalchemy import update, select, func
+from . import db
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# bump the revision of a course or program row (call before committing)
+def bump_revision(model, row_id):
+    if row_id is None:
+        return
+
+    db.session.execute(
+        update(model).where(model.id == row_id).values(revision=model.revision + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+# return the revision of a single course or program, or None if it doesn't exist
+def get_revision(model, row_id):
+    return db.session.scalar(select(model.revision).where(model.id == row_id))
+
+# fingerprint of a set of course or program rows: how many, the newest id and the summed revisions
+# adding or removing a row changes the count or newest id, editing one raises the sum
+# a program deleted and recreated under the same id is not visible here, so that bumps the courses listing it
+def get_rows_version(model, *criteria):
+    return tuple(db.session.execute(
+        select(func.count(model.id), func.max(model.id), func.coalesce(func.sum(model.revision), 0)).where(*criteria)
+    ).one())
+
+# build a weak ETag from everything a response depends on
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+# return a 304 response if the client already holds this version, otherwise None
+def not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        return set_etag(response, etag)
+    return None
+
+# attach the ETag to a successful endpoint result so the browser revalidates it next time
+def with_etag(result, etag):
+    response = make_response(result)
+
+    if response.status_code == 200:
+        set_etag(response, etag)
+    return response
+
+# set the ETag and ask the browser to revalidate before reusing its copy
+def set_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
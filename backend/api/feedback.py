@@ -15,6 +15,7 @@ from flask_jwt_extended import create_access_token, set_access_cookies,\
 from .models import User, Feedback, Appointment
 from datetime import datetime, timedelta, timezone
 from . import db
+from .user import get_user
 
 feedback = Blueprint('feedback', __name__)
 
@@ -48,7 +49,7 @@ def add_feedback():
     # Fetch the existing feedback for the appointment
     existing_feedback = Feedback.query.filter_by(appointment_id=appointment_id).first()
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user or user.account_type not in ['student', 'instructor']:
         return jsonify({"error": "Only students and instructors can add feedback"}), 401
     
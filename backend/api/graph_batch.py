@@ -0,0 +1,157 @@
+"""
+ * graph_batch.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the batching layer for Outlook calendar writes. Pending event
+ * creates, updates and deletes are coalesced into Microsoft Graph $batch
+ * requests of up to 20 operations, and the per-operation results are mapped
+ * back to Appointment.event_id.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import time
+from flask import current_app
+from .models import Appointment
+from .calendar_sync import graph_url, graph_session
+
+# Graph rejects $batch requests with more than 20 operations
+GRAPH_BATCH_LIMIT = 20
+
+# per-operation statuses worth sending again in the next round
+RETRYABLE_STATUSES = (429, 503, 504)
+
+# longest Retry-After honoured between rounds, in seconds
+MAX_RETRY_AFTER_SECONDS = 10
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# pending calendar mutations, sent together by execute()
+class GraphBatch:
+    def __init__(self):
+        self.operations = []
+
+    def add(self, action, method, url, body=None, event_id=None, appointment_id=None):
+        operation = {
+            'id': str(len(self.operations) + 1),
+            'action': action,
+            'method': method,
+            'url': url,
+            'body': body,
+            'event_id': event_id,
+            'appointment_id': appointment_id,
+        }
+        self.operations.append(operation)
+        return operation['id']
+
+    def create(self, body, appointment_id=None):
+        return self.add('create', 'POST', '/me/events', body=body, appointment_id=appointment_id)
+
+    def update(self, event_id, body, appointment_id=None):
+        return self.add('update', 'PATCH', f'/me/events/{event_id}', body=body, event_id=event_id,
+                        appointment_id=appointment_id)
+
+    def delete(self, event_id, appointment_id=None):
+        return self.add('delete', 'DELETE', f'/me/events/{event_id}', event_id=event_id,
+                        appointment_id=appointment_id)
+
+    # send every operation in $batch requests and return one result per operation, in order
+    def execute(self, access_token):
+        responses = {}
+        pending = list(self.operations)
+        max_retries = current_app.config.get('GRAPH_BATCH_MAX_RETRIES', 2)
+
+        for attempt in range(max_retries + 1):
+            throttled = []
+            retry_after = 0
+            for start in range(0, len(pending), GRAPH_BATCH_LIMIT):
+                chunk = pending[start:start + GRAPH_BATCH_LIMIT]
+                for response in post_batch(chunk, access_token):
+                    responses[response['id']] = response
+                    if response.get('status') in RETRYABLE_STATUSES and attempt < max_retries:
+                        throttled.append(response['id'])
+                        retry_after = max(retry_after, get_retry_after(response))
+            if not throttled:
+                break
+            pending = [operation for operation in pending if operation['id'] in throttled]
+            time.sleep(min(retry_after, MAX_RETRY_AFTER_SECONDS))
+
+        return [get_operation_result(operation, responses.get(operation['id'])) for operation in self.operations]
+
+# POST one chunk of operations to /$batch
+def post_batch(operations, access_token):
+    requests_body = []
+    for operation in operations:
+        request = {'id': operation['id'], 'method': operation['method'], 'url': operation['url']}
+        if operation['body'] is not None:
+            request['headers'] = {'Content-Type': 'application/json'}
+            request['body'] = operation['body']
+        requests_body.append(request)
+
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    response = graph_session.post(graph_url('/$batch'), headers=headers, json={'requests': requests_body})
+    response.raise_for_status()
+    return response.json().get('responses', [])
+
+# seconds Graph asked us to wait before retrying an operation
+def get_retry_after(response):
+    headers = {key.lower(): value for key, value in (response.get('headers') or {}).items()}
+    try:
+        return int(headers.get('retry-after', 1))
+    except ValueError:
+        return 1
+
+# flatten an operation and its Graph response into the result returned to callers
+def get_operation_result(operation, response):
+    result = {
+        'action': operation['action'],
+        'appointment_id': operation['appointment_id'],
+        'event_id': operation['event_id'],
+        'status': None,
+        'ok': False,
+    }
+    if response is None:
+        result['error'] = 'No response from Graph'
+        return result
+
+    status = response.get('status')
+    body = response.get('body') or {}
+    result['status'] = status
+    # deleting an event that is already gone still leaves the calendar as requested
+    result['ok'] = 200 <= status < 300 or (operation['action'] == 'delete' and status == 404)
+    if operation['action'] == 'create' and result['ok']:
+        result['event_id'] = body.get('id')
+    if not result['ok']:
+        result['error'] = body.get('error', {}).get('message', f'Graph returned {status}')
+    return result
+
+# write the outcome of successful operations to Appointment.event_id (caller commits)
+def apply_batch_results(results):
+    appointment_ids = [result['appointment_id'] for result in results if result['appointment_id'] and result.get('ok')]
+    if not appointment_ids:
+        return 0
+
+    appointments = {
+        appointment.id: appointment
+        for appointment in Appointment.query.filter(Appointment.id.in_(appointment_ids)).all()
+    }
+    updated = 0
+    for result in results:
+        appointment = appointments.get(result['appointment_id'])
+        if not appointment or not result.get('ok'):
+            continue
+        if result['action'] == 'create':
+            appointment.event_id = result['event_id']
+        elif result['action'] == 'delete':
+            appointment.event_id = None
+        else:
+            continue
+        updated += 1
+    return updated
@@ -16,14 +16,25 @@
 """
 
 from flask import Blueprint, request, jsonify
-from .models import User, Availability, Appointment, AppointmentComment, CourseDetails, CourseMembers, ProgramDetails
+from .models import User, Availability, AvailabilityRule, Appointment, AppointmentComment, CourseDetails, CourseMembers, ProgramDetails
 from flask_jwt_extended import jwt_required, get_jwt_identity, set_access_cookies, get_jwt, create_access_token
-from sqlalchemy import extract, func, or_, and_
+from sqlalchemy import or_, and_, select, insert
+from sqlalchemy.orm import joinedload
 from . import db
 from datetime import datetime, timedelta, timezone
-from .student import get_week_range
-from .programs import get_program_name, get_course_name
-from .user import is_instructor
+from time import perf_counter
+from .slots import get_slot_windows, virtual_slots_enabled
+from .pagination import apply_appointment_filters, paginate_appointments, PaginationError
+from .reservations import get_booking_counts, get_program_limits, apply_status_change, reset_booking_counters
+from .programs import get_course_name, delete_program_availabilities
+from .user import is_instructor, get_user
+from .cache import cached, PROGRAMS
+from .etag import get_rows_version, make_etag, not_modified, with_etag
+from .calendar_jobs import enqueue_calendar_delete
+from .open_slots import refresh_program_open_slots, refresh_availability_open_slots
+from .availability_rules import build_program_rules, build_weekly_rrule, expand_rules, get_expansion_horizon, \
+    ensure_availability_rules_expanded, format_availability_rule, format_exdates, parse_exdates, get_rule_dates_between
+from .conflicts import build_instructor_index, filter_conflicting_entries, find_availability_conflicts
 
 instructor = Blueprint('instructor', __name__)
 
@@ -49,61 +60,69 @@ def refresh_expiring_jwts(response):
 # return type and isDropins for a program
 def get_program_name_and_isDropins(program_id): 
     try: 
-        program = ProgramDetails.query.filter_by(id=program_id).first()
-
-        if program:
-            returned_attributes = {'name': program.name, 'isDropins': program.isDropins}
-            return returned_attributes
+        return cached(PROGRAMS, ('name_and_isDropins', str(program_id)), lambda: load_program_name_and_isDropins(program_id))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+# load the name and isDropins of a program
+def load_program_name_and_isDropins(program_id):
+    program = ProgramDetails.query.filter_by(id=program_id).first()
+
+    if program:
+        returned_attributes = {'name': program.name, 'isDropins': program.isDropins}
+        return returned_attributes
+
 # return the global programs for a instructor
 def get_global_programs(user_id):
     try:
         if is_instructor(user_id):
-            global_programs = ProgramDetails.query.filter(
-                and_(ProgramDetails.course_id == None, ProgramDetails.instructor_id == user_id)
-            ).all()
-
-            if global_programs:
-                formatted_programs = []
-
-                for program in global_programs:
-                    # convert attributes to a object
-                    program_info = {
-                        'id': program.id,
-                        'name': program.name,
-                        'description': program.description,
-                        'duration': program.duration,
-                        'physical_location': program.physical_location,
-                        'meeting_url': program.meeting_url,
-                        'auto_approve_appointments': program.auto_approve_appointments,
-                        'max_daily_meetings': program.max_daily_meetings,
-                        'max_weekly_meetings': program.max_weekly_meetings,
-                        'max_monthly_meetings': program.max_monthly_meetings,
-                        'isDropins': program.isDropins,
-                        'isRangeBased': program.isRangeBased,
-                    }
-                    # add object to list
-                    formatted_programs.append(program_info)
-
-                # add id and course_name to object
-                formatted_programs = {
-                    'id': None,
-                    'course_name': 'All Courses',
-                    'programs': formatted_programs
-                }
-
-                return formatted_programs
-            else:
-                # no global programs found
-                return None
+            return cached(PROGRAMS, ('instructor_global_programs', str(user_id)), lambda: load_global_programs(user_id))
         else:
             # instructor not found
             return None
     except Exception as e:
         return None
 
+# load and format the global programs for a instructor
+def load_global_programs(user_id):
+    global_programs = ProgramDetails.query.filter(
+        and_(ProgramDetails.course_id == None, ProgramDetails.instructor_id == user_id)
+    ).all()
+
+    if global_programs:
+        formatted_programs = []
+
+        for program in global_programs:
+            # convert attributes to a object
+            program_info = {
+                'id': program.id,
+                'name': program.name,
+                'description': program.description,
+                'duration': program.duration,
+                'physical_location': program.physical_location,
+                'meeting_url': program.meeting_url,
+                'auto_approve_appointments': program.auto_approve_appointments,
+                'max_daily_meetings': program.max_daily_meetings,
+                'max_weekly_meetings': program.max_weekly_meetings,
+                'max_monthly_meetings': program.max_monthly_meetings,
+                'isDropins': program.isDropins,
+                'isRangeBased': program.isRangeBased,
+            }
+            # add object to list
+            formatted_programs.append(program_info)
+
+        # add id and course_name to object
+        formatted_programs = {
+            'id': None,
+            'course_name': 'All Courses',
+            'programs': formatted_programs
+        }
+
+        return formatted_programs
+    else:
+        # no global programs found
+        return None
+
 # check if date is in correct format
 def is_valid_date(date):
     try:
@@ -133,133 +152,207 @@ def is_start_time_before_end_time(start_time, end_time):
     except ValueError:
         return False
 
-# validate availability information before before creating it as an availability tuple for the Availability Table
-def validate_availability_data(instructor_id, course_id, availability_id, date, start_time, end_time, isDropins):
+# validate a whole availability payload before anything is written, returning (entries, error response)
+# entries are (program_id, date, start_time, end_time) tuples with date/time objects
+def validate_availability_payload(instructor_id, course_id, availabilities, duration, isDropins):
     course_id = int(course_id) if course_id and course_id != "null" else None
-    
-    required_fields = [instructor_id, availability_id, date, start_time, end_time]
 
-    # Check if any required field is missing
-    if not all(required_fields):
-        return jsonify({"error": "provide all the required fields"}), 404
+    if not isinstance(availabilities, list):
+        return None, (jsonify({"error": "provide a list of availabilities"}), 400)
+
+    try:
+        duration = int(duration) if duration else 0
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "duration must be a number of minutes"}), 400)
+    if duration < 0:
+        return None, (jsonify({"error": "duration must be a number of minutes"}), 400)
 
     # Validate instructor
     instructor = User.query.filter_by(id=instructor_id, account_type='instructor').first()
     if not instructor:
-        return jsonify({"error": "instructor not found!"}), 404
+        return None, (jsonify({"error": "instructor not found!"}), 404)
     
     if not isDropins:
         if course_id != None:
             courseTuple = CourseDetails.query.filter_by(id=course_id, instructor_id=instructor.id).first()
             if not courseTuple:
-                return jsonify({"error": "course not found!"}), 404
+                return None, (jsonify({"error": "course not found!"}), 404)
 
-    # Validate availability_type
-    programTuple = ProgramDetails.query.filter_by(id=availability_id).first()
-    if not programTuple:
-        return jsonify({"error": f"availability id '{availability_id}' not found"}), 400
+    # Validate every referenced program with one query
+    program_ids = {entry.get('id') for entry in availabilities if isinstance(entry, dict)}
+    found_ids = {program.id for program in ProgramDetails.query.filter(ProgramDetails.id.in_(program_ids)).all()}
 
-    # Validate date
-    is_date_valid = is_valid_date(date)
-    if not is_date_valid:
-        return jsonify({"error": "provide a valid 'YYYY-MM-DD' date format that is not in the past"}), 400
+    entries = []
+    for index, entry in enumerate(availabilities):
+        if not isinstance(entry, dict):
+            return None, (jsonify({"error": f"availability {index}: provide all the required fields"}), 400)
 
-    # Validate start_time and end_time
-    if not is_valid_time(start_time) or not is_valid_time(end_time) or not is_start_time_before_end_time(start_time, end_time):
-        return jsonify({"error": "provide valid 'HH:MM' time formats, ensure that start_time is before end_time, and that they are at least 30 mins apart"}), 400
+        program_id = entry.get('id')
+        date = entry.get('date')
+        start_time = entry.get('start_time')
+        end_time = entry.get('end_time')
 
-    return None  # Data is valid
+        # Check if any required field is missing
+        if not all([program_id, date, start_time, end_time]):
+            return None, (jsonify({"error": f"availability {index}: provide all the required fields"}), 400)
 
-# check if availability already exists in Availability table
-def is_existing_availability(instructor_id, program_id, date, start_time, end_time):
-    existing_availabilities = Availability.query.filter_by(user_id=instructor_id, program_id=program_id, date=date).all()
-    
-    for existing_availability in existing_availabilities:
-        if (start_time < existing_availability.end_time and end_time > existing_availability.start_time):
-            return True  # There is a time overlap
+        # Validate availability_type
+        if program_id not in found_ids:
+            return None, (jsonify({"error": f"availability {index}: availability id '{program_id}' not found"}), 400)
 
-    return False  # No time overlap found
+        # Validate date format (past dates are skipped later, not rejected)
+        try:
+            parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return None, (jsonify({"error": f"availability {index}: provide a valid 'YYYY-MM-DD' date format"}), 400)
 
-# add a availability tuple to the Availabilty Table
-def add_instructor_availability(course_id, instructor_id, data, physical_location, meeting_url, duration, isDropins):
-    try:
-        program_id = data.get('id')
-        date = data.get('date')
-        start_time = data.get('start_time')
-        end_time = data.get('end_time')
-        
-        # Validate the data
-        validation_result = validate_availability_data(instructor_id, course_id, program_id, date, start_time, end_time, isDropins)
-        if validation_result:
-            return validation_result
-        
-        # Check if the same availability already exists for the instructor
-        if is_existing_availability(instructor_id, program_id, date, start_time, end_time):
-            return jsonify({"error": "availability time conflict or it already exists for this instructor"}), 400
-        
-        current_time = datetime.now() - timedelta(hours=8)
-        availability_datetime = datetime.strptime(date + ' ' + start_time, '%Y-%m-%d %H:%M')
-        if availability_datetime > current_time:
-            # Add the new availability
-            new_availability = Availability(
-                user_id=instructor_id,
-                program_id=program_id,
-                date=date,
-                start_time=start_time,
-                end_time=end_time, 
-                status='active'
-            )
-            db.session.add(new_availability) 
-            db.session.commit()
-            
-            # Generate appointment events
-            if not isDropins:
-                generate_appointments(instructor_id, date, start_time, end_time, physical_location, meeting_url, new_availability.id, duration)
-            return jsonify({"message": "availability added successfully"}), 201
-        else:
-            return jsonify({"error": "appointment datetime must be in the future"}), 400
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": str(e)}), 500
-        
-# Generate appointment events at 30-minute intervals within the specified time range.
+        # Validate start_time and end_time
+        if not is_valid_time(start_time) or not is_valid_time(end_time) or not is_start_time_before_end_time(start_time, end_time):
+            return None, (jsonify({"error": f"availability {index}: provide valid 'HH:MM' time formats, ensure that start_time is before end_time, and that they are at least 30 mins apart"}), 400)
+
+        entries.append((program_id, parsed_date, datetime.strptime(start_time, "%H:%M").time(), datetime.strptime(end_time, "%H:%M").time()))
+
+    return (entries, duration), None
+
+# drop entries in the past or overlapping an earlier entry, returning (kept entries, skipped count)
+def filter_availability_entries(entries):
+    current_time = datetime.now() - timedelta(hours=8)
+    kept = []
+    kept_by_day = {}
+
+    for program_id, date, start_time, end_time in entries:
+        if datetime.combine(date, start_time) <= current_time:
+            continue
+
+        # the first entry wins when two entries of the payload overlap
+        same_day = kept_by_day.setdefault((program_id, date), [])
+        if any(start_time < kept_end and end_time > kept_start for kept_start, kept_end in same_day):
+            continue
+
+        same_day.append((start_time, end_time))
+        kept.append((program_id, date, start_time, end_time))
+
+    return kept, len(entries) - len(kept)
+
+# Generate appointment rows at duration-minute intervals within the specified time range (one slot if no duration)
 def generate_appointments(instructor_id, date, start_time, end_time, physical_location, meeting_url, availability_id, duration):
+    return [
+        {
+            'host_id': instructor_id,
+            'appointment_date': date,
+            'start_time': slot_start,
+            'end_time': slot_end,
+            'status': 'posted',
+            'physical_location': physical_location,
+            'meeting_url': meeting_url,
+            'availability_id': availability_id,
+        }
+        for slot_start, slot_end in get_slot_windows(date, start_time, end_time, duration)
+    ]
+
+# replace a program's availabilities and slots in a single transaction and return the row counts
+def replace_program_availabilities(instructor_id, program_id, entries, physical_location, meeting_url, duration, isDropins):
     try:
-        start_datetime = datetime.strptime(start_time, "%H:%M")
-        end_datetime = datetime.strptime(end_time, "%H:%M")
+        deleted = delete_program_availabilities(program_id)
+
+        # the program's bookings are replaced, so its limit counters are rebuilt on the next booking
+        reset_booking_counters(program_id)
+
+        # add the availabilities in one flush so their ids are known for the slots
+        availabilities = [
+            Availability(user_id=instructor_id, program_id=entry_program_id, date=date,
+                         start_time=start_time, end_time=end_time, status='active',
+                         physical_location=physical_location, meeting_url=meeting_url)
+            for entry_program_id, date, start_time, end_time in entries
+        ]
+        db.session.add_all(availabilities)
+        db.session.flush()
+
+        # Generate appointment events (virtual slots are only stored once they are reserved)
+        appointments = []
+        if not isDropins and not virtual_slots_enabled():
+            for availability in availabilities:
+                appointments.extend(generate_appointments(instructor_id, availability.date, availability.start_time, availability.end_time,
+                                                          physical_location, meeting_url, availability.id, duration))
+        if appointments:
+            db.session.execute(insert(Appointment), appointments)
+
+        # rebuild what students see for every program touched (the body may leave out program_id)
+        touched_program_ids = {int(entry[0]) for entry in entries}
+        if program_id:
+            touched_program_ids.add(int(program_id))
+        for touched_program_id in touched_program_ids:
+            refresh_program_open_slots(touched_program_id)
 
-        if duration == 0 or not duration:
-            new_appointment = Appointment(
-                host_id=instructor_id,
-                appointment_date=date,
-                start_time=start_datetime.strftime("%H:%M"),
-                end_time=end_datetime.strftime("%H:%M"),
-                status="posted",
-                physical_location=physical_location,
-                meeting_url=meeting_url,
-                availability_id=availability_id
-            )
-            db.session.add(new_appointment)
-        else:
-            while start_datetime + timedelta(minutes=duration) <= end_datetime:
-                new_appointment = Appointment(
-                    host_id=instructor_id,
-                    appointment_date=date,
-                    start_time=start_datetime.strftime("%H:%M"),
-                    end_time=(start_datetime + timedelta(minutes=duration)).strftime("%H:%M"),
-                    status="posted",
-                    physical_location=physical_location,
-                    meeting_url=meeting_url,
-                    availability_id=availability_id
-                )
-                start_datetime += timedelta(minutes=duration)
-                db.session.add(new_appointment)
-        
         db.session.commit()
-    
-    except Exception as e:
+        return {'availabilities_deleted': deleted, 'availabilities_added': len(availabilities), 'appointments_added': len(appointments)}
+    except Exception:
         db.session.rollback()
-        return jsonify({"error": str(e)}), 500
+        raise
+
+# validate a term of recurring availability, returning ((start_date, end_date, exdates), error response)
+def validate_rule_payload(program, data):
+    if not isinstance(data, dict):
+        return None, (jsonify({"error": "provide a start_date and end_date"}), 400)
+
+    try:
+        start_date = datetime.strptime(data.get('start_date'), "%Y-%m-%d").date()
+        end_date = datetime.strptime(data.get('end_date'), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "provide valid 'YYYY-MM-DD' start_date and end_date"}), 400)
+    if end_date < start_date or (end_date - start_date).days > 366:
+        return None, (jsonify({"error": "end_date must be on or after start_date and within a year of it"}), 400)
+
+    exdates = data.get('exdates') or []
+    if not isinstance(exdates, list):
+        return None, (jsonify({"error": "exdates must be a list of 'YYYY-MM-DD' dates"}), 400)
+    try:
+        exdates = {datetime.strptime(exdate, "%Y-%m-%d").date() for exdate in exdates}
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "exdates must be a list of 'YYYY-MM-DD' dates"}), 400)
+
+    # the weekly pattern comes from the program's times
+    if not program.program_times:
+        return None, (jsonify({"error": "set the program's times before posting recurring availability"}), 400)
+    for program_time in program.program_times:
+        if not build_weekly_rrule(program_time.day) or not program_time.start_time or not program_time.end_time \
+                or program_time.start_time >= program_time.end_time:
+            return None, (jsonify({"error": f"program time '{program_time.day}' is not a valid weekly time"}), 400)
+
+    return (start_date, end_date, exdates), None
+
+# replace a program's availabilities with recurring rules and store the dates up to the horizon (commits)
+def replace_program_availability_rules(instructor_id, program, start_date, end_date, exdates, physical_location, meeting_url):
+    try:
+        deleted = delete_program_availabilities(program.id)
+        reset_booking_counters(program.id)
+
+        rules = build_program_rules(instructor_id, program, start_date, end_date, exdates, physical_location, meeting_url)
+
+        # dates overlapping the instructor's other programs or booked meetings become exception dates
+        index = build_instructor_index(instructor_id, max(start_date, datetime.now().date()), end_date, [program.id])
+        conflicts = []
+        for rule in rules:
+            rule_entries = [(program.id, rule_date, rule.start_time, rule.end_time)
+                            for rule_date in get_rule_dates_between(rule, start_date, end_date)]
+            rule_conflicts = filter_conflicting_entries(index, rule_entries)[1]
+            if rule_conflicts:
+                rule.exdates = format_exdates(parse_exdates(rule.exdates) | {conflict['date'] for conflict in rule_conflicts})
+                conflicts.extend(rule_conflicts)
+
+        db.session.add_all(rules)
+        db.session.flush()
+
+        availability_ids = expand_rules(rules, get_expansion_horizon())
+        refresh_program_open_slots(program.id)
+
+        # formatted before the commit expires them
+        formatted_rules = [format_availability_rule(rule) for rule in rules]
+        db.session.commit()
+        return formatted_rules, {'availabilities_deleted': deleted, 'availabilities_added': len(availability_ids), 'conflicts': conflicts}
+    except Exception:
+        db.session.rollback()
+        raise
 
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 ""               Endpoint Functions                ""
@@ -273,6 +366,18 @@ def get_instructor_courses():
         user_id = get_jwt_identity()
 
         if is_instructor(user_id):
+            # the instructor's courses and their course and global programs
+            instructor_course_ids = select(CourseMembers.course_id).where(CourseMembers.user_id == user_id)
+            program_filter = or_(
+                ProgramDetails.course_id.in_(instructor_course_ids),
+                and_(ProgramDetails.course_id.is_(None), ProgramDetails.instructor_id == user_id)
+            )
+
+            etag = make_etag('instructor_programs', user_id, get_rows_version(CourseDetails, or_(CourseDetails.id.in_(instructor_course_ids), CourseDetails.instructor_id == user_id)), get_rows_version(ProgramDetails, program_filter))
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
             instructor_courses = CourseDetails.query.join(CourseMembers, CourseDetails.id == CourseMembers.course_id).filter_by(user_id=user_id).all()
             converted_courses = [{'course_id': course.id, 'course_name': course.name} for course in instructor_courses]
 
@@ -327,7 +432,7 @@ def get_instructor_courses():
                     courses_list.append(global_programs)
 
                 # courses found
-                return jsonify(courses_list), 200
+                return with_etag((jsonify(courses_list), 200), etag)
             else: 
                 # no courses found
                 return jsonify([]), 204
@@ -344,7 +449,7 @@ def get_instructor_programs_with_descriptions():
         user_id = get_jwt_identity()
 
         if is_instructor(user_id):
-            instructor = User.query.get(user_id)
+            instructor = get_user(user_id)
             programs = ProgramDetails.query.filter(ProgramDetails.instructor_id==instructor.id).all()
 
             # return list of all programs with their id, name, and description
@@ -371,20 +476,25 @@ def get_instructor_appointments():
         
         meeting_type = request.args.get('type', 'all')
         current_time_pst = datetime.now(timezone.utc) - timedelta(hours=8)  # Adjust for PST
-        current_date_str = current_time_pst.strftime('%Y-%m-%d')
-        current_time_str = current_time_pst.strftime('%H:%M')
+        current_date = current_time_pst.date()
+        current_time = current_time_pst.time().replace(second=0, microsecond=0)
 
-        appointments_query = Appointment.query.filter(Appointment.host_id == instructor_id)
+        # load the attendee, program and course with the appointments in a single SELECT
+        appointments_query = Appointment.query.options(
+            joinedload(Appointment.attendee),
+            joinedload(Appointment.course),
+            joinedload(Appointment.availability).joinedload(Availability.program_details)
+        ).filter(Appointment.host_id == instructor_id)
 
         # filter appointments based on meeting type
         if meeting_type in ['upcoming', 'past', 'pending']:
             if meeting_type == 'upcoming':
                 appointments_query = appointments_query.filter(
                     or_(
-                        Appointment.appointment_date > current_date_str,
+                        Appointment.appointment_date > current_date,
                         and_(
-                            Appointment.appointment_date == current_date_str,
-                            Appointment.start_time >= current_time_str
+                            Appointment.appointment_date == current_date,
+                            Appointment.start_time >= current_time
                         )
                     ),
                     Appointment.status == 'reserved'
@@ -392,10 +502,10 @@ def get_instructor_appointments():
             elif meeting_type == 'past':
                 appointments_query = appointments_query.filter(
                     or_(
-                        Appointment.appointment_date < current_date_str,
+                        Appointment.appointment_date < current_date,
                         and_(
-                            Appointment.appointment_date == current_date_str,
-                            Appointment.start_time < current_time_str
+                            Appointment.appointment_date == current_date,
+                            Appointment.start_time < current_time
                         )
                     ),
                     Appointment.status.in_(['reserved', 'completed', 'rejected', 'missed', 'canceled'])
@@ -403,21 +513,27 @@ def get_instructor_appointments():
             elif meeting_type == 'pending':
                 appointments_query = appointments_query.filter(
                     or_(
-                        Appointment.appointment_date > current_date_str,
+                        Appointment.appointment_date > current_date,
                         and_(
-                            Appointment.appointment_date == current_date_str,
-                            Appointment.start_time >= current_time_str
+                            Appointment.appointment_date == current_date,
+                            Appointment.start_time >= current_time
                         )
                     ),
                     Appointment.status == 'pending'
                 )
 
+        # optional program, course and date filters, then one page in (date, start_time, id) order
+        try:
+            appointments_query = apply_appointment_filters(appointments_query, request.args)
+            appointments, next_cursor = paginate_appointments(appointments_query, request.args)
+        except PaginationError as e:
+            return jsonify({"error": str(e)}), 400
+
         instructor_appointments = []
-        appointments = appointments_query.all()
 
         # iterate through appointments
         for appt in appointments:
-            attendee = User.query.get(appt.attendee_id) if appt.attendee_id else None
+            attendee = appt.attendee
             # create an object for the attendee's information
             attendee_info = {
                 "name": attendee.name,
@@ -426,8 +542,8 @@ def get_instructor_appointments():
             } if attendee else {}
 
             # get program name and course name
-            program_name = get_program_name(appt.availability.program_details.id)
-            course_name = get_course_name(appt.course_id)
+            program_name = appt.availability.program_details.name
+            course_name = appt.course.name if appt.course else None
 
             # add appointment information to instructor_appointments
             instructor_appointments.append({
@@ -445,7 +561,7 @@ def get_instructor_appointments():
                 "attendee": attendee_info
             })
 
-        return jsonify(instructor_appointments=instructor_appointments), 200
+        return jsonify(instructor_appointments=instructor_appointments, next_cursor=next_cursor), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -468,11 +584,13 @@ def cancel_appointment(appointment_id):
         if appointment.status == 'reserved' or appointment.status == 'pending' \
                 and appointment.host_id == instructor.id:
             current_time = datetime.now() - timedelta(hours=8)
-            appointment_datetime = datetime.strptime(appointment.appointment_date + ' ' + appointment.start_time, '%Y-%m-%d %H:%M')
+            appointment_datetime = datetime.combine(appointment.appointment_date, appointment.start_time)
             
             #check if the appointment is in the future
             if appointment_datetime > current_time:
                 # Make the appointment available for reservation
+                apply_status_change(appointment, appointment.status, 'canceled')
+                enqueue_calendar_delete(appointment)
                 appointment.status = 'canceled'
                 db.session.commit()
                 return jsonify({"message": "Appointment cancelled successfully"}), 200
@@ -586,6 +704,9 @@ def get_instructor_availabilities(course_id):
         
         current_date = datetime.now().date()
 
+        # store the instructor's recurring availability that has come into view
+        ensure_availability_rules_expanded(('instructor', int(user_id)), AvailabilityRule.user_id == user_id)
+
         # get the availability data for the specified instructor
         if course_id:
             # all courses selected
@@ -596,7 +717,7 @@ def get_instructor_availabilities(course_id):
             availability_data = Availability.query.join(ProgramDetails, Availability.program_id == ProgramDetails.id).filter(
                 and_(
                     Availability.user_id == user_id,
-                    Availability.date > str(current_date),
+                    Availability.date > current_date,
                     ProgramDetails.course_id == course_id
                 )
             ).all()
@@ -615,7 +736,8 @@ def get_instructor_availabilities(course_id):
                     'start_time': availability.start_time,
                     'end_time': availability.end_time,
                     'status': availability.status,
-                    'isDropins': program['isDropins']
+                    'isDropins': program['isDropins'],
+                    'rule_id': availability.rule_id
                 }
                 # add object to list
                 availability_list.append(availability_info)
@@ -641,23 +763,28 @@ def post_instructor_availabilities(course_id):
             isDropins = data.get('isDropins')
             program_id = data.get('program_id')
 
-            availabilities_to_delete = Availability.query.filter_by(program_id=program_id).all()
+            started = perf_counter()
 
-            # delete all past availabilities for the program
-            for availability in availabilities_to_delete:
-                appointments_to_delete = Appointment.query.filter_by(availability_id=availability.id).all()
+            # validate the whole payload before anything is deleted
+            validated, error_response = validate_availability_payload(user_id, course_id, allAvailabilties, duration, isDropins)
+            if error_response:
+                return error_response
+            entries, duration = validated
+            entries, skipped = filter_availability_entries(entries)
 
-                # delete all past appointments for the availability
-                for appointment in appointments_to_delete:
-                    db.session.delete(appointment)
-
-                db.session.delete(availability)
+            # entries overlapping the instructor's other programs or booked meetings are skipped and reported
+            entries, conflicts = find_availability_conflicts(user_id, entries, [program_id] if program_id else [])
 
-            # add availabilities to the Availability Table
-            for availabilityEntry in allAvailabilties:
-                add_instructor_availability(course_id, user_id, availabilityEntry, physical_location, meeting_url, duration, isDropins)
+            # replace all availabilities for the program
+            counts = replace_program_availabilities(user_id, program_id, entries, physical_location, meeting_url, duration, isDropins)
 
-            return jsonify({"message": "all availability added successfully"}), 201
+            return jsonify({
+                "message": "all availability added successfully",
+                **counts,
+                "skipped": skipped + len(conflicts),
+                "conflicts": conflicts,
+                "elapsed_ms": round((perf_counter() - started) * 1000, 1),
+            }), 201
         else:
             return jsonify({"error": "Instructor not found"}), 404
     except Exception as e:
@@ -682,59 +809,39 @@ def update_availability_status():
         availability = Availability.query.filter_by(id=availability_id, user_id=user_id).first()
 
         if availability:
-            parsed_appointment_date = datetime.strptime(availability.date, '%Y-%m-%d')
-            start_of_week, end_of_week = get_week_range(availability.date)
-
             # set all appointments to inactive if availability is set to inactive
             if status == 'inactive':
                 availability.status = status
                 appointments = Appointment.query.filter_by(availability_id=availability_id, status='posted').all()
                 for appointment in appointments:
                     appointment.status = 'inactive'
+                refresh_availability_open_slots([availability.id])
                 db.session.commit()
             # set all appointments to posted if availability is set to active and limits are not reached
             elif status == 'active':
-                # calculate monthly count of reserved and pending appointments
-                monthly_count = Appointment.query.filter(
-                    Appointment.host_id == user_id,
-                    extract('month', func.date(Appointment.appointment_date)) == parsed_appointment_date.month,
-                    extract('year', func.date(Appointment.appointment_date)) == parsed_appointment_date.year,
-                    Appointment.status.in_(['reserved', 'pending'])
-                ).count()
-
-                # calculate weekly count of reserved and pending appointments
-                weekly_count = Appointment.query.filter(
-                    Appointment.host_id == user_id,
-                    func.date(Appointment.appointment_date).between(start_of_week, end_of_week),
-                    Appointment.status.in_(['reserved', 'pending'])
-                ).count()
-
-                # calculate daily count of reserved and pending appointments
-                daily_count = Appointment.query.filter(
-                    Appointment.host_id == user_id,
-                    func.date(Appointment.appointment_date) == parsed_appointment_date,
-                    Appointment.status.in_(['reserved', 'pending'])
-                ).count()
-
-                program = ProgramDetails.query.filter_by(id=availability.program_id).first()
+                # current reserved and pending appointments for the day, week and month
+                counts = get_booking_counts(user_id, availability.program_id, availability.date)
+                limits = get_program_limits(availability.program_details)
 
                 error_message = "Meeting limit reached"
 
                 # compare calculations and limits
-                if program.max_monthly_meetings is not None and monthly_count >= program.max_monthly_meetings:
+                if limits['monthly'] is not None and counts['monthly'] >= limits['monthly']:
                     error_message = "Monthly meeting limit reached"
-                elif program.max_weekly_meetings is not None and weekly_count >= program.max_weekly_meetings:
+                elif limits['weekly'] is not None and counts['weekly'] >= limits['weekly']:
                     error_message = "Weekly meeting limit reached"
-                elif program.max_daily_meetings is not None and daily_count >= program.max_daily_meetings:
+                elif limits['daily'] is not None and counts['daily'] >= limits['daily']:
                     error_message = "Daily meeting limit reached"
 
                 if error_message != "Meeting limit reached":
+                    db.session.commit()
                     return jsonify({"error": error_message}), 409
 
                 appointments = Appointment.query.filter_by(availability_id=availability_id, status='inactive').all()
                 availability.status = status
                 for appointment in appointments:
                     appointment.status = 'posted'
+                refresh_availability_open_slots([availability.id])
                 db.session.commit()
             return jsonify({"message": "status updated successfully"}), 200
         else:
@@ -753,7 +860,9 @@ def delete_instructor_availabililty(availability_id):
             availability = Availability.query.get(availability_id)
 
             if availability and availability.user_id == int(instructor_id):
+                reset_booking_counters(availability.program_id)
                 db.session.delete(availability)
+                refresh_availability_open_slots([availability.id])
                 db.session.commit()
                 return jsonify({"message": "delete successful"}), 200
             else:
@@ -763,4 +872,57 @@ def delete_instructor_availabililty(availability_id):
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+    
+# fetch the recurring availability rules of a program
+@instructor.route('/instructor/programs/<program_id>/availability-rules', methods=['GET'])
+@jwt_required()
+def get_availability_rules(program_id):
+    try:
+        user_id = get_jwt_identity()
+
+        if not is_instructor(user_id):
+            return jsonify({"error": "Instructor not found"}), 404
+
+        program = ProgramDetails.query.filter_by(id=program_id, instructor_id=user_id).first()
+        if not program:
+            return jsonify({"error": "Program not found"}), 404
+
+        rules = AvailabilityRule.query.filter_by(program_id=program.id).order_by(AvailabilityRule.id).all()
+        return jsonify({"availability_rules": [format_availability_rule(rule) for rule in rules]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# replace a program's availability with weekly rules built from its times, a term range and exception dates
+@instructor.route('/instructor/programs/<program_id>/availability-rules', methods=['POST'])
+@jwt_required()
+def post_availability_rules(program_id):
+    try:
+        user_id = get_jwt_identity()
+
+        if not is_instructor(user_id):
+            return jsonify({"error": "Instructor not found"}), 404
+
+        program = ProgramDetails.query.options(joinedload(ProgramDetails.program_times)).filter_by(
+            id=program_id, instructor_id=user_id
+        ).first()
+        if not program:
+            return jsonify({"error": "Program not found"}), 404
+
+        data = request.get_json()
+        validated, error_response = validate_rule_payload(program, data)
+        if error_response:
+            return error_response
+        start_date, end_date, exdates = validated
+
+        rules, counts = replace_program_availability_rules(int(user_id), program, start_date, end_date, exdates,
+                                                           data.get('physical_location'), data.get('meeting_url'))
+
+        return jsonify({
+            "message": "availability rules added successfully",
+            "availability_rules": rules,
+            **counts,
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
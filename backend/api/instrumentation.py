@@ -0,0 +1,172 @@
+"""
+ * instrumentation.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the per-request performance instrumentation registered in
+ * create_app. Every request records its wall time, the number of SQL
+ * statements and their total time, and the time spent in outbound HTTP calls
+ * (Graph, MSAL, SendGrid). The numbers are sent back in a Server-Timing header
+ * and written as one JSON log line per request. Statements slower than
+ * PERF_SLOW_QUERY_MS are logged with the code that ran them, in requests and
+ * in the workers.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import os
+import json
+import logging
+import traceback
+import requests
+from contextlib import contextmanager
+from time import perf_counter
+from flask import g, request, current_app, has_app_context, has_request_context
+from sqlalchemy import event
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# files skipped when looking for the code that ran a slow statement
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTRUMENTATION_FILE = os.path.abspath(__file__)
+
+# timings collected for the current request
+class RequestMetrics:
+    def __init__(self):
+        self.started = perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.http = {}  # service -> [call count, seconds]
+
+    def add_query(self, seconds):
+        self.sql_count += 1
+        self.sql_seconds += seconds
+
+    def add_http(self, service, seconds):
+        calls = self.http.setdefault(service, [0, 0.0])
+        calls[0] += 1
+        calls[1] += seconds
+
+# requests.Session that adds the time of every call to the current request's outbound HTTP time
+class TimedSession(requests.Session):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def request(self, *args, **kwargs):
+        with track_http(self.service):
+            return super().request(*args, **kwargs)
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# the current request's metrics, None outside of an instrumented request
+def get_request_metrics():
+    if not has_request_context():
+        return None
+    return g.get('request_metrics')
+
+# add the time spent in an outbound call to the current request
+@contextmanager
+def track_http(service):
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics = get_request_metrics()
+        if metrics is not None:
+            metrics.add_http(service, perf_counter() - started)
+
+# the first frame of our own code that led to a statement, as "file.py:line in function"
+def find_caller():
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(API_DIR) and filename != INSTRUMENTATION_FILE:
+            return f"{os.path.relpath(filename, os.path.dirname(API_DIR))}:{frame.lineno} in {frame.name}"
+    return None
+
+# start timing a statement
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(perf_counter())
+
+# add a finished statement to the request and log it if it was slow
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    seconds = perf_counter() - started.pop()
+
+    metrics = get_request_metrics()
+    if metrics is not None:
+        metrics.add_query(seconds)
+
+    threshold_ms = current_app.config.get('PERF_SLOW_QUERY_MS') if has_app_context() else None
+    if threshold_ms is not None and seconds * 1000 >= threshold_ms:
+        logger.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(seconds * 1000, 1),
+            'statement': statement,
+            'caller': find_caller(),
+            'path': request.path if has_request_context() else None,
+        }))
+
+# listen to an engine's statements once
+def instrument_engine(engine):
+    if not event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+# Server-Timing header value for a request's metrics
+def build_server_timing(metrics, total_seconds):
+    entries = [
+        f'app;dur={total_seconds * 1000:.1f}',
+        f'db;desc="{metrics.sql_count} queries";dur={metrics.sql_seconds * 1000:.1f}',
+    ]
+    for service, (count, seconds) in metrics.http.items():
+        entries.append(f'{service};desc="{count} calls";dur={seconds * 1000:.1f}')
+    return ', '.join(entries)
+
+# start collecting metrics for a request
+def start_request_metrics():
+    g.request_metrics = RequestMetrics()
+
+# attach the Server-Timing header and write the request's log line
+def finish_request_metrics(response):
+    metrics = get_request_metrics()
+    if metrics is None:
+        return response
+
+    total_seconds = perf_counter() - metrics.started
+    response.headers['Server-Timing'] = build_server_timing(metrics, total_seconds)
+
+    logger.info(json.dumps({
+        'event': 'request',
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total_seconds * 1000, 1),
+        'sql_count': metrics.sql_count,
+        'sql_ms': round(metrics.sql_seconds * 1000, 1),
+        'http': {service: {'calls': count, 'ms': round(seconds * 1000, 1)} for service, (count, seconds) in metrics.http.items()},
+    }))
+    return response
+
+# register the request hooks and statement listeners when PERF_INSTRUMENTATION is on
+def init_instrumentation(app):
+    if not app.config.get('PERF_INSTRUMENTATION', True):
+        return
+
+    with app.app_context():
+        instrument_engine(db.engine)
+
+    # request lines are logged at INFO, make sure they are written somewhere outside of tests
+    logger.setLevel(logging.INFO)
+    if not app.testing and not logger.handlers and not logging.getLogger().handlers:
+        logger.addHandler(logging.StreamHandler())
+
+    app.before_request(start_request_metrics)
+    app.after_request(finish_request_metrics)
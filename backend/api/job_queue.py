@@ -0,0 +1,113 @@
+"""
+ * job_queue.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the worker loop shared by the queues stored in the database (the
+ * email outbox and the calendar sync jobs). Workers claim due rows under a
+ * lease so no two of them run the same row, failed rows are retried with
+ * exponential backoff, and each queue gets a drain command (run what is due
+ * once) and a work command (keep running until stopped). The settings of a
+ * queue are read from the app config under its prefix, e.g.
+ * OUTBOX_BATCH_SIZE or CALENDAR_SYNC_LEASE_SECONDS.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import time
+import click
+from flask import current_app
+from sqlalchemy import update, select
+from . import db
+from datetime import datetime, timedelta
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# read a queue setting, e.g. prefix OUTBOX and name BATCH_SIZE, falling back to its default
+def get_queue_setting(prefix, name, default):
+    return current_app.config.get(f"{prefix}_{name}", default)
+
+# seconds to wait before the next attempt of a row that failed attempts times
+def get_backoff_seconds(prefix, attempts):
+    return get_queue_setting(prefix, 'BACKOFF_SECONDS', 30) * 2 ** (attempts - 1)
+
+# claim up to batch_size due rows of a queue model by moving them to claimed_status (commits)
+def claim_due_rows(model, prefix, claimed_status, batch_size):
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=get_queue_setting(prefix, 'LEASE_SECONDS', 300))
+    claimable = [model.status.in_(['pending', claimed_status]), model.next_attempt_at <= now]
+
+    # rows left in claimed_status by a worker that died are picked up again once their lease expires
+    due_ids = db.session.execute(
+        select(model.id)
+        .where(*claimable)
+        .order_by(model.next_attempt_at, model.id)
+        .limit(batch_size)
+    ).scalars().all()
+
+    claimed_ids = []
+    for row_id in due_ids:
+        result = db.session.execute(
+            update(model)
+            .where(model.id == row_id, *claimable)
+            .values(status=claimed_status, next_attempt_at=lease_until),
+            execution_options={'synchronize_session': False}
+        )
+        if result.rowcount == 1:
+            claimed_ids.append(row_id)
+    db.session.commit()
+
+    if not claimed_ids:
+        return []
+    return model.query.filter(model.id.in_(claimed_ids)).order_by(model.id).all()
+
+# claim and run due rows until none are left and return how many ended in each outcome
+# run_rows(rows, max_attempts) returns one outcome per row; each batch is committed after it runs
+def drain_queue(model, prefix, claimed_status, run_rows, outcomes, batch_size=None, max_attempts=None):
+    batch_size = batch_size or get_queue_setting(prefix, 'BATCH_SIZE', 50)
+    max_attempts = max_attempts or get_queue_setting(prefix, 'MAX_ATTEMPTS', 5)
+    results = dict.fromkeys(outcomes, 0)
+
+    while True:
+        rows = claim_due_rows(model, prefix, claimed_status, batch_size)
+        if not rows:
+            return results
+
+        for outcome in run_rows(rows, max_attempts):
+            results[outcome] += 1
+        db.session.commit()
+
+# e.g. "sent 1, retried 0, failed 0"
+def format_results(results):
+    return ', '.join(f"{outcome} {count}" for outcome, count in results.items())
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# add the drain and work commands of a queue to its CLI group; drain(batch_size) runs what is due once
+def add_queue_commands(cli, drain, name, rows_name):
+    # run the rows that are due once and exit
+    @cli.command('drain')
+    @click.option('--batch-size', type=int, default=None, help=f'{rows_name} claimed per transaction.')
+    def drain_command(batch_size):
+        click.echo(format_results(drain(batch_size)))
+
+    # keep running rows until stopped
+    @cli.command('work')
+    @click.option('--interval', type=float, default=5.0, help=f'Seconds to wait when no {rows_name.lower()} are due.')
+    @click.option('--batch-size', type=int, default=None, help=f'{rows_name} claimed per transaction.')
+    def work_command(interval, batch_size):
+        click.echo(f'{name} worker started')
+        while True:
+            try:
+                results = drain(batch_size)
+                if any(results.values()):
+                    click.echo(format_results(results))
+            except Exception as e:
+                db.session.rollback()
+                click.echo(f"{name} worker error: {str(e)}", err=True)
+            time.sleep(interval)
@@ -1,8 +1,9 @@
 """ 
  * mail.py
- * Last Edited: 3/26/24
+ * Last Edited: 10/18/26
  *
- * Contains functions used to send emails when appointments are booked
+ * Contains functions used to send emails when appointments are booked.
+ * Emails are queued in the outbox (outbox.py) and delivered here by the worker.
  *
  * Known Bugs:
  * - not sure if this system works
@@ -12,18 +13,48 @@
 # using SendGrid's Python Library
 # https://github.com/sendgrid/sendgrid-python
 import os
+from flask import current_app
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
 from dotenv import load_dotenv
 import base64
+from .instrumentation import track_http
+
+# local stand-in for SendGrid that keeps messages in memory (MAIL_BACKEND = 'fake')
+class FakeSendGridSink:
+    def __init__(self):
+        self.messages = []
+        self.failures = 0
+
+    # make the next n sends raise, like a SendGrid outage
+    def fail_next(self, count=1):
+        self.failures = count
+
+    def send(self, message):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("fake SendGrid failure")
+        self.messages.append(message.get())
+
+    def clear(self):
+        self.messages = []
+        self.failures = 0
+
+fake_sendgrid = FakeSendGridSink()
 
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 ""             Backend Only Functions              ""
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 
 load_dotenv()
+
+# return the client emails are pushed to, picked by the MAIL_BACKEND config
+def get_mail_client():
+    if current_app.config.get('MAIL_BACKEND', 'sendgrid') == 'fake':
+        return fake_sendgrid
+    return SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
         
-# push email object to SendGrid API
+# push email object to SendGrid API, raising if it could not be delivered
 def send_email(to_email, subject, html_content, ics_data):
     # Create an email message
     message = Mail(
@@ -32,19 +63,17 @@ def send_email(to_email, subject, html_content, ics_data):
         subject=subject,
         html_content=html_content)
 
-    # Encode the ICS data as base64
-    ics_encoded = base64.b64encode(ics_data.encode()).decode()
-
-    # Create the attachment
-    attachment = Attachment()
-    attachment.file_content = FileContent(ics_encoded)
-    attachment.file_type = FileType('text/calendar') 
-    attachment.file_name = FileName('Appointment.ics')
-    attachment.disposition = Disposition('attachment')
-    message.attachment = attachment
-
-    try:
-        sendgrid_client = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-        sendgrid_client.send(message)
-    except Exception as e:
-        print(f"fwafaw: {str(e)}")
\ No newline at end of file
+    if ics_data:
+        # Encode the ICS data as base64
+        ics_encoded = base64.b64encode(ics_data.encode()).decode()
+
+        # Create the attachment
+        attachment = Attachment()
+        attachment.file_content = FileContent(ics_encoded)
+        attachment.file_type = FileType('text/calendar') 
+        attachment.file_name = FileName('Appointment.ics')
+        attachment.disposition = Disposition('attachment')
+        message.attachment = attachment
+
+    with track_http('sendgrid'):
+        get_mail_client().send(message)
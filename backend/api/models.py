@@ -36,22 +36,29 @@ class CourseDetails(db.Model):
     recordings_link = db.Column(db.String(255))
     discord_link = db.Column(db.String(255))
     comments = db.Column(db.Text)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped when the course or its times change
     times = db.relationship("CourseTimes", back_populates="course_details")
 
 class CourseTimes(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course_details.id'))
     day = db.Column(db.String(50))
-    start_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
-    end_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
+    start_time = db.Column(db.Time)  # HH:MM
+    end_time = db.Column(db.Time)  # HH:MM
     course_details = db.relationship("CourseDetails", back_populates="times")
     
 class CourseMembers(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_id', name='uq_course_members_user_course'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course_details.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
 class ProgramDetails(db.Model):
+    __table_args__ = (
+        db.Index('ix_program_details_course_instructor', 'course_id', 'instructor_id'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     course_id = db.Column(db.Integer, db.ForeignKey('course_details.id'))
     instructor_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -66,6 +73,7 @@ class ProgramDetails(db.Model):
     max_monthly_meetings = db.Column(db.Integer)
     isDropins = db.Column(db.Boolean)
     isRangeBased = db.Column(db.Boolean)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # bumped when the program or its times change
     availability = db.relationship("Availability", back_populates="program_details")
     program_times = db.relationship("ProgramTimes", back_populates="program_details")
 
@@ -73,34 +81,75 @@ class ProgramTimes(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     program_id = db.Column(db.Integer, db.ForeignKey('program_details.id'))
     day = db.Column(db.String(50))
-    start_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
-    end_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
+    start_time = db.Column(db.Time)  # HH:MM
+    end_time = db.Column(db.Time)  # HH:MM
     program_details = db.relationship("ProgramDetails", back_populates="program_times")
 
+class AvailabilityRule(db.Model):
+    __table_args__ = (
+        db.Index('ix_availability_rule_program_id', 'program_id'),
+        # rules whose availabilities stop before the visible window
+        db.Index('ix_availability_rule_status_expanded', 'status', 'expanded_until'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    program_id = db.Column(db.Integer, db.ForeignKey('program_details.id'))
+    day = db.Column(db.String(50))  # the ProgramTimes day the rule was derived from
+    rrule = db.Column(db.String(255), nullable=False)  # RFC 5545 RRULE, e.g. FREQ=WEEKLY;BYDAY=MO
+    start_date = db.Column(db.Date, nullable=False)  # YYYY-MM-DD, first day of the term
+    end_date = db.Column(db.Date, nullable=False)  # YYYY-MM-DD, last day of the term
+    start_time = db.Column(db.Time)  # HH:MM
+    end_time = db.Column(db.Time)  # HH:MM
+    exdates = db.Column(db.Text)  # comma separated YYYY-MM-DD dates without a meeting
+    status = db.Column(db.String(50))  # active, inactive
+    physical_location = db.Column(db.String(255))
+    meeting_url = db.Column(db.String(255))
+    expanded_until = db.Column(db.Date, nullable=False)  # last date stored as Availability rows
+    availabilities = db.relationship('Availability', back_populates='rule')
+    program_details = db.relationship('ProgramDetails')
+
 class Availability(db.Model):
+    __table_args__ = (
+        db.Index('ix_availability_user_program_date', 'user_id', 'program_id', 'date'),
+        # at most one availability per rule and date, so a rule cannot be expanded twice
+        db.UniqueConstraint('rule_id', 'date', name='uq_availability_rule_date'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     program_id = db.Column(db.Integer, db.ForeignKey('program_details.id'))  
-    date = db.Column(db.String(150))  # YYYY-MM-DD
-    start_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
-    end_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
+    rule_id = db.Column(db.Integer, db.ForeignKey('availability_rule.id'))  # NULL for dates posted one by one
+    date = db.Column(db.Date)  # YYYY-MM-DD
+    start_time = db.Column(db.Time)  # HH:MM
+    end_time = db.Column(db.Time)  # HH:MM
     status = db.Column(db.String(50))  # active, inactive
+    physical_location = db.Column(db.String(255))  # copied to the slots materialized from this availability
+    meeting_url = db.Column(db.String(255))
     appointments = db.relationship(
         'Appointment', 
         back_populates='availability', 
         cascade='all, delete-orphan'
     )
     program_details = db.relationship("ProgramDetails", back_populates="availability")
+    rule = db.relationship('AvailabilityRule', back_populates='availabilities')
 
 class Appointment(db.Model):
+    __table_args__ = (
+        # limit counts and status updates for a host's day/week/month
+        db.Index('ix_appointment_host_date_status', 'host_id', 'appointment_date', 'status'),
+        # a student's upcoming/past/pending appointments
+        db.Index('ix_appointment_attendee_status_date', 'attendee_id', 'status', 'appointment_date'),
+        db.Index('ix_appointment_availability_id', 'availability_id'),
+        # at most one row per slot, so a virtual slot cannot be materialized twice
+        db.UniqueConstraint('availability_id', 'start_time', name='uq_appointment_availability_start'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     host_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     course_id = db.Column(db.Integer, db.ForeignKey('course_details.id'))  
     attendee_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     availability_id = db.Column(db.Integer, db.ForeignKey('availability.id'))
-    appointment_date = db.Column(db.String(150))  # YYYY-MM-DD
-    start_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
-    end_time = db.Column(db.String(150))  # YYYY-MM-DDTHH:MM:SS
+    appointment_date = db.Column(db.Date)  # YYYY-MM-DD
+    start_time = db.Column(db.Time)  # HH:MM
+    end_time = db.Column(db.Time)  # HH:MM
     event_id = db.Column(db.String(255)) #new
     physical_location = db.Column(db.String(255))
     # course_name = db.Column(db.String(255), nullable=True)
@@ -108,9 +157,15 @@ class Appointment(db.Model):
     notes = db.Column(db.Text)
     status = db.Column(db.String(50))  # posted, booked, cancelled
     availability = db.relationship('Availability', back_populates='appointments')
+    host = db.relationship('User', foreign_keys=[host_id])
+    attendee = db.relationship('User', foreign_keys=[attendee_id])
+    course = db.relationship('CourseDetails')
     appointment_comment = db.relationship('AppointmentComment', backref='appointment', cascade='all, delete-orphan')
     
 class AppointmentComment(db.Model):
+    __table_args__ = (
+        db.Index('ix_appointment_comment_appointment_id', 'appointment_id'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     appointment_id = db.Column(db.Integer, db.ForeignKey('appointment.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -119,6 +174,9 @@ class AppointmentComment(db.Model):
     # updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Feedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_feedback_appointment_id', 'appointment_id'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     appointment_id = db.Column(db.Integer, db.ForeignKey('appointment.id'))
     attendee_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -126,4 +184,106 @@ class Feedback(db.Model):
     attendee_rating = db.Column(db.String(255))
     attendee_notes = db.Column(db.Text)
     host_rating = db.Column(db.String(255))
-    host_notes = db.Column(db.Text)
\ No newline at end of file
+    host_notes = db.Column(db.Text)
+
+class HostBookingCounter(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('host_id', 'program_id', 'period_kind', 'period_start', name='uq_host_booking_counter_period'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    host_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    program_id = db.Column(db.Integer, db.ForeignKey('program_details.id'), nullable=False)
+    period_kind = db.Column(db.String(10), nullable=False)  # daily, weekly, monthly
+    period_start = db.Column(db.Date, nullable=False)  # first day of the day/week/month
+    count = db.Column(db.Integer, nullable=False, default=0)  # reserved and pending appointments
+
+class EmailOutbox(db.Model):
+    __table_args__ = (
+        # the worker's "next due emails" query
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    to_email = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String(255))
+    html_content = db.Column(db.Text)
+    ics_data = db.Column(db.Text)
+    status = db.Column(db.String(50), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class ServerSession(db.Model):
+    __table_args__ = (
+        # expiry based garbage collection
+        db.Index('ix_server_session_expires_at', 'expires_at'),
+    )
+    id = db.Column(db.String(64), primary_key=True)  # session id stored in the signed cookie
+    data = db.Column(db.Text)  # serialized session dict
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class CalendarEventMirror(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('owner_id', 'event_id', name='uq_calendar_event_mirror_owner_event'),
+        db.Index('ix_calendar_event_mirror_owner_start', 'owner_id', 'start_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    owner_id = db.Column(db.String(255), nullable=False)  # Microsoft account the calendar belongs to
+    event_id = db.Column(db.String(255), nullable=False)  # Graph event id
+    start_at = db.Column(db.DateTime)  # UTC
+    end_at = db.Column(db.DateTime)  # UTC
+    data = db.Column(db.Text)  # event JSON as returned by Graph
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CalendarSyncState(db.Model):
+    owner_id = db.Column(db.String(255), primary_key=True)
+    delta_link = db.Column(db.Text)  # @odata.deltaLink to resume from
+    window_start = db.Column(db.DateTime)  # calendarView range the delta link was created for (UTC)
+    window_end = db.Column(db.DateTime)
+    synced_at = db.Column(db.DateTime)
+
+class MsalTokenCache(db.Model):
+    account_id = db.Column(db.String(255), primary_key=True)  # MSAL home_account_id
+    cache_data = db.Column(db.Text, nullable=False)  # SerializableTokenCache.serialize()
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CalendarSyncJob(db.Model):
+    __table_args__ = (
+        # the worker's "next due jobs" query
+        db.Index('ix_calendar_sync_job_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_calendar_sync_job_appointment', 'appointment_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    appointment_id = db.Column(db.Integer, nullable=False)  # no foreign key: the appointment may be deleted before a delete job runs
+    account_id = db.Column(db.String(255), nullable=False)  # Microsoft account whose calendar holds the event
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete
+    event_id = db.Column(db.String(255))  # Graph event id (set by create, used by update/delete)
+    idempotency_key = db.Column(db.String(64), nullable=False, unique=True)  # sent to Graph as the event's transactionId
+    status = db.Column(db.String(50), nullable=False, default='pending')  # pending, running, done, failed, cancelled
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+class OpenSlot(db.Model):
+    __table_args__ = (
+        # student browse reads: one range scan per course/program and date
+        db.Index('ix_open_slot_course_program_date', 'course_id', 'program_id', 'date', 'start_time'),
+        db.Index('ix_open_slot_availability_start', 'availability_id', 'start_time'),
+        db.Index('ix_open_slot_dropin_instructor', 'is_dropin', 'instructor_id', 'course_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    course_id = db.Column(db.Integer)  # program's course, NULL for global programs
+    program_id = db.Column(db.Integer, nullable=False)
+    instructor_id = db.Column(db.Integer)  # program's instructor, used to find global drop-ins
+    availability_id = db.Column(db.Integer, nullable=False)
+    appointment_id = db.Column(db.Integer)  # NULL for slots that are not stored yet (virtual slots and drop-ins)
+    is_dropin = db.Column(db.Boolean, nullable=False, default=False)
+    program_name = db.Column(db.String(150))
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    physical_location = db.Column(db.String(255))
+    meeting_url = db.Column(db.String(255))
@@ -0,0 +1,148 @@
+"""
+ * open_slots.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the OpenSlot read model behind the student browse endpoints.
+ * OpenSlot holds one row per bookable appointment slot (stored or virtual)
+ * and one row per drop-in availability, keyed by (course_id, program_id,
+ * date). Writers refresh the rows of the availabilities or programs they
+ * change in the same transaction, so reads are a single indexed range scan.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert, delete, or_, and_
+from sqlalchemy.orm import joinedload
+from .models import OpenSlot, Availability, Appointment
+from .slots import get_slot_windows, virtual_slots_enabled
+from . import db
+
+open_slots_cli = AppGroup('open-slots', help='Maintain the slots listed to students.')
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# OpenSlot rows for a set of availabilities (loaded with their programs)
+def build_open_slot_rows(availabilities):
+    if not availabilities:
+        return []
+    availability_ids = [availability.id for availability in availabilities]
+
+    # one query for the stored slots of every availability (plain rows, no ORM objects)
+    appointments = db.session.query(
+        Appointment.id, Appointment.availability_id, Appointment.appointment_date, Appointment.start_time,
+        Appointment.end_time, Appointment.status, Appointment.physical_location, Appointment.meeting_url
+    ).filter(Appointment.availability_id.in_(availability_ids)).all()
+    posted = {}
+    materialized = set()
+    for appointment in appointments:
+        materialized.add((appointment.availability_id, appointment.start_time))
+        if appointment.status == 'posted':
+            posted.setdefault(appointment.availability_id, []).append(appointment)
+
+    virtual = virtual_slots_enabled()
+    rows = []
+    for availability in availabilities:
+        program = availability.program_details
+        if not program:
+            continue
+        row = {
+            'course_id': program.course_id,
+            'program_id': program.id,
+            'instructor_id': program.instructor_id,
+            'availability_id': availability.id,
+            'program_name': program.name,
+        }
+
+        # drop-ins are listed per availability
+        if program.isDropins:
+            rows.append(dict(row, appointment_id=None, is_dropin=True, date=availability.date,
+                             start_time=availability.start_time, end_time=availability.end_time,
+                             physical_location=availability.physical_location or program.physical_location,
+                             meeting_url=availability.meeting_url or program.meeting_url))
+            continue
+
+        for appointment in posted.get(availability.id, []):
+            rows.append(dict(row, appointment_id=appointment.id, is_dropin=False, date=appointment.appointment_date,
+                             start_time=appointment.start_time, end_time=appointment.end_time,
+                             physical_location=appointment.physical_location, meeting_url=appointment.meeting_url))
+
+        # slots without a row yet
+        if virtual and availability.status == 'active':
+            for start_time, end_time in get_slot_windows(availability.date, availability.start_time, availability.end_time, program.duration):
+                if (availability.id, start_time) in materialized:
+                    continue
+                rows.append(dict(row, appointment_id=None, is_dropin=False, date=availability.date,
+                                 start_time=start_time, end_time=end_time,
+                                 physical_location=availability.physical_location or program.physical_location,
+                                 meeting_url=availability.meeting_url or program.meeting_url))
+    return rows
+
+# rebuild the open slots of some availabilities (does not commit)
+def refresh_availability_open_slots(availability_ids):
+    availability_ids = [int(availability_id) for availability_id in availability_ids]
+    if not availability_ids:
+        return 0
+    db.session.flush()
+    db.session.execute(delete(OpenSlot).where(OpenSlot.availability_id.in_(availability_ids)))
+
+    availabilities = Availability.query.options(joinedload(Availability.program_details)).filter(
+        Availability.id.in_(availability_ids)
+    ).all()
+    rows = build_open_slot_rows(availabilities)
+    if rows:
+        db.session.execute(insert(OpenSlot), rows)
+    return len(rows)
+
+# rebuild the open slots of a program, e.g. after its details or availabilities changed (does not commit)
+def refresh_program_open_slots(program_id):
+    db.session.flush()
+    db.session.execute(delete(OpenSlot).where(OpenSlot.program_id == program_id))
+
+    availabilities = Availability.query.options(joinedload(Availability.program_details)).filter(
+        Availability.program_id == program_id
+    ).all()
+    rows = build_open_slot_rows(availabilities)
+    if rows:
+        db.session.execute(insert(OpenSlot), rows)
+    return len(rows)
+
+# take a just-booked slot off the listings (does not commit)
+def remove_open_slot(appointment):
+    db.session.execute(delete(OpenSlot).where(
+        OpenSlot.availability_id == appointment.availability_id,
+        OpenSlot.start_time == appointment.start_time
+    ))
+
+# take several just-booked slots off the listings with one statement (does not commit)
+def remove_open_slots(appointments):
+    if not appointments:
+        return
+    db.session.execute(delete(OpenSlot).where(or_(*[
+        and_(OpenSlot.availability_id == appointment.availability_id, OpenSlot.start_time == appointment.start_time)
+        for appointment in appointments
+    ])))
+
+# rebuild every open slot, for existing databases and after bulk changes (commits)
+def rebuild_open_slots():
+    db.session.execute(delete(OpenSlot))
+    availabilities = Availability.query.options(joinedload(Availability.program_details)).all()
+    rows = build_open_slot_rows(availabilities)
+    if rows:
+        db.session.execute(insert(OpenSlot), rows)
+    db.session.commit()
+    return len(rows)
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# rebuild the read model from the availabilities and appointments
+@open_slots_cli.command('rebuild')
+def rebuild_command():
+    click.echo(f"stored {rebuild_open_slots()} open slots")
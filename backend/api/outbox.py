@@ -0,0 +1,74 @@
+"""
+ * outbox.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the email outbox. Requests queue emails in the same transaction
+ * as the change they describe, and the worker (flask outbox work) delivers
+ * them in batches, retrying failures with exponential backoff. Claiming,
+ * backoff and the worker loop are shared with the calendar jobs in
+ * job_queue.py.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+from flask.cli import AppGroup
+from .models import EmailOutbox
+from .mail import send_email
+from .job_queue import get_backoff_seconds, drain_queue, add_queue_commands
+from . import db
+from datetime import datetime, timedelta
+
+outbox_cli = AppGroup('outbox', help='Deliver queued emails.')
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# queue an email to be sent once the current transaction commits (does not commit)
+def enqueue_email(to_email, subject, html_content, ics_data=None):
+    email = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        ics_data=ics_data,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(email)
+    return email
+
+# send one claimed email and record the outcome (committed with the rest of the batch)
+def deliver_email(email, max_attempts):
+    try:
+        send_email(email.to_email, email.subject, email.html_content, email.ics_data)
+        email.status = 'sent'
+        email.sent_at = datetime.utcnow()
+        email.last_error = None
+        return 'sent'
+    except Exception as e:
+        email.attempts += 1
+        email.last_error = str(e)
+
+        if email.attempts >= max_attempts:
+            email.status = 'failed'
+            return 'failed'
+
+        email.status = 'pending'
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=get_backoff_seconds('OUTBOX', email.attempts))
+        return 'retried'
+
+# deliver every email that is currently due and return how many were sent, retried and failed
+def drain_outbox(batch_size=None, max_attempts=None):
+    return drain_queue(EmailOutbox, 'OUTBOX', 'sending',
+                       lambda emails, max_attempts: [deliver_email(email, max_attempts) for email in emails],
+                       ['sent', 'retried', 'failed'], batch_size, max_attempts)
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# flask outbox drain delivers the emails that are due once, flask outbox work keeps delivering them until stopped
+add_queue_commands(outbox_cli, drain_outbox, 'outbox', 'Emails')
@@ -3,8 +3,7 @@ import webbrowser
 import json
 import requests
 from msal import ConfidentialClientApplication, SerializableTokenCache
-from flask import Flask, Blueprint, jsonify, request, redirect, session 
-from flask_session import Session
+from flask import Flask, Blueprint, jsonify, request, redirect, session, current_app
 from flask_cors import CORS
 from requests_oauthlib import OAuth2Session
 from oauthlib.oauth2 import BackendApplicationClient
@@ -12,8 +11,13 @@ from datetime import datetime
 from dotenv import load_dotenv
 import pytz
 import jwt
-from .models import db, User, CourseDetails
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from .models import db, User, CourseDetails, Appointment
 from dateutil import parser
+from .calendar_sync import graph_url, graph_session, sync_calendar, is_mirror_fresh, get_mirrored_events
+from .graph_batch import GraphBatch, apply_batch_results
+from .token_cache import get_token_store
+from .instrumentation import track_http
 
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 load_dotenv()
@@ -36,73 +40,159 @@ class OutlookCalendarService:
         self.tenant_id = os.getenv('TENANT_ID')
         self.authority = os.getenv('AUTHORITY')
         self.redirect_uri = os.getenv('REDIRECT_URI')
-        self.cache = SerializableTokenCache()
-        
-        # MSAL ConfidentialClientApplication instance 
-        self.client_app = ConfidentialClientApplication(
+        self._client_app = None
+
+    # MSAL app bound to token_cache (building one contacts the authority, so it is done on first use)
+    def build_client_app(self, token_cache=None):
+        return ConfidentialClientApplication(
             self.client_id,
             client_credential=self.client_secret,
             authority=self.authority,
-            token_cache=self.cache
-        )    
-        
-       
+            token_cache=token_cache
+        )
+
+    # MSAL app without a token cache, used to start the sign-in flow
+    @property
+    def client_app(self):
+        if self._client_app is None:
+            self._client_app = self.build_client_app()
+        return self._client_app
+
+    # per-account token caches stored in the database
+    def get_token_store(self):
+        return get_token_store(self.build_client_app)
+
     def get_token_from_cache(self):
-            if 'token_cache' in session:
-                self.cache.deserialize(session['token_cache'])
-                accounts = self.client_app.get_accounts()
-                if accounts:
-                    token = self.client_app.acquire_token_silent(self.SCOPES, account=accounts[0])
-                    if token:
-                         print(f"Token retrieved: {token['access_token']}")
-                    return token
+            account_id = self.get_account_id()
+            if account_id:
+                with track_http('msal'):
+                    return self.get_token_store().acquire_token(account_id, self.SCOPES)
             return None
 
     def get_calendar_service(self):
             token = self.get_token_from_cache()
             if not token:
                 raise Exception("Missing credentials")
-            print(f"Using token for calendar service: {token['access_token']}")
             return token['access_token']
 
-    def get_events(self):
+    # home account id of the signed-in Microsoft account (owner key of the token cache and calendar mirror)
+    def get_account_id(self):
+            return session.get('msal_account_id')
+
+    # sync the local mirror with Graph (only changed events are transferred) and return the mirrored events
+    def get_events(self, max_age_seconds=0):
             try:
-                token = self.get_calendar_service()
-                
-                headers = {
-                    'Authorization': 'Bearer ' + token,
-                    'Accept': 'application/json'
-                }
- 
-                # Define the start and end datetime for the calendar view
-                now = datetime.now(pytz.utc)  # Current time in UTC
-                start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)  # Start of the current month
-                end_date = (now.replace(year=now.year + 1, month=12, day=31, hour=23, minute=59, second=59))  # End of next year
-                
-                # start_date = datetime(now.year, 3, 1, 0, 0, 0, 0, pytz.utc)  # Start of March 1st of the current year
-                # end_date = (now.replace(year=now.year + 1, month=12, day=31, hour=23, minute=59, second=59))  # End of next year
-                
-                # Convert to ISO 8601 format with 'Z' suffix for UTC
-                start_date_iso = start_date.isoformat().replace('+00:00', 'Z')
-                end_date_iso = end_date.isoformat().replace('+00:00', 'Z')
+                owner_id = self.get_account_id()
+                if not owner_id:
+                    raise Exception("Missing credentials")
 
-                events_url = f'https://graph.microsoft.com/v1.0/me/calendarView?startdatetime={start_date_iso}&enddatetime={end_date_iso}'
+                if not is_mirror_fresh(owner_id, max_age_seconds):
+                    token = self.get_calendar_service()
+                    sync_calendar(owner_id, token)
 
-                events = []
-                while events_url:
-                    response = requests.get(events_url, headers=headers)
-                    response.raise_for_status()
-                    data = response.json()
-                    print(f"Received {len(data.get('value', []))} events")
+                return get_mirrored_events(owner_id)
 
-                    events.extend(data.get('value', []))
-                    events_url = data.get('@odata.nextLink', None)
-                
-                return events
-                
             except Exception as e:
                 raise Exception(f"Error fetching events: {str(e)}")
 
+    # Graph event body for a new event
+    def build_event_body(self, event_details):
+        start_time = parser.parse(event_details['start'])
+        end_time = parser.parse(event_details['end'])
+
+        # Convert to the specified time zone, default to 'America/Los_Angeles' if not provided
+        event_timezone = event_details.get('timeZone', 'America/Los_Angeles')
+        timezone = pytz.timezone(event_timezone)
+        start_time = start_time.astimezone(timezone)
+        end_time = end_time.astimezone(timezone)
+
+        return {
+            'subject': event_details['summary'],
+            'body': {
+                'contentType': 'HTML',
+                'content': event_details.get('description', '')
+            },
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': event_timezone
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': event_timezone
+            },
+            'location': {
+                'displayName': event_details.get('location', '')
+            },
+            'attendees': [
+                {
+                    'emailAddress': {
+                        'address': email
+                    },
+                    'type': 'required'
+                } for email in event_details.get('attendees', [])
+            ]
+        }
+
+    # Graph event body holding only the fields present in event_details
+    def build_event_update_body(self, event_details):
+        body = {}
+
+        # Update with available fields in event_details
+        if 'notes' in event_details:
+            body['body'] = {
+                'contentType': 'HTML',
+                'content': event_details['notes']
+            }
+        if 'meeting_url' in event_details:
+            pass
+        #change the locaton attribute
+        if 'physical_location' in event_details:
+            body['location'] = {
+                'displayName': event_details['physical_location']
+            }
+        if 'status' in event_details:
+            pass
+        
+        if 'summary' in event_details:
+            body['subject'] = event_details['summary']
+        if 'description' in event_details:
+            body['body'] = {
+                'contentType': 'HTML',
+                'content': event_details['description']
+            }
+        if 'start' in event_details and 'end' in event_details:
+            try:
+                start_time = parser.parse(str(event_details['start']))
+                end_time = parser.parse(str(event_details['end']))
+                event_timezone = event_details.get('timeZone', 'UTC')
+                
+                # Ensure start and end times are valid
+                if start_time and end_time:
+                    body['start'] = {
+                        'dateTime': start_time.isoformat(),
+                        'timeZone': event_timezone
+                    }
+                    body['end'] = {
+                        'dateTime': end_time.isoformat(),
+                        'timeZone': event_timezone
+                    }
+                else:
+                    raise ValueError("Start or end date is empty")
+            except (ValueError, TypeError) as e:
+                print(f"Date parsing error: {e}")
+                raise ValueError(f"Error parsing start or end date: {str(e)}")
+
+        if 'attendees' in event_details:
+            body['attendees'] = [
+                {
+                    'emailAddress': {
+                        'address': email
+                    },
+                    'type': 'required'
+                } for email in event_details['attendees']
+            ]
+        return body
+
     def create_event(self, event_details):
             try:
                 print("Event Details:", event_details)
@@ -112,43 +202,9 @@ class OutlookCalendarService:
                     'Authorization': f'Bearer {token}',
                     'Content-Type': 'application/json'
                 }
-                start_time = parser.parse(event_details['start'])
-                end_time = parser.parse(event_details['end'])
-            
-            # Convert to the specified time zone, default to 'America/Los_Angeles' if not provided
-                event_timezone = event_details.get('timeZone', 'America/Los_Angeles')
-                timezone = pytz.timezone(event_timezone)
-                start_time = start_time.astimezone(timezone)
-                end_time = end_time.astimezone(timezone)
-                
-                body = {
-                'subject': event_details['summary'],
-                'body': {
-                    'contentType': 'HTML',
-                    'content': event_details.get('description', '')
-                },
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': event_timezone
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': event_timezone
-                },
-                'location': {
-                    'displayName': event_details.get('location', '')
-                },
-                'attendees': [
-                    {
-                        'emailAddress': {
-                            'address': email
-                        },
-                        'type': 'required'
-                    } for email in event_details.get('attendees', [])
-                ]
-            }
-                create_event_url = 'https://graph.microsoft.com/v1.0/me/events'
-                response = requests.post(create_event_url, headers=headers, json=body)
+                body = self.build_event_body(event_details)
+                create_event_url = graph_url('/me/events')
+                response = graph_session.post(create_event_url, headers=headers, json=body)
                 response.raise_for_status()
                 event_id = response.json().get('id')
                 print("event_id:", event_id)
@@ -165,68 +221,12 @@ class OutlookCalendarService:
                 'Content-Type': 'application/json'
             }
             
-            body = {}
-                        
-             # Update with available fields in event_details
-            if 'notes' in event_details:
-                body['body'] = {
-                    'contentType': 'HTML',
-                    'content': event_details['notes']
-                }
-            if 'meeting_url' in event_details:
-                pass
-             #change the locaton attribute
-            if 'physical_location' in event_details:
-                body['location'] = {
-                    'displayName': event_details['physical_location']
-                }
-            if 'status' in event_details:
-                pass
-            
-            if 'summary' in event_details:
-                body['subject'] = event_details['summary']
-            if 'description' in event_details:
-                body['body'] = {
-                    'contentType': 'HTML',
-                    'content': event_details['description']
-                }
-            if 'start' in event_details and 'end' in event_details:
-                try:
-                    start_time = parser.parse(str(event_details['start']))
-                    end_time = parser.parse(str(event_details['end']))
-                    event_timezone = event_details.get('timeZone', 'UTC')
-                    
-                    # Ensure start and end times are valid
-                    if start_time and end_time:
-                        body['start'] = {
-                            'dateTime': start_time.isoformat(),
-                            'timeZone': event_timezone
-                        }
-                        body['end'] = {
-                            'dateTime': end_time.isoformat(),
-                            'timeZone': event_timezone
-                        }
-                    else:
-                        raise ValueError("Start or end date is empty")
-                except (ValueError, TypeError) as e:
-                    print(f"Date parsing error: {e}")
-                    raise ValueError(f"Error parsing start or end date: {str(e)}")
-
-            if 'attendees' in event_details:
-                body['attendees'] = [
-                    {
-                        'emailAddress': {
-                            'address': email
-                        },
-                        'type': 'required'
-                    } for email in event_details['attendees']
-                ]
-                
+            body = self.build_event_update_body(event_details)
             print("Updating event with body:", body)
 
 
-            update_event_url = f'https://graph.microsoft.com/v1.0/me/events/{event_id}'
-            response = requests.patch(update_event_url, headers=headers, json=body)
+            update_event_url = graph_url(f'/me/events/{event_id}')
+            response = graph_session.patch(update_event_url, headers=headers, json=body)
             response.raise_for_status()
 
             updated_event = response.json()
@@ -245,8 +245,8 @@ class OutlookCalendarService:
                 'Authorization': f'Bearer {token}',
                 'Content-Type': 'application/json'
             }
-            delete_event_url = f'https://graph.microsoft.com/v1.0/me/events/{event_id}'
-            response = requests.delete(delete_event_url, headers=headers)
+            delete_event_url = graph_url(f'/me/events/{event_id}')
+            response = graph_session.delete(delete_event_url, headers=headers)
             response.raise_for_status()
             return {'status': 'Event deleted successfully'}
          except Exception as e:
@@ -255,6 +255,45 @@ class OutlookCalendarService:
 
          
     
+    # apply many creates/updates/deletes in Graph $batch requests instead of one call each
+    # user_id must host or attend every referenced appointment, since the results overwrite their event ids
+    def batch_events(self, operations, user_id):
+            token = self.get_calendar_service()
+
+            # appointments referenced without an event id use the one stored on the appointment
+            appointment_ids = [int(operation['appointment_id']) for operation in operations if operation.get('appointment_id')]
+            appointments = db.session.query(
+                Appointment.id, Appointment.event_id, Appointment.host_id, Appointment.attendee_id
+            ).filter(Appointment.id.in_(appointment_ids)).all() if appointment_ids else []
+
+            not_owned = sorted(appointment.id for appointment in appointments if int(user_id) not in (appointment.host_id, appointment.attendee_id))
+            if not_owned:
+                raise PermissionError(f"appointments {not_owned} do not belong to the current user")
+            stored_event_ids = {appointment.id: appointment.event_id for appointment in appointments}
+
+            batch = GraphBatch()
+            for index, operation in enumerate(operations):
+                action = operation.get('action')
+                appointment_id = int(operation['appointment_id']) if operation.get('appointment_id') else None
+                event_id = operation.get('event_id') or stored_event_ids.get(appointment_id)
+
+                if action == 'create':
+                    batch.create(self.build_event_body(operation.get('event', {})), appointment_id)
+                elif action in ('update', 'delete'):
+                    if not event_id:
+                        raise ValueError(f"operation {index}: event_id is required for {action}")
+                    if action == 'update':
+                        batch.update(event_id, self.build_event_update_body(operation.get('event', {})), appointment_id)
+                    else:
+                        batch.delete(event_id, appointment_id)
+                else:
+                    raise ValueError(f"operation {index}: unknown action {action}")
+
+            results = batch.execute(token)
+            apply_batch_results(results)
+            db.session.commit()
+            return results
+
     # Generate the authorization URL and save the state in the session       
     def login(self):
             auth_url = self.client_app.get_authorization_request_url(self.SCOPES, redirect_uri=self.redirect_uri)
@@ -266,13 +305,17 @@ class OutlookCalendarService:
             if not code:
                 raise Exception("Authorization code not found")
             try:
-                result = self.client_app.acquire_token_by_authorization_code(code, scopes=self.SCOPES, redirect_uri=self.redirect_uri)
+                # a fresh cache per sign-in so accounts never share tokens
+                cache = SerializableTokenCache()
+                client_app = self.build_client_app(cache)
+                with track_http('msal'):
+                    result = client_app.acquire_token_by_authorization_code(code, scopes=self.SCOPES, redirect_uri=self.redirect_uri)
                 if "error" in result:
                     raise Exception(f"Error acquiring token: {result.get('error_description')}")
-                session['token_cache'] = self.cache.serialize() #Store Token Cache in Session
-                print(f"Token acquired: {result['access_token']}")
-                
-                print(f"Token cache: {session['token_cache']}")
+
+                account_id = client_app.get_accounts()[0]['home_account_id']
+                self.get_token_store().add_account(account_id, cache)
+                session['msal_account_id'] = account_id  # only the account id is kept in the session
 
                 id_info = jwt.decode(result['id_token'], options={"verify_signature": False})
                 user_email = id_info.get('preferred_username')
@@ -296,10 +339,13 @@ outlook_calendar_service = OutlookCalendarService()
 # retrieve calendar events
 @outlook_calendar_dp.route('/get_calendar_events', methods=['GET'])
 def get_calendar_events():
-    if 'token_cache' not in session:
+    if 'msal_account_id' not in session:
         return jsonify({'error': 'Missing credentials'}), 401
     try:
-        events = outlook_calendar_service.get_events()
+        # serve straight from the mirror when it was synced recently, unless a refresh is requested
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        max_age = 0 if refresh else current_app.config.get('CALENDAR_SYNC_INTERVAL_SECONDS', 60)
+        events = outlook_calendar_service.get_events(max_age_seconds=max_age)
         return jsonify(events) 
     except Exception as e:
         return jsonify({'error': 'An error occurred', 'details': str(e)}), 500
@@ -326,7 +372,7 @@ def callback():
 # Create new event
 @outlook_calendar_dp.route('/create_event',methods=['POST'])
 def create_event():
-        if 'token_cache' not in session:
+        if 'msal_account_id' not in session:
             return jsonify({'error': 'Missing credentials'}), 401
         
         event_details = request.json
@@ -341,7 +387,7 @@ def create_event():
 #delete event
 @outlook_calendar_dp.route('/delete_event/<event_id>',methods=['DELETE'])
 def delete_event(event_id):
-     if 'token_cache' not in session:
+     if 'msal_account_id' not in session:
             return jsonify({'error': 'Missing credentials'}), 401
      try:
         print(f"Deleting event with ID: {event_id}")
@@ -353,7 +399,7 @@ def delete_event(event_id):
 #update event
 @outlook_calendar_dp.route('/update_event/<event_id>',methods=['PATCH'])
 def update_event(event_id):
-    if 'token_cache' not in session:
+    if 'msal_account_id' not in session:
         return jsonify({'error': 'Missing credentials'}), 401
     
     event_details = request.json
@@ -364,10 +410,36 @@ def update_event(event_id):
     except Exception as e:
         return jsonify({'error': 'An error occurred', 'details': str(e)}), 500
        
+# create, update and delete many events in batched Graph requests
+@outlook_calendar_dp.route('/batch_events', methods=['POST'])
+@jwt_required()
+def batch_events():
+    if 'msal_account_id' not in session:
+        return jsonify({'error': 'Missing credentials'}), 401
+
+    operations = (request.json or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+
+    try:
+        results = outlook_calendar_service.batch_events(operations, get_jwt_identity())
+        return jsonify({'results': results}), 200
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except (ValueError, KeyError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred', 'details': str(e)}), 500
+
 # clear the session credentials
 @outlook_calendar_dp.route('/logout', methods=['POST'])
 def logout():
-    # Clear session data
+    # Forget the stored tokens and clear session data
+    account_id = session.get('msal_account_id')
+    if account_id:
+        outlook_calendar_service.get_token_store().remove_account(account_id)
     session.clear()
 
     return jsonify({'message': 'Logout successful'}), 200
@@ -0,0 +1,113 @@
+"""
+ * pagination.py
+ * Last Edited: 10/18/26
+ *
+ * Contains keyset (cursor) pagination and the shared SQL filters for the
+ * appointment listing endpoints. Pages are ordered by
+ * (appointment_date, start_time, id) and the cursor is the last row's key.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import base64
+import json
+from sqlalchemy import or_, and_, select
+from .models import Appointment, Availability
+from datetime import datetime
+
+# largest page a client can ask for
+MAX_PAGE_SIZE = 200
+
+# raised for a bad limit, cursor or filter value (reported as a 400)
+class PaginationError(ValueError):
+    pass
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# opaque cursor pointing just after an appointment
+def encode_cursor(appointment):
+    key = [appointment.appointment_date.isoformat(), appointment.start_time.strftime('%H:%M'), appointment.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+# return the (date, time, id) key stored in a cursor
+def decode_cursor(cursor):
+    try:
+        appointment_date, start_time, appointment_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.strptime(appointment_date, '%Y-%m-%d').date(),
+                datetime.strptime(start_time, '%H:%M').time(),
+                int(appointment_id))
+    except (ValueError, TypeError):
+        raise PaginationError("invalid cursor")
+
+# parse an optional 'YYYY-MM-DD' query parameter
+def parse_date_arg(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise PaginationError(f"{name} must be a 'YYYY-MM-DD' date")
+
+# parse the optional page size (None returns every row)
+def parse_limit(args):
+    limit = args.get('limit')
+    if limit is None and args.get('cursor'):
+        limit = MAX_PAGE_SIZE
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError("limit must be a number")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+# push the program_id, course_id, date_from and date_to filters into the query
+def apply_appointment_filters(query, args):
+    program_id = args.get('program_id')
+    course_id = args.get('course_id')
+    date_from = parse_date_arg(args, 'date_from')
+    date_to = parse_date_arg(args, 'date_to')
+
+    if program_id:
+        query = query.filter(Appointment.availability_id.in_(
+            select(Availability.id).where(Availability.program_id == program_id)
+        ))
+    if course_id:
+        query = query.filter(Appointment.course_id == course_id)
+    if date_from:
+        query = query.filter(Appointment.appointment_date >= date_from)
+    if date_to:
+        query = query.filter(Appointment.appointment_date <= date_to)
+    return query
+
+# return one page of appointments and the cursor of the next page (None on the last page)
+def paginate_appointments(query, args):
+    limit = parse_limit(args)
+    cursor = args.get('cursor')
+
+    query = query.order_by(Appointment.appointment_date, Appointment.start_time, Appointment.id)
+
+    if cursor:
+        appointment_date, start_time, appointment_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Appointment.appointment_date > appointment_date,
+            and_(Appointment.appointment_date == appointment_date, Appointment.start_time > start_time),
+            and_(Appointment.appointment_date == appointment_date, Appointment.start_time == start_time,
+                 Appointment.id > appointment_id)
+        ))
+
+    if limit is None:
+        return query.all(), None
+
+    # fetch one extra row to know whether another page exists
+    appointments = query.limit(limit + 1).all()
+    if len(appointments) > limit:
+        return appointments[:limit], encode_cursor(appointments[limit - 1])
+    return appointments, None
@@ -0,0 +1,437 @@
+"""
+ * perf.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the load-testing tools behind `flask perf`:
+ * - seed: writes a deterministic synthetic term (instructors, courses,
+ *   members, programs, availabilities and appointments) into the configured
+ *   database, the same rows for the same --seed and --start-date
+ * - load: replays a weighted mix of student and instructor requests against
+ *   create_app() in-process (or a running server with --base-url) from
+ *   several threads and reports p50/p95/p99 latency and throughput per endpoint
+ *
+ * Known Bugs:
+ * - SQLite serializes writes, so reservations made by concurrent threads can
+ *   fail with "database is locked". Use MySQL for write-heavy runs.
+ *
+"""
+
+import json
+import math
+import random
+import threading
+import time
+import click
+import requests
+from collections import defaultdict
+from flask import current_app
+from flask.cli import AppGroup
+from flask_jwt_extended import create_access_token, get_csrf_token
+from sqlalchemy import insert, select
+from .models import User, CourseDetails, CourseMembers, CourseTimes, ProgramDetails, ProgramTimes, Availability, \
+    Appointment, AppointmentComment, Feedback, OpenSlot
+from .slots import get_slot_windows, virtual_slots_enabled
+from .open_slots import rebuild_open_slots
+from . import db
+from datetime import date, datetime, time as dt_time, timedelta
+
+perf_cli = AppGroup('perf', help='Seed a synthetic term and measure endpoint latency.')
+
+# seeded users get addresses on this domain so they can be found again by the load driver
+SEED_EMAIL_DOMAIN = 'perf.example.edu'
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+# rows written per INSERT when seeding appointments
+INSERT_CHUNK_SIZE = 5000
+
+# statuses a booked slot ends up in, before and after today
+PAST_BOOKED_STATUSES = ['completed'] * 8 + ['missed', 'canceled']
+FUTURE_BOOKED_STATUSES = ['reserved'] * 4 + ['pending']
+
+# sends requests with the Flask test client of the app, without a server
+class InProcessSender:
+    def __init__(self, app):
+        self.client = app.test_client(use_cookies=False)
+
+    def send(self, method, path, headers, body):
+        return self.client.open(path, method=method, headers=headers, json=body).status_code
+
+# sends requests to a running server
+class HttpSender:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def send(self, method, path, headers, body):
+        return self.session.request(method, self.base_url + path, headers=headers, json=body, timeout=30).status_code
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# the Monday that starts a term of the given length centred on today
+def get_default_term_start(weeks):
+    today = date.today()
+    return today - timedelta(days=today.weekday()) - timedelta(weeks=weeks // 2)
+
+# insert plain row dicts in chunks
+def insert_rows(model, rows):
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + INSERT_CHUNK_SIZE])
+
+# write a synthetic term and return the number of rows written per table
+def seed_synthetic_term(seed=42, instructors=80, courses_per_instructor=2, students=2000, courses_per_student=3,
+                        programs_per_course=2, weeks=10, slots_per_day=12, booked_fraction=0.3, start_date=None):
+    if User.query.filter(User.email.like(f'%@{SEED_EMAIL_DOMAIN}')).first():
+        raise ValueError("the database already holds a synthetic term, seed an empty database or use --reset")
+
+    rng = random.Random(seed)
+    start_date = start_date or get_default_term_start(weeks)
+    today = date.today()
+    counts = defaultdict(int)
+
+    # users
+    instructor_users = [User(name=f'Instructor {index}', email=f'instructor{index}@{SEED_EMAIL_DOMAIN}',
+                             account_type='instructor', status='active')
+                        for index in range(instructors)]
+    student_users = [User(name=f'Student {index}', email=f'student{index}@{SEED_EMAIL_DOMAIN}',
+                          account_type='student', status='active')
+                     for index in range(students)]
+    db.session.add_all(instructor_users + student_users)
+    db.session.flush()
+    counts['user'] = len(instructor_users) + len(student_users)
+
+    # courses with their times and members
+    courses = []
+    for instructor in instructor_users:
+        for index in range(courses_per_instructor):
+            courses.append(CourseDetails(instructor_id=instructor.id, name=f'PERF {100 + len(courses)}', quarter='Fall',
+                                         physical_location=f'Room {rng.randint(100, 499)}'))
+    db.session.add_all(courses)
+    db.session.flush()
+    counts['course_details'] = len(courses)
+
+    course_students = defaultdict(list)
+    members = [{'course_id': course.id, 'user_id': course.instructor_id} for course in courses]
+    for student in student_users:
+        for course in rng.sample(courses, min(courses_per_student, len(courses))):
+            members.append({'course_id': course.id, 'user_id': student.id})
+            course_students[course.id].append(student.id)
+    insert_rows(CourseMembers, members)
+    counts['course_members'] = len(members)
+
+    course_times = []
+    for course in courses:
+        for day in rng.sample(WEEKDAYS, 2):
+            hour = rng.randint(8, 16)
+            course_times.append({'course_id': course.id, 'day': day, 'start_time': dt_time(hour), 'end_time': dt_time(hour + 1, 30)})
+    insert_rows(CourseTimes, course_times)
+    counts['course_times'] = len(course_times)
+
+    # appointment programs and a drop-in lab per course, global office hours per instructor
+    programs = []
+    for course in courses:
+        for index in range(programs_per_course):
+            programs.append(ProgramDetails(course_id=course.id, instructor_id=course.instructor_id, name=f'Tutoring {index + 1}',
+                                           description='Synthetic appointment program', duration=30, isDropins=False,
+                                           isRangeBased=False, auto_approve_appointments=rng.random() < 0.8,
+                                           physical_location=course.physical_location))
+        programs.append(ProgramDetails(course_id=course.id, instructor_id=course.instructor_id, name='Drop-in Lab',
+                                       isDropins=True, isRangeBased=False, physical_location=course.physical_location))
+    for instructor in instructor_users:
+        programs.append(ProgramDetails(course_id=None, instructor_id=instructor.id, name='Office Hours',
+                                       isDropins=True, isRangeBased=False))
+    db.session.add_all(programs)
+    db.session.flush()
+    counts['program_details'] = len(programs)
+
+    program_times = []
+    for program in programs:
+        for day in rng.sample(WEEKDAYS, 2):
+            hour = rng.randint(8, 16)
+            program_times.append({'program_id': program.id, 'day': day, 'start_time': dt_time(hour), 'end_time': dt_time(hour + 1)})
+    insert_rows(ProgramTimes, program_times)
+    counts['program_times'] = len(program_times)
+
+    # availabilities: every weekday for appointment programs, once a week for drop-ins
+    term_days = [start_date + timedelta(days=offset) for offset in range(weeks * 7) if (start_date + timedelta(days=offset)).weekday() < 5]
+    availabilities = []
+    for program_index, program in enumerate(programs):
+        start_hour = 8 + program_index % 3
+        if program.isDropins:
+            days = [day for day in term_days if day.weekday() == program_index % 5]
+            length = timedelta(hours=2)
+        else:
+            days = term_days
+            length = timedelta(minutes=program.duration * slots_per_day)
+        for day in days:
+            end_time = (datetime.combine(day, dt_time(start_hour)) + length).time()
+            availabilities.append(Availability(user_id=program.instructor_id, program_id=program.id, date=day,
+                                               start_time=dt_time(start_hour), end_time=end_time, status='active',
+                                               physical_location=program.physical_location))
+    db.session.add_all(availabilities)
+    db.session.flush()
+    counts['availability'] = len(availabilities)
+
+    # one appointment per slot, a share of them booked by students of the course
+    program_by_id = {program.id: program for program in programs}
+    store_posted = not virtual_slots_enabled()
+    appointments = []
+    for availability in availabilities:
+        program = program_by_id[availability.program_id]
+        if program.isDropins:
+            continue
+        for slot_start, slot_end in get_slot_windows(availability.date, availability.start_time, availability.end_time, program.duration):
+            row = {
+                'host_id': availability.user_id,
+                'availability_id': availability.id,
+                'appointment_date': availability.date,
+                'start_time': slot_start,
+                'end_time': slot_end,
+                'physical_location': availability.physical_location,
+                'status': 'posted',
+            }
+            if rng.random() < booked_fraction and course_students[program.course_id]:
+                row['attendee_id'] = rng.choice(course_students[program.course_id])
+                row['course_id'] = program.course_id
+                row['status'] = rng.choice(PAST_BOOKED_STATUSES if availability.date < today else FUTURE_BOOKED_STATUSES)
+            elif not store_posted:
+                continue
+            appointments.append(row)
+    insert_rows(Appointment, appointments)
+    counts['appointment'] = len(appointments)
+
+    # comments on some bookings and feedback on some completed meetings
+    booked = db.session.execute(
+        select(Appointment.id, Appointment.attendee_id, Appointment.host_id, Appointment.status)
+        .where(Appointment.attendee_id.isnot(None), Appointment.host_id.in_([user.id for user in instructor_users]))
+        .order_by(Appointment.id)
+    ).all()
+    comments = [{'appointment_id': appointment_id, 'user_id': attendee_id, 'appointment_comment': 'Looking forward to it',
+                 'created_at': datetime(start_date.year, start_date.month, start_date.day)}
+                for appointment_id, attendee_id, host_id, status in booked if rng.random() < 0.1]
+    feedback = [{'appointment_id': appointment_id, 'attendee_id': attendee_id, 'host_id': host_id,
+                 'attendee_rating': str(rng.randint(1, 5)), 'attendee_notes': 'Synthetic feedback'}
+                for appointment_id, attendee_id, host_id, status in booked if status == 'completed' and rng.random() < 0.3]
+    insert_rows(AppointmentComment, comments)
+    insert_rows(Feedback, feedback)
+    counts['appointment_comment'] = len(comments)
+    counts['feedback'] = len(feedback)
+
+    db.session.commit()
+    counts['open_slot'] = rebuild_open_slots()
+    return dict(counts)
+
+# seeded users, their courses and the slots they can book, for building requests
+def load_traffic_pool(max_students=500):
+    memberships = defaultdict(list)
+    for course_id, user_id in db.session.execute(select(CourseMembers.course_id, CourseMembers.user_id)).all():
+        memberships[user_id].append(course_id)
+
+    users = User.query.filter(User.email.like(f'%@{SEED_EMAIL_DOMAIN}')).order_by(User.id).all()
+    if not users:
+        raise ValueError("no synthetic term found, run `flask perf seed` first")
+
+    def build_user(user):
+        token = create_access_token(identity=str(user.id))
+        csrf = get_csrf_token(token) if current_app.config['JWT_COOKIE_CSRF_PROTECT'] else None
+        return {'id': user.id, 'courses': memberships[user.id], 'token': token, 'csrf': csrf}
+
+    course_programs = defaultdict(list)
+    for program_id, course_id in db.session.execute(
+        select(ProgramDetails.id, ProgramDetails.course_id).where(ProgramDetails.isDropins == False, ProgramDetails.course_id.isnot(None))
+    ).all():
+        course_programs[course_id].append(program_id)
+
+    return {
+        'students': [build_user(user) for user in users if user.account_type == 'student'][:max_students],
+        'instructors': [build_user(user) for user in users if user.account_type == 'instructor'],
+        'course_programs': course_programs,
+        'open_slots': [(slot.appointment_id, slot.course_id) for slot in OpenSlot.query.filter(
+            OpenSlot.is_dropin == False, OpenSlot.appointment_id.isnot(None), OpenSlot.date > date.today()
+        ).order_by(OpenSlot.id).limit(5000).all()],
+    }
+
+# the request a scenario sends for a user: (method, path, json body), None to skip
+def build_student_request(label, rng, user, pool):
+    course_id = rng.choice(user['courses']) if user['courses'] else None
+    if label == 'GET /student/appointments/available/<program_id>/<course_id>':
+        programs = pool['course_programs'].get(course_id)
+        return ('GET', f'/student/appointments/available/{rng.choice(programs)}/{course_id}', None) if programs else None
+    if label == 'POST /student/appointments/reserve/<appointment_id>/<course_id>':
+        if not pool['open_slots']:
+            return None
+        appointment_id, slot_course_id = rng.choice(pool['open_slots'])
+        return ('POST', f'/student/appointments/reserve/{appointment_id}/{slot_course_id}', {'notes': 'load test'})
+    method, path = label.split(' ', 1)
+    return (method, path, None)
+
+def build_instructor_request(label, rng, user, pool):
+    course_id = rng.choice(user['courses']) if user['courses'] else -1
+    method, path = label.split(' ', 1)
+    return (method, path.replace('<course_id>', str(course_id)), None)
+
+# weighted request mix of each kind of user
+STUDENT_SCENARIOS = [
+    ('GET /course/tree', 3),
+    ('GET /user/courses', 2),
+    ('GET /student/programs/descriptions', 2),
+    ('GET /student/programs/appointment-based', 1),
+    ('GET /student/appointments?type=upcoming', 3),
+    ('GET /student/appointments/available/<program_id>/<course_id>', 3),
+    ('POST /student/appointments/reserve/<appointment_id>/<course_id>', 1),
+]
+INSTRUCTOR_SCENARIOS = [
+    ('GET /course/tree', 2),
+    ('GET /instructor/programs', 2),
+    ('GET /instructor/appointments?type=upcoming&limit=50', 3),
+    ('GET /course/programs/times/<course_id>', 1),
+    ('GET /instructor/availability/<course_id>', 1),
+]
+
+# nearest-rank percentile of a sorted list
+def get_percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+# summarize recorded (label, seconds, status) samples per endpoint
+def summarize_samples(samples, elapsed_seconds):
+    by_label = defaultdict(list)
+    for label, seconds, status in samples:
+        by_label[label].append((seconds, status))
+
+    report = {}
+    for label, entries in sorted(by_label.items()):
+        latencies = sorted(seconds * 1000 for seconds, status in entries)
+        statuses = defaultdict(int)
+        for seconds, status in entries:
+            statuses[str(status)] += 1
+        report[label] = {
+            'requests': len(entries),
+            'errors': sum(1 for seconds, status in entries if status is None or status >= 500),
+            'statuses': dict(sorted(statuses.items())),
+            'p50_ms': round(get_percentile(latencies, 50), 1),
+            'p95_ms': round(get_percentile(latencies, 95), 1),
+            'p99_ms': round(get_percentile(latencies, 99), 1),
+            'rps': round(len(entries) / elapsed_seconds, 1) if elapsed_seconds else None,
+        }
+    return report
+
+# replay the request mix from `concurrency` threads until the duration or request count runs out
+def run_load(app, duration=30.0, concurrency=8, seed=42, max_requests=None, student_share=0.8, base_url=None):
+    pool = load_traffic_pool()
+    samples = []
+    samples_lock = threading.Lock()
+    sent = [0]
+    deadline = time.monotonic() + duration
+
+    # hand out request numbers until the limit is reached
+    def next_request():
+        with samples_lock:
+            if max_requests is not None and sent[0] >= max_requests:
+                return False
+            sent[0] += 1
+            return True
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        sender = HttpSender(base_url) if base_url else InProcessSender(app)
+
+        while time.monotonic() < deadline and next_request():
+            if pool['students'] and (not pool['instructors'] or rng.random() < student_share):
+                user = rng.choice(pool['students'])
+                label = rng.choices([name for name, weight in STUDENT_SCENARIOS], [weight for name, weight in STUDENT_SCENARIOS])[0]
+                built = build_student_request(label, rng, user, pool)
+            else:
+                user = rng.choice(pool['instructors'])
+                label = rng.choices([name for name, weight in INSTRUCTOR_SCENARIOS], [weight for name, weight in INSTRUCTOR_SCENARIOS])[0]
+                built = build_instructor_request(label, rng, user, pool)
+            if built is None:
+                continue
+
+            method, path, body = built
+            headers = {'Cookie': f"access_token_cookie={user['token']}"}
+            if method != 'GET' and user['csrf']:
+                headers['X-CSRF-TOKEN'] = user['csrf']
+
+            started = time.perf_counter()
+            try:
+                status = sender.send(method, path, headers, body)
+            except Exception:
+                status = None
+            with samples_lock:
+                samples.append((label, time.perf_counter() - started, status))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.monotonic() - started
+    return {'elapsed_seconds': round(elapsed, 2), 'requests': len(samples), 'endpoints': summarize_samples(samples, elapsed)}
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# write a synthetic term into the configured database
+@perf_cli.command('seed')
+@click.option('--seed', type=int, default=42, help='Random seed, the same seed writes the same term.')
+@click.option('--instructors', type=int, default=80)
+@click.option('--courses-per-instructor', type=int, default=2)
+@click.option('--students', type=int, default=2000)
+@click.option('--courses-per-student', type=int, default=3)
+@click.option('--programs-per-course', type=int, default=2, help='Appointment programs per course (a drop-in lab is added to each).')
+@click.option('--weeks', type=int, default=10)
+@click.option('--slots-per-day', type=int, default=12, help='30 minute slots per availability.')
+@click.option('--booked-fraction', type=float, default=0.3)
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='First day of the term (default: centred on today).')
+@click.option('--reset', is_flag=True, help='Drop and recreate every table first.')
+def seed_command(seed, instructors, courses_per_instructor, students, courses_per_student, programs_per_course,
+                 weeks, slots_per_day, booked_fraction, start_date, reset):
+    if reset:
+        click.confirm(f"drop every table in {db.engine.url.render_as_string(hide_password=True)}?", abort=True)
+        db.drop_all()
+        db.create_all()
+
+    started = time.perf_counter()
+    try:
+        counts = seed_synthetic_term(seed, instructors, courses_per_instructor, students, courses_per_student, programs_per_course,
+                                     weeks, slots_per_day, booked_fraction, start_date.date() if start_date else None)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for table, count in counts.items():
+        click.echo(f"{table}: {count}")
+    click.echo(f"seeded in {time.perf_counter() - started:.1f}s")
+
+# replay student and instructor traffic and report latency per endpoint
+@perf_cli.command('load')
+@click.option('--duration', type=float, default=30.0, help='Seconds to run.')
+@click.option('--concurrency', type=int, default=8, help='Threads sending requests.')
+@click.option('--requests', 'max_requests', type=int, default=None, help='Stop after this many requests.')
+@click.option('--seed', type=int, default=42)
+@click.option('--student-share', type=float, default=0.8, help='Share of requests sent as students.')
+@click.option('--base-url', default=None, help='Send requests to a running server instead of in-process.')
+@click.option('--json', 'json_path', type=click.Path(dir_okay=False, writable=True), default=None, help='Also write the report to a file.')
+def load_command(duration, concurrency, max_requests, seed, student_share, base_url, json_path):
+    try:
+        report = run_load(current_app._get_current_object(), duration, concurrency, seed, max_requests, student_share, base_url)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"{'endpoint':<66} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}")
+    for label, stats in report['endpoints'].items():
+        click.echo(f"{label:<66} {stats['requests']:>8} {stats['errors']:>6} {stats['p50_ms']:>8} "
+                   f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['rps']:>7}")
+    click.echo(f"{report['requests']} requests in {report['elapsed_seconds']}s "
+               f"({report['requests'] / report['elapsed_seconds']:.1f} req/s)" if report['elapsed_seconds'] else '')
+
+    if json_path:
+        with open(json_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
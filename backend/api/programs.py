@@ -11,10 +11,19 @@
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import and_, or_
-from .models import ProgramDetails, User, Appointment, Availability, ProgramTimes, CourseDetails, CourseMembers, AppointmentComment, Feedback, CourseTimes
+from sqlalchemy import and_, or_, select, delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from .models import ProgramDetails, Appointment, Availability, AvailabilityRule, ProgramTimes, CourseDetails, CourseMembers, AppointmentComment, Feedback, CourseTimes, OpenSlot
 from . import db
-from .user import is_instructor
+from .user import is_instructor, get_user
+from .reservations import reset_booking_counters
+from .open_slots import refresh_program_open_slots
+from .availability_rules import retire_program_rules
+from .cache import cached, invalidate_metadata, COURSES, PROGRAMS
+from .etag import bump_revision, get_revision, get_rows_version, make_etag, not_modified, with_etag
+from datetime import datetime
+from collections import defaultdict
 
 programs = Blueprint('programs', __name__)
 
@@ -25,23 +34,140 @@ programs = Blueprint('programs', __name__)
 # return the program name for a given program ID
 def get_program_name(program_id): 
     try: 
-        program = ProgramDetails.query.filter_by(id=program_id).first()
-
-        if program:
-            return program.name
+        return cached(PROGRAMS, ('name', str(program_id)), lambda: load_name(ProgramDetails, program_id))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 # return the course name for a course_id
 def get_course_name(course_id): 
     try: 
-        course = CourseDetails.query.filter_by(id=course_id).first()
-
-        if course:
-            return course.name
+        return cached(COURSES, ('name', str(course_id)), lambda: load_name(CourseDetails, course_id))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# load the name of a program or course, None if it doesn't exist
+def load_name(model, row_id):
+    row = model.query.filter_by(id=row_id).first()
+
+    if row:
+        return row.name
+
+# delete every availability of a program along with its appointments and their comments and feedback, using set-based statements
+def delete_program_availabilities(program_id):
+    availability_ids = select(Availability.id).where(Availability.program_id == program_id)
+    appointment_ids = select(Appointment.id).where(Appointment.availability_id.in_(availability_ids))
+
+    db.session.execute(delete(AppointmentComment).where(AppointmentComment.appointment_id.in_(appointment_ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(delete(Feedback).where(Feedback.appointment_id.in_(appointment_ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(delete(Appointment).where(Appointment.availability_id.in_(availability_ids)),
+                       execution_options={'synchronize_session': False})
+    result = db.session.execute(delete(Availability).where(Availability.program_id == program_id),
+                                execution_options={'synchronize_session': False})
+    db.session.execute(delete(AvailabilityRule).where(AvailabilityRule.program_id == program_id),
+                       execution_options={'synchronize_session': False})
+    return result.rowcount
+
+# bump the revision of the courses that list a program (its course, or every course of its instructor for a global program)
+# row fingerprints cannot tell a program deleted and recreated under the same id, so adding or removing one bumps these instead
+def bump_program_courses(course_id, instructor_id):
+    if course_id is not None:
+        bump_revision(CourseDetails, course_id)
+    elif instructor_id is not None:
+        db.session.execute(
+            update(CourseDetails).where(CourseDetails.instructor_id == instructor_id).values(revision=CourseDetails.revision + 1),
+            execution_options={'synchronize_session': False}
+        )
+
+# delete a program and every row that references it, using set-based statements (does not commit)
+def delete_program_rows(program_id):
+    program = db.session.execute(
+        select(ProgramDetails.course_id, ProgramDetails.instructor_id).where(ProgramDetails.id == program_id)
+    ).first()
+    if program:
+        bump_program_courses(program.course_id, program.instructor_id)
+
+    # delete appointments with their comments and feedback, then availability and its rules
+    delete_program_availabilities(program_id)
+
+    # delete booking counters and the slots listed to students
+    reset_booking_counters(program_id)
+    OpenSlot.query.filter_by(program_id=program_id).delete(synchronize_session=False)
+
+    # delete program_times
+    ProgramTimes.query.filter_by(program_id=program_id).delete(synchronize_session=False)
+
+    # delete program
+    ProgramDetails.query.filter_by(id=program_id).delete(synchronize_session=False)
+
+# filters for the courses a user belongs to and the programs listed under them (their own and their instructors' global programs)
+def get_course_tree_filters(user_id):
+    user_courses = select(CourseMembers.course_id).where(CourseMembers.user_id == user_id)
+    course_filter = CourseDetails.id.in_(user_courses)
+    program_filter = or_(
+        ProgramDetails.course_id.in_(user_courses),
+        and_(ProgramDetails.course_id.is_(None), ProgramDetails.instructor_id.in_(select(CourseDetails.instructor_id).where(course_filter)))
+    )
+    return course_filter, program_filter
+
+# convert a course or program time to a object
+def format_time(tuple):
+    return {
+        'day': tuple.day,
+        'start_time': tuple.start_time,
+        'end_time': tuple.end_time,
+    }
+
+# convert a program and its times to a object
+def format_program_tree(program):
+    return {
+        'id': program.id,
+        'name': program.name,
+        'description': program.description,
+        'duration': program.duration,
+        'physical_location': program.physical_location,
+        'meeting_url': program.meeting_url,
+        'auto_approve_appointments': program.auto_approve_appointments,
+        'max_daily_meetings': program.max_daily_meetings,
+        'max_weekly_meetings': program.max_weekly_meetings,
+        'max_monthly_meetings': program.max_monthly_meetings,
+        'isDropins': program.isDropins,
+        'isRangeBased': program.isRangeBased,
+        'times': [format_time(time) for time in program.program_times],
+    }
+
+# return the course -> programs -> times tree of a user in four queries, however many courses they have
+def get_course_tree(user_id):
+    course_filter, program_filter = get_course_tree_filters(user_id)
+
+    # courses with their times, then programs with their times
+    courses = CourseDetails.query.options(selectinload(CourseDetails.times)).filter(course_filter).order_by(CourseDetails.id).all()
+    programs = ProgramDetails.query.options(selectinload(ProgramDetails.program_times)).filter(program_filter).order_by(ProgramDetails.id).all()
+
+    course_programs = defaultdict(list)
+    global_programs = defaultdict(list)
+    for program in programs:
+        if program.course_id is None:
+            global_programs[program.instructor_id].append(format_program_tree(program))
+        else:
+            course_programs[program.course_id].append(format_program_tree(program))
+
+    return [{
+        'id': course.id,
+        'course_name': course.name,
+        'instructor_id': course.instructor_id,
+        'quarter': course.quarter,
+        'physical_location': course.physical_location,
+        'meeting_url': course.meeting_url,
+        'recordings_link': course.recordings_link,
+        'discord_link': course.discord_link,
+        'comments': course.comments,
+        'times': [format_time(time) for time in course.times],
+        'programs': course_programs[course.id],
+        'global_programs': global_programs[course.instructor_id],
+    } for course in courses]
+
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 ""               Endpoint Functions                ""
 """""""""""""""""""""""""""""""""""""""""""""""""""""
@@ -51,9 +177,15 @@ def get_course_name(course_id):
 def get_courses_details(course_id):
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_user(user_id)
         
         if user and course_id is not None:
+            # answer from the course's revision before loading it
+            etag = make_etag('course_details', course_id, get_revision(CourseDetails, course_id))
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
             course = CourseDetails.query.filter_by(id=course_id).first()
 
             # convert attributes to a object
@@ -69,19 +201,41 @@ def get_courses_details(course_id):
                 'comments': course.comments,
             }
 
-            return jsonify(course_info), 200
+            return with_etag((jsonify(course_info), 200), etag)
         else:
             return jsonify({"error": "instructor not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# get every course of the current user with its programs, its instructor's global programs and all of their times
+@programs.route('/course/tree', methods=['GET'])
+@jwt_required()
+def get_user_course_tree():
+    try:
+        user_id = get_jwt_identity()
+        user = get_user(user_id)
+
+        if not user:
+            return jsonify({"error": "user not found"}), 404
+
+        course_filter, program_filter = get_course_tree_filters(user.id)
+
+        etag = make_etag('course_tree', user.id, get_rows_version(CourseDetails, course_filter), get_rows_version(ProgramDetails, program_filter))
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
+        return with_etag((jsonify(get_course_tree(user.id)), 200), etag)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # set the course attributes of a already existing course
 @programs.route('/course/details', methods=['POST'])
 @jwt_required()
 def set_course_details():
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_user(user_id)
         
         if not user:
             return jsonify({"error": "user not found"}), 404
@@ -107,8 +261,10 @@ def set_course_details():
             course.recordings_link = recordings_link
             course.discord_link = discord_link
             course.comments = comments
+            bump_revision(CourseDetails, course.id)
 
             db.session.commit()
+            invalidate_metadata(COURSES)
             
             return jsonify({"message": "Course details updated successfully"}), 200
         else:
@@ -122,9 +278,15 @@ def set_course_details():
 @jwt_required()
 def get_course_times(course_id):
     try:
-        course = CourseDetails.query.get(course_id)
+        # course times bump the course's revision when they are replaced
+        revision = get_revision(CourseDetails, course_id)
+
+        if revision is not None:
+            etag = make_etag('course_times', course_id, revision)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
 
-        if course:
             course_times = CourseTimes.query.filter_by(course_id=course_id).all()
             
             # if course has defined times
@@ -142,9 +304,9 @@ def get_course_times(course_id):
                     
                     # append the object to the list
                     course_times_list.append(course_time_info)
-                return jsonify(course_times_list), 200
+                return with_etag((jsonify(course_times_list), 200), etag)
             else:
-                return jsonify(None), 200
+                return with_etag((jsonify(None), 200), etag)
         else:
             return jsonify({"error": "Course not found"}), 404
     except Exception as e:
@@ -160,6 +322,8 @@ def set_course_times(course_id):
         courseTimesTuples = []
 
         if data is not None:
+            bump_revision(CourseDetails, course_id)
+
             # set times for course
             courses = CourseTimes.query.filter_by(course_id=course_id).all()
         
@@ -176,8 +340,8 @@ def set_course_times(course_id):
 
                     # get attributes
                     for day, timings in schedule.items():
-                        start_time = timings['start_time']
-                        end_time = timings['end_time']
+                        start_time = datetime.strptime(timings['start_time'], "%H:%M").time()
+                        end_time = datetime.strptime(timings['end_time'], "%H:%M").time()
                         converted_list.append((day, start_time, end_time, course_id))
 
                 for entry in converted_list:
@@ -196,10 +360,12 @@ def set_course_times(course_id):
                 for courseTimesTuple in courseTimesTuples:
                     db.session.add(courseTimesTuple)
                 db.session.commit()
+                invalidate_metadata(COURSES)
                 return jsonify({"message": "Times updated successfully"}), 200
             
             # set no times for course
             else:
+                invalidate_metadata(COURSES)
                 return jsonify({"message": "Times updated successfully: No times for course"}), 200
         else:
             return jsonify({"error": "Times data not found"}), 404
@@ -214,15 +380,22 @@ def get_programs(course_id):
         course = CourseDetails.query.filter_by(id=course_id).first()
 
         if course:
-            programs = ProgramDetails.query.filter(and_(or_(ProgramDetails.course_id==course_id, ProgramDetails.course_id==None), ProgramDetails.instructor_id==course.instructor_id)).all()
+            program_filter = and_(or_(ProgramDetails.course_id==course_id, ProgramDetails.course_id==None), ProgramDetails.instructor_id==course.instructor_id)
+
+            etag = make_etag('course_programs', course_id, course.revision, get_rows_version(ProgramDetails, program_filter))
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
+            programs = ProgramDetails.query.filter(program_filter).all()
 
             # return the id, name, description, and duration of each program
-            return jsonify([{
+            return with_etag((jsonify([{
                 "id": program.id,
                 "name": program.name,
                 "description": program.description,
                 "duration": program.duration
-            } for program in programs]), 200
+            } for program in programs]), 200), etag)
         else:
             return jsonify({"error": "Course not found"}), 404
     except Exception as e:
@@ -238,14 +411,24 @@ def get_program_times_in_course(course_id):
         if not is_instructor(user_id):
             return jsonify({"msg": "instructor access required"}), 401
         
-        instructor = User.query.get(user_id)
+        instructor = get_user(user_id)
 
         # all courses programs
         if course_id == "null":
-            programs = ProgramDetails.query.filter(ProgramDetails.course_id.is_(None), ProgramDetails.instructor_id==instructor.id).all()
+            program_filter = and_(ProgramDetails.course_id.is_(None), ProgramDetails.instructor_id==instructor.id)
+            course_filter = CourseDetails.instructor_id==instructor.id
         # single course programs
         else:
-            programs = ProgramDetails.query.filter_by(course_id=course_id, instructor_id=instructor.id).all()
+            program_filter = and_(ProgramDetails.course_id==course_id, ProgramDetails.instructor_id==instructor.id)
+            course_filter = CourseDetails.id==course_id
+
+        # program times bump their program's revision when they are replaced, adding or removing a program bumps its courses
+        etag = make_etag('program_times', course_id, instructor.id, get_rows_version(CourseDetails, course_filter), get_rows_version(ProgramDetails, program_filter))
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
+        programs = ProgramDetails.query.filter(program_filter).all()
         
         if programs:
             # return list of program times
@@ -269,10 +452,10 @@ def get_program_times_in_course(course_id):
 
                     # append the object to the list
                     course_times_list.append(program_time_info)
-            return jsonify(course_times_list), 200
+            return with_etag((jsonify(course_times_list), 200), etag)
         else:
             # no programs found
-            return jsonify(None), 200
+            return with_etag((jsonify(None), 200), etag)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -287,12 +470,15 @@ def set_program_times(program_id):
             return jsonify({"msg": "instructor access required"}), 401
         
         data = request.get_json()
-        program_id = program_id
+        url_program_id = program_id
         courseTimesTuples = []
 
         if data is not None:
+            bump_revision(ProgramDetails, program_id)
+
             # set times for course
             courses = ProgramTimes.query.filter_by(program_id=program_id).all()
+            old_times = {(course.day, course.start_time, course.end_time) for course in courses}
         
             # if course already exists, delete the existing times
             if courses:
@@ -307,8 +493,8 @@ def set_program_times(program_id):
                 for program_id, schedule in data.items():
                     # get attributes
                     for day, timings in schedule.items():
-                        start_time = timings['start_time']
-                        end_time = timings['end_time']
+                        start_time = datetime.strptime(timings['start_time'], "%H:%M").time()
+                        end_time = datetime.strptime(timings['end_time'], "%H:%M").time()
                         converted_list.append((day, start_time, end_time, program_id))
 
                 for entry in converted_list:
@@ -326,12 +512,23 @@ def set_program_times(program_id):
                 # for each tuple, add it to the CourseTimes Table
                 for courseTimesTuple in courseTimesTuples:
                     db.session.add(courseTimesTuple)
+
+                # recurring rules were copied from the old times, so the rules of every program whose times changed are retired
+                changed_program_ids = {int(entry[3]) for entry in converted_list if str(entry[3]) != str(url_program_id)}
+                if {entry[:3] for entry in converted_list if str(entry[3]) == str(url_program_id)} != old_times:
+                    changed_program_ids.add(int(url_program_id))
+                retired = sum(retire_program_rules(changed_program_id) for changed_program_id in changed_program_ids)
+
                 db.session.commit()
-                return jsonify({"message": "Times updated successfully"}), 200
+                invalidate_metadata(PROGRAMS)
+                return jsonify({"message": "Times updated successfully", "availability_rules_retired": retired}), 200
             
             # set no times for course
             else:
-                return jsonify({"message": "Times updated successfully: No times for course"}), 200
+                retired = retire_program_rules(url_program_id) if old_times else 0
+                db.session.commit()
+                invalidate_metadata(PROGRAMS)
+                return jsonify({"message": "Times updated successfully: No times for course", "availability_rules_retired": retired}), 200
         else:
             return jsonify({"error": "Times data not found"}), 404
     except Exception as e:
@@ -372,10 +569,12 @@ def create_program():
 
                 # post to the database
                 db.session.add(new_details)
+                bump_program_courses(course_id, user_id)
                 db.session.commit()
 
                 # Return the new program ID
                 new_program_id = new_details.id
+                invalidate_metadata(PROGRAMS)
                 return jsonify({"message": "Added to program successfully", "program_id": new_program_id}), 200
         else:
             return jsonify({"error": "Insufficient details to add program to course"}), 404
@@ -392,37 +591,13 @@ def delete_program(program_id):
         if not is_instructor(user_id):
             return jsonify({"msg": "instructor access required"}), 401
 
-        # delete appointments
-        appointments = Appointment.query.join(Availability).filter_by(program_id=program_id).all()
-        for appointment in appointments:
-            comments = AppointmentComment.query.filter_by(appointment_id=appointment.id).all()
-            feedbacks = Feedback.query.filter_by(appointment_id=appointment.id).all()
-
-            # delete comments
-            for comment in comments:
-                db.session.delete(comment)
-
-            # delete feedback
-            for feedback in feedbacks:
-                db.session.delete(feedback)
-
-            db.session.delete(appointment)
-
-        # delete availability
-        availabilities = Availability.query.filter_by(program_id=program_id).all()
-        for availability in availabilities:
-            db.session.delete(availability)
-
-        # delete program_times
-        times = ProgramTimes.query.filter_by(program_id=program_id).all()
-        for time in times:
-            db.session.delete(time)
+        if not db.session.scalar(select(ProgramDetails.id).where(ProgramDetails.id == program_id)):
+            return jsonify({"error": "Program not found"}), 404
 
-        # delete program
-        program = ProgramDetails.query.get_or_404(program_id)
-        db.session.delete(program)
+        delete_program_rows(program_id)
 
         db.session.commit()
+        invalidate_metadata(PROGRAMS)
         return jsonify({"msg": "Program deleted"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -480,9 +655,13 @@ def set_program_details():
             program.max_weekly_meetings = max_weekly_meetings
             program.max_monthly_meetings = max_monthly_meetings
             program.isDropins = isDropins
+            bump_revision(ProgramDetails, program.id)
 
+            # names, locations and slot lengths shown to students come from the program
+            refresh_program_open_slots(program.id)
             db.session.commit()
             
+            invalidate_metadata(PROGRAMS)
             return jsonify({"message": "Program name updated successfully"}), 200
         else:
             return jsonify({"error": "Program name doesn't exist"}), 404
@@ -515,9 +694,9 @@ def create_course():
             name=name,
         )
 
-        # post to the database
+        # post to the database, committed together with its members so a failure leaves no empty course
         db.session.add(new_course)
-        db.session.commit()
+        db.session.flush()
 
         new_course_id = new_course.id
 
@@ -529,8 +708,10 @@ def create_course():
 
         # post to the database
         db.session.add(new_member)
-        # Add each student to the course in the CourseMembers table
-        for student_id in student_ids:
+        # Add each student to the course in the CourseMembers table, once each
+        for student_id in dict.fromkeys(student_ids):
+            if str(student_id) == str(user_id):
+                continue
             print(f"Adding student ID: {student_id} to course ID: {new_course_id}")
             new_student_member = CourseMembers(
                 course_id=new_course_id,
@@ -542,6 +723,9 @@ def create_course():
 
         return jsonify({"message": "Course created successfully"}), 200
 
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "A user was added to the course more than once."}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -557,7 +741,10 @@ def add_user_to_course():
         user_id = data.get('user_id')
 
         # if course_id and user_id found
-        if course_id & user_id:
+        if course_id and user_id:
+            if CourseMembers.query.filter_by(course_id=course_id, user_id=user_id).first():
+                return jsonify({"error": "User is already a member of this course"}), 409
+
             # add the user to the course in the CourseMembers Table
             new_details = CourseMembers(
                 course_id=course_id,
@@ -571,6 +758,10 @@ def add_user_to_course():
             return jsonify({"message": "Added to course successfully"}), 200
         else:
             return jsonify({"error": "Insufficient details to add user to course"}), 404
+    except IntegrityError:
+        # another request added the same member first
+        db.session.rollback()
+        return jsonify({"error": "User is already a member of this course"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,518 @@
+"""
+ * reservations.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the reservation engine used to book appointments. Slots are claimed
+ * with a conditional UPDATE and the daily/weekly/monthly meeting limits are
+ * checked against HostBookingCounter rows updated in the same transaction.
+ * Batches of slots load the counters of each host program once and add the
+ * whole batch to each period with one UPDATE.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+from collections import defaultdict
+from sqlalchemy import update, select, and_, or_, case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from .models import Appointment, Availability, HostBookingCounter
+from .slots import parse_virtual_slot_id, materialize_virtual_slot
+from .open_slots import remove_open_slot, remove_open_slots, refresh_program_open_slots
+from . import db
+from datetime import datetime, timedelta
+
+# statuses that count towards a program's meeting limits
+ACTIVE_STATUSES = ['reserved', 'pending']
+
+# widest period first so the largest reached limit closes the most slots
+PERIOD_KINDS = ['monthly', 'weekly', 'daily']
+
+# raised when an appointment cannot be reserved
+class ReservationError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+# raised when a booking would go over a daily, weekly or monthly limit
+class MeetingLimitReached(ReservationError):
+    def __init__(self, scope):
+        super().__init__("Meeting limit reached", 409)
+        self.scope = scope
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# Helper function to get the start and end dates of the week for a given date
+def get_week_range(date):
+    start_of_week = date - timedelta(days=date.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    return start_of_week, end_of_week
+
+# Helper function to get the first and last dates of the month for a given date
+def get_month_range(date):
+    start_of_month = date.replace(day=1)
+    next_month = (start_of_month + timedelta(days=32)).replace(day=1)
+    end_of_month = next_month - timedelta(days=1)
+    return start_of_month, end_of_month
+
+# Helper function to get the date range of a daily, weekly or monthly scope
+def get_scope_range(date, scope):
+    if scope == 'daily':
+        return date, date
+    elif scope == 'weekly':
+        return get_week_range(date)
+    return get_month_range(date)
+
+# return the daily, weekly and monthly limits of a program (None means unlimited)
+def get_program_limits(program):
+    return {
+        'daily': program.max_daily_meetings,
+        'weekly': program.max_weekly_meetings,
+        'monthly': program.max_monthly_meetings,
+    }
+
+# count the reserved and pending appointments of a host's program between two dates
+def count_active_appointments(host_id, program_id, start_date, end_date):
+    return Appointment.query.join(Availability, Appointment.availability_id == Availability.id).filter(
+        Appointment.host_id == host_id,
+        Appointment.appointment_date.between(start_date, end_date),
+        Appointment.status.in_(ACTIVE_STATUSES),
+        Availability.program_id == program_id
+    ).count()
+
+# reserved and pending appointments of a host's program per date between two dates
+def count_active_appointments_by_date(host_id, program_id, start_date, end_date):
+    rows = db.session.execute(
+        select(Appointment.appointment_date, func.count())
+        .join(Availability, Appointment.availability_id == Availability.id)
+        .where(
+            Appointment.host_id == host_id,
+            Appointment.appointment_date.between(start_date, end_date),
+            Appointment.status.in_(ACTIVE_STATUSES),
+            Availability.program_id == program_id
+        )
+        .group_by(Appointment.appointment_date)
+    ).all()
+    return {appointment_date: count for appointment_date, count in rows}
+
+# filter matching the counter rows of every period containing appointment_date
+def counter_period_filter(host_id, program_id, appointment_date):
+    return and_(
+        HostBookingCounter.host_id == host_id,
+        HostBookingCounter.program_id == program_id,
+        or_(*[
+            and_(HostBookingCounter.period_kind == scope,
+                 HostBookingCounter.period_start == get_scope_range(appointment_date, scope)[0])
+            for scope in PERIOD_KINDS
+        ])
+    )
+
+# fetch the counter rows of every period containing one of the dates with one query, creating missing ones
+# from the current appointment counts; keyed by (period_kind, period_start)
+def get_period_counters(host_id, program_id, dates):
+    periods = {(scope, get_scope_range(appointment_date, scope)[0]) for appointment_date in dates for scope in PERIOD_KINDS}
+    counters = {
+        (counter.period_kind, counter.period_start): counter
+        for counter in HostBookingCounter.query.filter(
+            HostBookingCounter.host_id == host_id,
+            HostBookingCounter.program_id == program_id,
+            or_(*[
+                and_(HostBookingCounter.period_kind == scope, HostBookingCounter.period_start == period_start)
+                for scope, period_start in periods
+            ])
+        ).all()
+    }
+
+    missing = sorted(periods - counters.keys())
+    if missing:
+        counters.update(create_period_counters(host_id, program_id, missing))
+    return counters
+
+# create the counter rows of several periods, counting their current bookings with one query
+def create_period_counters(host_id, program_id, periods):
+    ranges = {(scope, period_start): get_scope_range(period_start, scope) for scope, period_start in periods}
+    daily_counts = count_active_appointments_by_date(host_id, program_id, min(start for start, end in ranges.values()),
+                                                     max(end for start, end in ranges.values()))
+    counters = {
+        (scope, period_start): HostBookingCounter(
+            host_id=host_id,
+            program_id=program_id,
+            period_kind=scope,
+            period_start=start_date,
+            count=sum(count for day, count in daily_counts.items() if start_date <= day <= end_date)
+        )
+        for (scope, period_start), (start_date, end_date) in ranges.items()
+    }
+
+    try:
+        # another request may create the same periods at the same time
+        with db.session.begin_nested():
+            db.session.add_all(counters.values())
+    except IntegrityError:
+        return {(scope, period_start): create_period_counter(host_id, program_id, scope, period_start)
+                for scope, period_start in periods}
+    return counters
+
+# create the counter row of one period, or read it back if another request just created it
+def create_period_counter(host_id, program_id, scope, period_start):
+    start_date, end_date = get_scope_range(period_start, scope)
+    counter = HostBookingCounter(
+        host_id=host_id,
+        program_id=program_id,
+        period_kind=scope,
+        period_start=start_date,
+        count=count_active_appointments(host_id, program_id, start_date, end_date)
+    )
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(counter)
+    except IntegrityError:
+        counter = HostBookingCounter.query.filter_by(
+            host_id=host_id, program_id=program_id, period_kind=scope, period_start=start_date
+        ).one()
+    return counter
+
+# the daily, weekly and monthly counters of one date out of get_period_counters
+def get_date_counters(counters, appointment_date):
+    return {scope: counters[(scope, get_scope_range(appointment_date, scope)[0])] for scope in PERIOD_KINDS}
+
+# fetch the counter rows for a date, creating missing ones from the current appointment counts
+def get_booking_counters(host_id, program_id, appointment_date):
+    return get_date_counters(get_period_counters(host_id, program_id, [appointment_date]), appointment_date)
+
+# return the current daily, weekly and monthly booking counts for a host's program
+def get_booking_counts(host_id, program_id, appointment_date):
+    counters = get_booking_counters(host_id, program_id, appointment_date)
+    return {scope: counter.count for scope, counter in counters.items()}
+
+# add a booking to the counters, failing if any limit would be exceeded
+def increment_booking_counters(counters, limits):
+    for scope in PERIOD_KINDS:
+        statement = update(HostBookingCounter).where(HostBookingCounter.id == counters[scope].id)
+
+        # only increment while the period is below its limit
+        if limits[scope] is not None:
+            statement = statement.where(HostBookingCounter.count < limits[scope])
+
+        result = db.session.execute(
+            statement.values(count=HostBookingCounter.count + 1),
+            execution_options={'synchronize_session': False}
+        )
+        if result.rowcount == 0:
+            raise MeetingLimitReached(scope)
+
+    rows = db.session.execute(
+        select(HostBookingCounter.period_kind, HostBookingCounter.count)
+        .where(HostBookingCounter.id.in_([counter.id for counter in counters.values()]))
+    ).all()
+    return {period_kind: count for period_kind, count in rows}
+
+# add or remove one booking from the existing counters of an appointment's periods
+def adjust_booking_counters(appointment, amount):
+    if not appointment.availability or not appointment.appointment_date:
+        return
+
+    statement = update(HostBookingCounter).where(
+        counter_period_filter(appointment.host_id, appointment.availability.program_id, appointment.appointment_date)
+    )
+
+    # missing periods are rebuilt from the appointment table when they are next needed
+    if amount < 0:
+        statement = statement.where(HostBookingCounter.count > 0)
+
+    db.session.execute(
+        statement.values(count=HostBookingCounter.count + amount),
+        execution_options={'synchronize_session': False}
+    )
+
+# keep the counters in sync when an appointment moves between statuses (call before committing)
+def apply_status_change(appointment, old_status, new_status):
+    was_active = old_status in ACTIVE_STATUSES
+    is_active = new_status in ACTIVE_STATUSES
+
+    if was_active and not is_active:
+        adjust_booking_counters(appointment, -1)
+    elif is_active and not was_active:
+        adjust_booking_counters(appointment, 1)
+
+# drop the counters of a program whose appointments were removed in bulk
+def reset_booking_counters(program_id):
+    HostBookingCounter.query.filter_by(program_id=program_id).delete(synchronize_session=False)
+
+# mark the posted appointments and availabilities of a program inactive for a day, week or month
+def update_appointments_status(host_id, program_id, appointment_date, scope):
+    start_date, end_date = get_scope_range(appointment_date, scope)
+    program_availabilities = select(Availability.id).where(Availability.program_id == program_id)
+
+    # Update appointments for the day, week or month
+    db.session.execute(
+        update(Appointment).where(
+            Appointment.host_id == host_id,
+            Appointment.appointment_date.between(start_date, end_date),
+            Appointment.status == 'posted',
+            Appointment.availability_id.in_(program_availabilities)
+        ).values(status='inactive'),
+        execution_options={'synchronize_session': False}
+    )
+
+    # Update availabilities for the day, week or month
+    db.session.execute(
+        update(Availability).where(
+            Availability.user_id == host_id,
+            Availability.program_id == program_id,
+            Availability.date.between(start_date, end_date)
+        ).values(status='inactive'),
+        execution_options={'synchronize_session': False}
+    )
+
+# reserve a posted appointment for a student and return it, raising ReservationError on failure
+# on_reserved(appointment) runs inside the booking transaction when no approval is needed,
+# on_booked(appointment) runs inside it for every successful booking
+def reserve_appointment_slot(appointment_id, student_id, course_id, notes=None, on_reserved=None, on_booked=None):
+    # virtual slots get their Appointment row now, inside the booking transaction
+    if parse_virtual_slot_id(appointment_id):
+        appointment = materialize_virtual_slot(appointment_id)
+    else:
+        appointment = Appointment.query.get(appointment_id)
+
+    if not appointment or appointment.status != 'posted':
+        db.session.rollback()
+        raise ReservationError("Appointment is not available for reservation")
+
+    current_time = datetime.now() - timedelta(hours=8)
+    appointment_datetime = datetime.combine(appointment.appointment_date, appointment.start_time)
+    if appointment_datetime <= current_time:
+        db.session.rollback()
+        raise ReservationError("Cannot reserve past appointments")
+
+    program = appointment.availability.program_details
+    limits = get_program_limits(program)
+    status = 'reserved' if program.auto_approve_appointments else 'pending'
+
+    try:
+        counters = get_booking_counters(appointment.host_id, program.id, appointment.appointment_date)
+
+        # claim the slot only if no other request has booked it since it was read
+        claimed = db.session.execute(
+            update(Appointment)
+            .where(Appointment.id == appointment.id, Appointment.status == 'posted')
+            .values(attendee_id=student_id, course_id=course_id, notes=notes, status=status),
+            execution_options={'synchronize_session': False}
+        )
+        if claimed.rowcount == 0:
+            raise ReservationError("Appointment is not available for reservation")
+
+        counts = increment_booking_counters(counters, limits)
+        remove_open_slot(appointment)
+
+        # close the remaining slots of the widest period that just reached its limit
+        for scope in PERIOD_KINDS:
+            if limits[scope] is not None and counts[scope] >= limits[scope]:
+                update_appointments_status(appointment.host_id, program.id, appointment.appointment_date, scope)
+                refresh_program_open_slots(program.id)
+                break
+
+        # queue follow-up work such as the confirmation email with the booking itself
+        if on_reserved is not None or on_booked is not None:
+            db.session.refresh(appointment)
+        if on_reserved is not None and status == 'reserved':
+            on_reserved(appointment)
+        if on_booked is not None:
+            on_booked(appointment)
+
+        db.session.commit()
+    except MeetingLimitReached as e:
+        db.session.rollback()
+
+        # the period is already full, so close its remaining slots
+        update_appointments_status(appointment.host_id, program.id, appointment.appointment_date, e.scope)
+        refresh_program_open_slots(program.id)
+        db.session.commit()
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+    db.session.refresh(appointment)
+    return appointment
+
+# int id of a stored appointment, None for anything else
+def parse_appointment_id(slot_id):
+    if isinstance(slot_id, bool):
+        return None
+    try:
+        return int(slot_id)
+    except (TypeError, ValueError):
+        return None
+
+# the appointments behind a batch of slot ids with their programs, stored ones in one query (virtual ones are materialized)
+def load_batch_appointments(slot_ids):
+    stored_ids = {parse_appointment_id(slot_id) for slot_id in slot_ids} - {None}
+    stored = {}
+    if stored_ids:
+        stored = {
+            appointment.id: appointment
+            for appointment in Appointment.query.options(
+                joinedload(Appointment.availability).joinedload(Availability.program_details)
+            ).filter(Appointment.id.in_(stored_ids)).all()
+        }
+
+    appointments = {}
+    for slot_id in slot_ids:
+        if parse_virtual_slot_id(slot_id):
+            appointments[slot_id] = materialize_virtual_slot(slot_id)
+        else:
+            appointments[slot_id] = stored.get(parse_appointment_id(slot_id))
+    return appointments
+
+# mark the posted slots of (host_id, program_id, date, scope) periods inactive and relist their programs (does not commit)
+def close_periods(periods):
+    for host_id, program_id, appointment_date, scope in periods:
+        update_appointments_status(host_id, program_id, appointment_date, scope)
+    for program_id in {program_id for host_id, program_id, appointment_date, scope in periods}:
+        refresh_program_open_slots(program_id)
+
+# reserve several posted appointments for a student, loading the limit counters of each host program once
+# atomic batches book every slot or none; otherwise every slot that passes its checks is booked.
+# Returns one {'appointment_id', 'status', 'error'} dict per requested slot, in order.
+# on_reserved(appointments) runs once inside the booking transaction with the slots that need no approval,
+# on_booked(appointment) runs inside it for every booked slot
+def reserve_appointment_slots(slot_ids, student_id, course_id, notes=None, atomic=True, on_reserved=None, on_booked=None):
+    results = [{'appointment_id': slot_id, 'status': None, 'error': None} for slot_id in slot_ids]
+    appointments = load_batch_appointments(slot_ids)
+    current_time = datetime.now() - timedelta(hours=8)
+
+    # slot checks
+    booked = []
+    seen = set()
+    for result in results:
+        appointment = appointments.get(result['appointment_id'])
+        if not appointment or appointment.status != 'posted' or appointment.id in seen:
+            result['error'] = ReservationError("Appointment is not available for reservation")
+        elif datetime.combine(appointment.appointment_date, appointment.start_time) <= current_time:
+            result['error'] = ReservationError("Cannot reserve past appointments")
+        else:
+            seen.add(appointment.id)
+            booked.append((result, appointment))
+
+    # limit checks, counting the batch in order against each host program's counters
+    groups = defaultdict(list)
+    for result, appointment in booked:
+        groups[(appointment.host_id, appointment.availability.program_id)].append((result, appointment))
+
+    increments = defaultdict(int)  # counter id -> slots of the batch in its period
+    counter_limits = {}  # counter id -> (counter, limit)
+    full_periods = set()
+    for (host_id, program_id), group in groups.items():
+        program = group[0][1].availability.program_details
+        limits = get_program_limits(program)
+        counters = get_period_counters(host_id, program_id, {appointment.appointment_date for result, appointment in group})
+
+        for result, appointment in group:
+            date_counters = get_date_counters(counters, appointment.appointment_date)
+            reached = next((
+                scope for scope in PERIOD_KINDS
+                if limits[scope] is not None and date_counters[scope].count + increments[date_counters[scope].id] >= limits[scope]
+            ), None)
+            if reached:
+                result['error'] = MeetingLimitReached(reached)
+                # the period was already full before this batch, so close its remaining slots
+                if date_counters[reached].count >= limits[reached]:
+                    full_periods.add((host_id, program_id, appointment.appointment_date, reached))
+                continue
+
+            result['status'] = 'reserved' if program.auto_approve_appointments else 'pending'
+            for scope, counter in date_counters.items():
+                increments[counter.id] += 1
+                counter_limits[counter.id] = (counter, limits[scope])
+
+    booked = [(result, appointment) for result, appointment in booked if result['error'] is None]
+    if atomic and len(booked) < len(results):
+        db.session.rollback()
+        for result, appointment in booked:
+            result['status'] = None
+            result['error'] = ReservationError("Not reserved because another appointment in the batch failed", 409)
+        booked = []
+
+    if not booked:
+        close_periods(full_periods)
+        db.session.commit()
+        return results
+
+    try:
+        # claim the slots only if no other request has booked them since they were read
+        claimed = 0
+        for status in ACTIVE_STATUSES:
+            appointment_ids = [appointment.id for result, appointment in booked if result['status'] == status]
+            if appointment_ids:
+                claimed += db.session.execute(
+                    update(Appointment)
+                    .where(Appointment.id.in_(appointment_ids), Appointment.status == 'posted')
+                    .values(attendee_id=student_id, course_id=course_id, notes=notes, status=status),
+                    execution_options={'synchronize_session': False}
+                ).rowcount
+        if claimed != len(booked):
+            raise ReservationError("Appointment is not available for reservation", 409)
+
+        # reload the claimed rows in one query for the follow-up work
+        if on_reserved is not None or on_booked is not None:
+            Appointment.query.populate_existing().options(
+                joinedload(Appointment.availability).joinedload(Availability.program_details)
+            ).filter(Appointment.id.in_([appointment.id for result, appointment in booked])).all()
+
+        # add the batch to every period in one statement, only while each stays within its limit
+        limited = {counter_id: amount for counter_id, amount in increments.items() if counter_limits[counter_id][1] is not None}
+        unlimited = {counter_id: amount for counter_id, amount in increments.items() if counter_id not in limited}
+        for amounts in (limited, unlimited):
+            if not amounts:
+                continue
+            added = case(amounts, value=HostBookingCounter.id)
+            statement = update(HostBookingCounter).where(HostBookingCounter.id.in_(list(amounts)))
+            if amounts is limited:
+                limits = case({counter_id: counter_limits[counter_id][1] for counter_id in amounts}, value=HostBookingCounter.id)
+                statement = statement.where(HostBookingCounter.count + added <= limits)
+            updated = db.session.execute(
+                statement.values(count=HostBookingCounter.count + added),
+                execution_options={'synchronize_session': False}
+            )
+            if updated.rowcount != len(amounts):
+                raise MeetingLimitReached(min((counter_limits[counter_id][0].period_kind for counter_id in amounts),
+                                              key=PERIOD_KINDS.index))
+
+        remove_open_slots([appointment for result, appointment in booked])
+
+        # close the remaining slots of every period the batch filled
+        counts = db.session.execute(
+            select(HostBookingCounter.id, HostBookingCounter.count).where(HostBookingCounter.id.in_(list(increments)))
+        ).all()
+        for counter_id, count in counts:
+            counter, limit = counter_limits[counter_id]
+            if limit is not None and count >= limit:
+                full_periods.add((counter.host_id, counter.program_id, counter.period_start, counter.period_kind))
+        close_periods(full_periods)
+
+        # queue follow-up work such as the confirmation email with the booking itself
+        reserved = [appointment for result, appointment in booked if result['status'] == 'reserved']
+        if on_reserved is not None and reserved:
+            on_reserved(reserved)
+        if on_booked is not None:
+            for result, appointment in booked:
+                on_booked(appointment)
+
+        db.session.commit()
+    except ReservationError as e:
+        # another request took a slot or filled a period since the checks, nothing was booked
+        db.session.rollback()
+        for result, appointment in booked:
+            result['status'] = None
+            result['error'] = e
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return results
@@ -0,0 +1,210 @@
+"""
+ * sessions.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the server-side session store used by flask.session (the signed-in
+ * Outlook account lives there). SESSION_BACKEND picks the backend:
+ * - sqlalchemy: ServerSession table, shared by every worker process (default)
+ * - memory: bounded in-process LRU, for a single process or tests
+ * Expired sessions are garbage collected every SESSION_GC_EVERY_N_REQUESTS
+ * requests on average, or with `flask sessions gc`.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import random
+import secrets
+import threading
+import click
+from collections import OrderedDict
+from flask import current_app
+from flask.cli import AppGroup
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import CallbackDict
+from .models import ServerSession
+from . import db
+from datetime import datetime
+
+sessions_cli = AppGroup('sessions', help='Manage server-side sessions.')
+
+# a session dict that remembers its id and whether it was changed
+class StoredSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+# sessions kept in the ServerSession table
+class SQLAlchemySessionStore:
+    # runs on its own connection so saving a session never commits the request's db.session
+    def get(self, sid):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(ServerSession.data).where(ServerSession.id == sid, ServerSession.expires_at > datetime.utcnow())
+            ).first()
+        return row.data if row else None
+
+    def set(self, sid, data, expires_at):
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                update(ServerSession).where(ServerSession.id == sid).values(data=data, expires_at=expires_at)
+            )
+            if result.rowcount:
+                return
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert(ServerSession).values(id=sid, data=data, expires_at=expires_at))
+        except IntegrityError:
+            # another request created the session first
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(ServerSession).where(ServerSession.id == sid).values(data=data, expires_at=expires_at)
+                )
+
+    def delete(self, sid):
+        with db.engine.begin() as connection:
+            connection.execute(delete(ServerSession).where(ServerSession.id == sid))
+
+    def delete_expired(self):
+        with db.engine.begin() as connection:
+            return connection.execute(delete(ServerSession).where(ServerSession.expires_at <= datetime.utcnow())).rowcount
+
+# sessions kept in this process, dropping the least recently used once max_entries is reached
+class LRUSessionStore:
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, sid):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= datetime.utcnow():
+                del self.entries[sid]
+                return None
+            self.entries.move_to_end(sid)
+            return data
+
+    def set(self, sid, data, expires_at):
+        with self.lock:
+            self.entries[sid] = (data, expires_at)
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self.lock:
+            self.entries.pop(sid, None)
+
+    def delete_expired(self):
+        now = datetime.utcnow()
+        with self.lock:
+            expired = [sid for sid, (data, expires_at) in self.entries.items() if expires_at <= now]
+            for sid in expired:
+                del self.entries[sid]
+        return len(expired)
+
+# flask session interface that keeps only a signed session id in the cookie
+class StoreSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, gc_every_n_requests=None):
+        self.store = store
+        self.gc_every_n_requests = gc_every_n_requests
+
+    def get_signer(self, app):
+        return Signer(app.secret_key, salt='server-session')
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+
+        # expiry based garbage collection, on average once every n requests
+        if self.gc_every_n_requests and random.randint(1, self.gc_every_n_requests) == 1:
+            self.store.delete_expired()
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self.get_signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+
+            data = self.store.get(sid) if sid else None
+            if data is not None:
+                return StoredSession(self.serializer.loads(data), sid=sid)
+
+        return StoredSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # an emptied session is removed from the store
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        expires = self.get_expiration_time(app, session)
+        stored_until = expires.replace(tzinfo=None) if expires else datetime.utcnow() + app.permanent_session_lifetime
+        self.store.set(session.sid, self.serializer.dumps(dict(session)), stored_until)
+
+        response.set_cookie(
+            name,
+            self.get_signer(app).sign(session.sid).decode(),
+            expires=expires,
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# build the store named by SESSION_BACKEND
+def create_session_store(app):
+    backend = app.config.get('SESSION_BACKEND', 'sqlalchemy')
+    if backend == 'sqlalchemy':
+        return SQLAlchemySessionStore()
+    if backend == 'memory':
+        return LRUSessionStore(app.config.get('SESSION_MAX_ENTRIES', 1000))
+    raise ValueError(f"unknown SESSION_BACKEND '{backend}'")
+
+# replace flask's cookie sessions with the configured server-side store
+def init_sessions(app):
+    app.session_interface = StoreSessionInterface(
+        create_session_store(app),
+        app.config.get('SESSION_GC_EVERY_N_REQUESTS', 100)
+    )
+    app.cli.add_command(sessions_cli)
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""                 CLI Commands                    ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# delete expired sessions now (e.g. from cron)
+@sessions_cli.command('gc')
+def gc_command():
+    removed = current_app.session_interface.store.delete_expired()
+    click.echo(f"removed {removed} expired sessions")
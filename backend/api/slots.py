@@ -0,0 +1,98 @@
+"""
+ * slots.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the appointment slot grid of an availability. With the
+ * VIRTUAL_APPOINTMENT_SLOTS config enabled, unbooked slots are not stored:
+ * they are listed from Availability + ProgramDetails.duration (through the
+ * OpenSlot read model, see open_slots.py) and an Appointment row is only
+ * created when a slot is reserved.
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from .models import Appointment, Availability
+from . import db
+from datetime import datetime, timedelta
+
+# prefix of slot ids that have no Appointment row yet, e.g. v-12-0930
+VIRTUAL_SLOT_PREFIX = 'v-'
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# True when unbooked slots are computed instead of stored
+def virtual_slots_enabled():
+    return bool(current_app.config.get('VIRTUAL_APPOINTMENT_SLOTS', False))
+
+# split an availability into (start_time, end_time) windows of duration minutes (one window if no duration)
+def get_slot_windows(date, start_time, end_time, duration):
+    start_datetime = datetime.combine(date, start_time)
+    end_datetime = datetime.combine(date, end_time)
+    step = timedelta(minutes=duration) if duration else end_datetime - start_datetime
+
+    windows = []
+    while step and start_datetime + step <= end_datetime:
+        windows.append((start_datetime.time(), (start_datetime + step).time()))
+        start_datetime += step
+    return windows
+
+# id of a slot that has not been materialized yet
+def get_virtual_slot_id(availability_id, start_time):
+    return f"{VIRTUAL_SLOT_PREFIX}{availability_id}-{start_time.strftime('%H%M')}"
+
+# return (availability_id, start_time) for a virtual slot id, or None if it is not one
+def parse_virtual_slot_id(slot_id):
+    if not isinstance(slot_id, str) or not slot_id.startswith(VIRTUAL_SLOT_PREFIX):
+        return None
+    try:
+        availability_id, start_time = slot_id[len(VIRTUAL_SLOT_PREFIX):].split('-')
+        return int(availability_id), datetime.strptime(start_time, '%H%M').time()
+    except ValueError:
+        return None
+
+# create the posted Appointment row behind a virtual slot id and return it (None if the slot does not exist)
+def materialize_virtual_slot(slot_id):
+    parsed = parse_virtual_slot_id(slot_id)
+    if not parsed:
+        return None
+    availability_id, start_time = parsed
+
+    existing = Appointment.query.filter_by(availability_id=availability_id, start_time=start_time).first()
+    if existing:
+        return existing
+
+    availability = Availability.query.get(availability_id)
+    if not availability or availability.status != 'active':
+        return None
+    program = availability.program_details
+    if not program or program.isDropins:
+        return None
+
+    windows = dict(get_slot_windows(availability.date, availability.start_time, availability.end_time, program.duration))
+    if start_time not in windows:
+        return None
+
+    appointment = Appointment(
+        host_id=availability.user_id,
+        availability_id=availability.id,
+        appointment_date=availability.date,
+        start_time=start_time,
+        end_time=windows[start_time],
+        status='posted',
+        physical_location=availability.physical_location or program.physical_location,
+        meeting_url=availability.meeting_url or program.meeting_url
+    )
+
+    try:
+        # another request may materialize the same slot at the same time
+        with db.session.begin_nested():
+            db.session.add(appointment)
+    except IntegrityError:
+        appointment = Appointment.query.filter_by(availability_id=availability_id, start_time=start_time).one()
+    return appointment
@@ -17,13 +17,23 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity, \
     set_access_cookies, get_jwt, create_access_token
-from sqlalchemy import extract, or_, and_, func
-from .models import User, Appointment, ProgramDetails, Availability, AppointmentComment, CourseDetails, CourseMembers
+from sqlalchemy import or_, and_, select
+from sqlalchemy.orm import joinedload
+from .models import User, Appointment, ProgramDetails, Availability, AvailabilityRule, AppointmentComment, CourseDetails, CourseMembers, OpenSlot
 from . import db
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from .mail import send_email
-from .programs import get_program_name, get_course_name
-from .user import is_student, is_instructor
+from .outbox import enqueue_email
+from .calendar_jobs import enqueue_calendar_create, enqueue_calendar_update, enqueue_calendar_delete
+from .open_slots import refresh_availability_open_slots
+from .availability_rules import ensure_availability_rules_expanded
+from .user import is_student, is_instructor, get_user
+from .slots import get_virtual_slot_id
+from .cache import cached, PROGRAMS
+from .etag import get_rows_version, make_etag, not_modified, with_etag
+from .pagination import apply_appointment_filters, paginate_appointments, PaginationError
+from .reservations import reserve_appointment_slot, reserve_appointment_slots, apply_status_change, ReservationError, \
+    MeetingLimitReached
 from ics import Calendar, Event
 from datetime import datetime, timedelta
 from dateutil import parser
@@ -31,6 +41,9 @@ import pytz
 
 student = Blueprint('student', __name__)
 
+# most appointments a student can reserve in one batch
+MAX_BATCH_RESERVATIONS = 100
+
 # token generator
 @student.after_request
 def refresh_expiring_jwts(response):
@@ -54,144 +67,118 @@ def refresh_expiring_jwts(response):
 def get_global_programs(instructor_id):
     try:
         if is_instructor(instructor_id):
-            # get all global programs for the instructor
-            all_global_programs = ProgramDetails.query.filter(
-                and_(ProgramDetails.course_id == None, ProgramDetails.instructor_id == instructor_id)
-            ).all()
-
-            # global programs found
-            if all_global_programs:
-                all_formatted_programs = []
-
-                for program in all_global_programs:
-                    # convert attributes to a object
-                    program_info = {
-                        'id': program.id,
-                        'name': program.name,
-                        'description': program.description,
-                        'duration': program.duration,
-                        'physical_location': program.physical_location,
-                        'meeting_url': program.meeting_url,
-                        'auto_approve_appointments': program.auto_approve_appointments,
-                        'max_daily_meetings': program.max_daily_meetings,
-                        'max_weekly_meetings': program.max_weekly_meetings,
-                        'max_monthly_meetings': program.max_monthly_meetings,
-                        'isDropins': program.isDropins,
-                    }
-
-                    # append object to list
-                    all_formatted_programs.append(program_info)
-
-                return all_formatted_programs
-            else: 
-                # no global programs found
-                return None
+            return cached(PROGRAMS, ('student_global_programs', str(instructor_id)), lambda: load_global_programs(instructor_id))
         else:
             # instructor not found
             return None
     except Exception as e:
         return None
 
+# load and format the global programs a student can see for a instructor
+def load_global_programs(instructor_id):
+    # get all global programs for the instructor
+    all_global_programs = ProgramDetails.query.filter(
+        and_(ProgramDetails.course_id == None, ProgramDetails.instructor_id == instructor_id)
+    ).all()
+
+    # global programs found
+    if all_global_programs:
+        all_formatted_programs = []
+
+        for program in all_global_programs:
+            # convert attributes to a object
+            program_info = {
+                'id': program.id,
+                'name': program.name,
+                'description': program.description,
+                'duration': program.duration,
+                'physical_location': program.physical_location,
+                'meeting_url': program.meeting_url,
+                'auto_approve_appointments': program.auto_approve_appointments,
+                'max_daily_meetings': program.max_daily_meetings,
+                'max_weekly_meetings': program.max_weekly_meetings,
+                'max_monthly_meetings': program.max_monthly_meetings,
+                'isDropins': program.isDropins,
+            }
+
+            # append object to list
+            all_formatted_programs.append(program_info)
+
+        return all_formatted_programs
+    else: 
+        # no global programs found
+        return None
+
+# Helper function to build the calendar event of an appointment for .ics files
+def build_appointment_event(appointment):
+    # Create datetime objs for ics file
+    timezone_offset = "-08:00"  # PST timezone offset
+
+    # Combine date and time
+    combined_start_datetime = datetime.combine(appointment.appointment_date, appointment.start_time)
+    combined_end_datetime = datetime.combine(appointment.appointment_date, appointment.end_time)
+
+    event = Event()
+    event.name = str(appointment.availability.program_details.name)
+    event.begin = combined_start_datetime.strftime("%Y-%m-%dT%H:%M:%S") + timezone_offset
+    event.end = combined_end_datetime.strftime("%Y-%m-%dT%H:%M:%S") + timezone_offset
+    return event
+
 # Helper function to send confirmation email to attendee and host
 def send_confirmation_email(appointment):
     attendee = User.query.get(appointment.attendee_id)
     host = User.query.get(appointment.host_id)
 
     if attendee and host:
-        attendee_email_subject = f'{appointment.availability.program_details.name} confirmation: {appointment.appointment_date} at {appointment.start_time}.'
-        attendee_email_content = f'Your {appointment.availability.program_details.name} appointment with {host.name} is confirmed for {appointment.appointment_date} at {appointment.start_time}.'
-
-        host_email_subject = f'{appointment.availability.program_details.name} confirmation: {appointment.appointment_date} at {appointment.start_time}.'
-        host_email_content = f'Your {appointment.availability.program_details.name} appointment with {attendee.name} is confirmed for {appointment.appointment_date} at {appointment.start_time}.'
+        appointment_date = appointment.appointment_date.isoformat()
+        start_time = appointment.start_time.strftime('%H:%M')
 
-        # Create datetime objs for ics file
-        timezone_offset = "-08:00"  # PST timezone offset
-        date_obj = datetime.strptime(str(appointment.appointment_date), "%Y-%m-%d")
+        attendee_email_subject = f'{appointment.availability.program_details.name} confirmation: {appointment_date} at {start_time}.'
+        attendee_email_content = f'Your {appointment.availability.program_details.name} appointment with {host.name} is confirmed for {appointment_date} at {start_time}.'
 
-        start_time_obj = datetime.strptime(appointment.start_time, "%H:%M")
-        end_time_obj = datetime.strptime(appointment.end_time, "%H:%M")
+        host_email_subject = f'{appointment.availability.program_details.name} confirmation: {appointment_date} at {start_time}.'
+        host_email_content = f'Your {appointment.availability.program_details.name} appointment with {attendee.name} is confirmed for {appointment_date} at {start_time}.'
 
-        # Combine date and time
-        combined_start_datetime = date_obj + timedelta(hours=start_time_obj.hour, minutes=start_time_obj.minute)
-        combined_end_datetime = date_obj + timedelta(hours=end_time_obj.hour, minutes=end_time_obj.minute)
-
-        # Format the combined datetime with timezone offset
-        formatted_start_datetime = combined_start_datetime.strftime("%Y-%m-%dT%H:%M:%S") + timezone_offset
-        formatted_end_datetime = combined_end_datetime.strftime("%Y-%m-%dT%H:%M:%S") + timezone_offset
-        
         # Create an .ics file for the appointment
         cal = Calendar()
-        event = Event()
-        event.name = str(appointment.availability.program_details.name)
-        event.begin = formatted_start_datetime
-        event.end = formatted_end_datetime
-        cal.events.add(event)
+        cal.events.add(build_appointment_event(appointment))
         ics_data = cal.serialize()
         
-        # Attach the .ics file to the email
-        send_email(host.email, attendee_email_subject, attendee_email_content, ics_data)
+        # Attach the .ics file to the email, sent by the outbox worker once the booking commits
+        enqueue_email(host.email, attendee_email_subject, attendee_email_content, ics_data)
         return True
     return False
 
-# Helper function to get the start and end dates of the week for a given date
-def get_week_range(date_str):
-    date = datetime.strptime(date_str, '%Y-%m-%d')
-    start_of_week = date - timedelta(days=date.weekday())
-    end_of_week = start_of_week + timedelta(days=6)
-    return start_of_week.strftime('%Y-%m-%d'), end_of_week.strftime('%Y-%m-%d')
-
-# Helper function to update appointments and availabilities status
-def update_appointments_status(host_id, appointment_date, scope):
-    parsed_appointment_date = datetime.strptime(appointment_date, '%Y-%m-%d')
-    if scope == 'daily':
-        # Update appointments for the day
-        appointments = Appointment.query.filter(
-            Appointment.host_id == host_id,
-            func.date(Appointment.appointment_date) == appointment_date,
-            Appointment.status == 'posted'
-        ).all()
-        # Update the availability for the day
-        availabilities = Availability.query.filter(
-            Availability.user_id == host_id,
-            func.date(Availability.date) == appointment_date
-        ).all()
-    elif scope == 'weekly':
-        start_of_week, end_of_week = get_week_range(appointment_date)
-        # Update appointments for the week
-        appointments = Appointment.query.filter(
-            Appointment.host_id == host_id,
-            func.date(Appointment.appointment_date).between(start_of_week, end_of_week),
-            Appointment.status == 'posted'
-        ).all()
-        # Update availabilities for the week
-        availabilities = Availability.query.filter(
-            Availability.user_id == host_id,
-            func.date(Availability.date).between(start_of_week, end_of_week)
-        ).all()
-    elif scope == 'monthly':
-        #Your code here
-        appointments = Appointment.query.filter(
-            Appointment.host_id == host_id,
-            extract('month', func.date(Appointment.appointment_date)) == parsed_appointment_date.month,
-            extract('year', func.date(Appointment.appointment_date)) == parsed_appointment_date.year,
-            Appointment.status == 'posted'
-        ).all()
-
-        # Update availabilities for the month
-        availabilities = Availability.query.filter(
-            Availability.user_id == host_id,
-            extract('month', func.date(Availability.date)) == parsed_appointment_date.month,
-            extract('year', func.date(Availability.date)) == parsed_appointment_date.year
-        ).all()
-        
-    # Set all fetched appointments to 'inactive'
-    for appt in appointments:
-        appt.status = 'inactive'
+# Helper function to send one confirmation for a batch of reserved appointments to the student and to each host,
+# with every meeting in a single .ics file
+def send_batch_confirmation_email(appointments):
+    appointments = sorted(appointments, key=lambda appointment: (appointment.appointment_date, appointment.start_time))
+    user_ids = {appointment.attendee_id for appointment in appointments} | {appointment.host_id for appointment in appointments}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
 
-    # Set all fetched availabilities to 'inactive'
-    for avail in availabilities:
-        avail.status = 'inactive'
-    db.session.commit()
+    # the student's meetings, then each host's
+    recipients = defaultdict(list)
+    for appointment in appointments:
+        recipients[appointment.attendee_id].append((appointment, users.get(appointment.host_id)))
+        recipients[appointment.host_id].append((appointment, users.get(appointment.attendee_id)))
+
+    for user_id, meetings in recipients.items():
+        recipient = users.get(user_id)
+        if not recipient:
+            continue
+
+        cal = Calendar()
+        lines = []
+        for appointment, other in meetings:
+            cal.events.add(build_appointment_event(appointment))
+            with_name = f' with {other.name}' if other else ''
+            lines.append(f'<li>{appointment.availability.program_details.name}{with_name} on '
+                         f'{appointment.appointment_date.isoformat()} at {appointment.start_time.strftime("%H:%M")}</li>')
+
+        subject = f'{len(meetings)} appointments confirmed' if len(meetings) > 1 else '1 appointment confirmed'
+        content = f'Your appointments are confirmed:<ul>{"".join(lines)}</ul>'
+        enqueue_email(recipient.email, subject, content, cal.serialize())
+    return True
 
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 ""               Endpoint Functions                ""
@@ -209,54 +196,36 @@ def get_student_dropins(course_id):
 
             if member:
                 course_information = CourseDetails.query.filter(CourseDetails.id == member.course_id).first()
-                programs_in_course = ProgramDetails.query.filter(ProgramDetails.course_id == member.course_id).all()
-
-                all_formatted_programs = []
-
-                if programs_in_course:
-                    for program in programs_in_course:
-                        program_info = {
-                            'id': program.id,
-                            'isDropins': program.isDropins,
-                        }
-                        all_formatted_programs.append(program_info)
-                    
-                # get global programs
-                global_programs = get_global_programs(course_information.instructor_id)
-
-                # if there are global programs: append to all_formatted_programs with their id and isDropins
-                if global_programs is not None:
-                    global_programs = [{'id': program['id'], 'isDropins': program['isDropins']} for program in global_programs]
-
-                    for program in global_programs:
-                        all_formatted_programs.append(program)
-
-                # then filter by isDropins == True
-                all_formatted_programs = [program for program in all_formatted_programs if program.get('isDropins') == True]
-
-                dropin_times = []
 
-                # for each program, get the availabilities attached to it
-                for program in all_formatted_programs:
-                    availabilities = Availability.query.filter_by(program_id=program.get('id')).all()
-
-                    # for each availability, get the program id, name, date, start time, and end time
-                    for availability in availabilities:
-                        program_name = get_program_name(availability.program_details.id)
-
-                        # convert attributes to a object
-                        availability_info = {
-                            'id': availability.id,
-                            'name': program_name,
-                            'date': availability.date,
-                            'start_time': availability.start_time,
-                            'end_time': availability.end_time,
-                        }
+                # store the recurring drop-ins of these programs that have come into view
+                ensure_availability_rules_expanded(('dropins', member.course_id), AvailabilityRule.program_id.in_(
+                    select(ProgramDetails.id).where(or_(
+                        ProgramDetails.course_id == member.course_id,
+                        and_(ProgramDetails.course_id == None, ProgramDetails.instructor_id == course_information.instructor_id)
+                    ))
+                ))
+
+                # drop-ins of the course's programs and of the instructor's global programs, in one indexed read
+                dropins = OpenSlot.query.filter(
+                    OpenSlot.is_dropin == True,
+                    or_(
+                        OpenSlot.course_id == member.course_id,
+                        and_(OpenSlot.course_id == None, OpenSlot.instructor_id == course_information.instructor_id)
+                    )
+                ).order_by(OpenSlot.date, OpenSlot.start_time, OpenSlot.id).all()
 
-                        # append object to return list
-                        dropin_times.append(availability_info)
+                # convert attributes to a object
+                dropin_times = [
+                    {
+                        'id': dropin.availability_id,
+                        'name': dropin.program_name,
+                        'date': dropin.date,
+                        'start_time': dropin.start_time,
+                        'end_time': dropin.end_time,
+                    }
+                    for dropin in dropins
+                ]
 
-                # when all programs have been iterated through, return the list
                 return jsonify(dropin_times), 200
             else:
                 return jsonify({"msg": "User not found in course"}), 404
@@ -278,20 +247,25 @@ def get_student_appointments_for_course():
 
         meeting_type = request.args.get('type', 'all')
         current_time_pst = datetime.now(timezone.utc) - timedelta(hours=8)
-        current_date_str = current_time_pst.strftime('%Y-%m-%d')
-        current_time_str = current_time_pst.strftime('%H:%M')
+        current_date = current_time_pst.date()
+        current_time = current_time_pst.time().replace(second=0, microsecond=0)
 
-        appointments_query = Appointment.query.filter(Appointment.attendee_id == student_id)
+        # load the host, program and course with the appointments in a single SELECT
+        appointments_query = Appointment.query.options(
+            joinedload(Appointment.host),
+            joinedload(Appointment.course),
+            joinedload(Appointment.availability).joinedload(Availability.program_details)
+        ).filter(Appointment.attendee_id == student_id)
 
         # filter appointments based on meeting type
         if meeting_type in ['upcoming', 'past', 'pending']:
             if meeting_type == 'upcoming':
                 appointments_query = appointments_query.filter(
                     or_(
-                        Appointment.appointment_date > current_date_str,
+                        Appointment.appointment_date > current_date,
                         and_(
-                            Appointment.appointment_date == current_date_str,
-                            Appointment.start_time >= current_time_str
+                            Appointment.appointment_date == current_date,
+                            Appointment.start_time >= current_time
                         )
                     ),
                     Appointment.status == 'reserved'
@@ -299,10 +273,10 @@ def get_student_appointments_for_course():
             elif meeting_type == 'past':
                 appointments_query = appointments_query.filter(
                     or_(
-                        Appointment.appointment_date < current_date_str,
+                        Appointment.appointment_date < current_date,
                         and_(
-                            Appointment.appointment_date == current_date_str,
-                            Appointment.start_time < current_time_str
+                            Appointment.appointment_date == current_date,
+                            Appointment.start_time < current_time
                         )
                     ),
                     Appointment.status.in_(['reserved', 'completed', 'rejected', 'missed', 'canceled'])
@@ -310,21 +284,27 @@ def get_student_appointments_for_course():
             elif meeting_type == 'pending':
                 appointments_query = appointments_query.filter(
                     or_(
-                        Appointment.appointment_date > current_date_str,
+                        Appointment.appointment_date > current_date,
                         and_(
-                            Appointment.appointment_date == current_date_str,
-                            Appointment.start_time >= current_time_str
+                            Appointment.appointment_date == current_date,
+                            Appointment.start_time >= current_time
                         )
                     ),
                     Appointment.status == 'pending'
                 )
 
+        # optional program, course and date filters, then one page in (date, start_time, id) order
+        try:
+            appointments_query = apply_appointment_filters(appointments_query, request.args)
+            appointments, next_cursor = paginate_appointments(appointments_query, request.args)
+        except PaginationError as e:
+            return jsonify({"error": str(e)}), 400
+
         student_appointments = []
-        appointments = appointments_query.all()
 
         # iterate through appointments
         for appt in appointments:
-            host = User.query.get(appt.host_id) if appt.host_id else None
+            host = appt.host
             # create an object for the host's information
             host_info = {
                 "name": host.name,
@@ -334,8 +314,8 @@ def get_student_appointments_for_course():
             } if host else {}
 
             # get program name and course name
-            program_name = get_program_name(appt.availability.program_details.id)
-            course_name = get_course_name(appt.course_id)
+            program_name = appt.availability.program_details.name
+            course_name = appt.course.name if appt.course else None
 
             # add appointment information to student_appointments
             student_appointments.append({
@@ -354,7 +334,7 @@ def get_student_appointments_for_course():
                 "host": host_info
             })
 
-        return jsonify(student_appointments=student_appointments), 200
+        return jsonify(student_appointments=student_appointments, next_cursor=next_cursor), 200
     except Exception as e:
         print(e)
         return jsonify({"error": str(e)}), 500
@@ -368,7 +348,20 @@ def get_student_programs():
 
         if not is_student(student_id):
             return jsonify({"error": "Student not found"}), 404
-        
+
+        # the student's courses and their course and global programs
+        student_courses = select(CourseMembers.course_id).where(CourseMembers.user_id == student_id)
+        course_filter = CourseDetails.id.in_(student_courses)
+        program_filter = or_(
+            ProgramDetails.course_id.in_(student_courses),
+            and_(ProgramDetails.course_id.is_(None), ProgramDetails.instructor_id.in_(select(CourseDetails.instructor_id).where(course_filter)))
+        )
+
+        etag = make_etag('student_programs', student_id, get_rows_version(CourseDetails, course_filter), get_rows_version(ProgramDetails, program_filter))
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+
         all_student_courses = CourseDetails.query.join(CourseMembers, CourseDetails.id == CourseMembers.course_id).filter_by(user_id=student_id).all()
 
         if all_student_courses:
@@ -399,10 +392,10 @@ def get_student_programs():
                     for global_program in global_programs:
                         all_programs.append(global_program)
             
-            return jsonify(all_programs), 200
+            return with_etag((jsonify(all_programs), 200), etag)
         else: 
             # no courses found for student
-            return jsonify([]), 200
+            return with_etag((jsonify([]), 200), etag)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -466,18 +459,24 @@ def cancel_appointment(appointment_id):
         # Check if the appointment was booked by this student 
         if appointment.status == 'reserved' or appointment.status == 'pending' and appointment.attendee_id == student.id:
             current_time = datetime.now() - timedelta(hours=8)
-            appointment_datetime = datetime.strptime(appointment.appointment_date + ' ' + appointment.start_time, '%Y-%m-%d %H:%M')
+            appointment_datetime = datetime.combine(appointment.appointment_date, appointment.start_time)
                                 
             #check if the appointment is in the future
             if appointment_datetime > current_time:
+                # remove the Outlook event in the background
+                enqueue_calendar_delete(appointment)
+
                 # Make the appointment available for reservation
+                old_status = appointment.status
                 appointment.status = 'posted'
                 appointment.meeting_url = None
                 appointment.attendee_id = None
                 appointment.notes = None
                 appointment.event_id = None
                 
+                apply_status_change(appointment, old_status, 'posted')
                 db.session.delete(appointment)
+                refresh_availability_open_slots([appointment.availability_id])
                 db.session.commit()
                 return jsonify({"message": "Appointment cancelled successfully"}), 200
             else:
@@ -519,6 +518,7 @@ def update_appointment(appointment_id):
         appointment.physical_location = data.get('physical_location', appointment.physical_location)
         appointment.meeting_url = data.get('meeting_url', appointment.meeting_url) 
         appointment.notes = data.get('notes',appointment.notes)
+        enqueue_calendar_update(appointment)
         
         # Commit the changes to the database
         db.session.commit()
@@ -632,33 +632,34 @@ def get_available_appointments(program_id, course_id):
             if program.course_id == None:
                 course_id = None
             
-            # get all future appointments for the program
-            future_appointments = Appointment.query.join(Availability).join(ProgramDetails).filter(
-                (Appointment.status == 'posted') &
-                (ProgramDetails.id == program_id) &
-                (ProgramDetails.course_id == course_id) &
-                (Appointment.appointment_date > now.date())
-            ).all()
+            # store the recurring availability of this program that has come into view
+            ensure_availability_rules_expanded(('program', program.id), AvailabilityRule.program_id == program.id)
 
+            # one range read of the open slots (stored and virtual) for the program
+            open_slots = OpenSlot.query.filter(
+                OpenSlot.course_id == course_id,
+                OpenSlot.program_id == program_id,
+                OpenSlot.is_dropin == False,
+                OpenSlot.date > now.date()
+            ).order_by(OpenSlot.date, OpenSlot.start_time).all()
 
             available_appointments = []
-            for appt in future_appointments:
+            for slot in open_slots:
                 # convert attributes to a object
                 appointment_data = {
-                    "appointment_id": appt.id,
-                    "physical_location": appt.physical_location,
-                    "date": appt.appointment_date,
-                    "program_id": appt.availability.program_details.id,
-                    "start_time": appt.start_time,
-                    "end_time": appt.end_time,
-                    "status": appt.status,
-                    "meeting_url": appt.meeting_url
+                    "appointment_id": slot.appointment_id if slot.appointment_id is not None else get_virtual_slot_id(slot.availability_id, slot.start_time),
+                    "physical_location": slot.physical_location,
+                    "date": slot.date,
+                    "program_id": slot.program_id,
+                    "start_time": slot.start_time,
+                    "end_time": slot.end_time,
+                    "status": 'posted',
+                    "meeting_url": slot.meeting_url
                 }
 
                 # append object to list
                 available_appointments.append(appointment_data)
-                
-            print(f"Available appointments: {available_appointments}")         
+
             return jsonify({"available_appointments": available_appointments})
         else:
             return jsonify({"error": "Program not found"}), 404
@@ -698,101 +699,75 @@ def reserve_appointment(appointment_id, course_id):
     try:
         student_id = get_jwt_identity()
 
-        student = User.query.get(student_id)
+        student = get_user(student_id)
         if not student or student.account_type != 'student':
             return jsonify({"error": "Only students are allowed to book sessions!"}), 400
         
-        appointment = Appointment.query.get(appointment_id)
-        
-        if not appointment or appointment.status != 'posted':
-            return jsonify({"error": "Appointment is not available for reservation"}), 400
-        
         data = request.get_json()
 
-        current_time = datetime.now() - timedelta(hours=8)
-        appointment_datetime = datetime.strptime(appointment.appointment_date + ' ' + appointment.start_time, '%Y-%m-%d %H:%M')
-        if appointment_datetime <= current_time:
-            return jsonify({"error": "Cannot reserve past appointments"}), 400
-
-        instructor_limits = ProgramDetails.query.filter_by(id=appointment.availability.program_details.id).first()
-
-        # Calculate week range for the appointment
-        start_of_week, end_of_week = get_week_range(appointment.appointment_date)
-
-        # Count current reserved and pending appointments for the day
-        daily_count = Appointment.query.filter(
-            Appointment.host_id == appointment.host_id,
-            func.date(Appointment.appointment_date) == appointment.appointment_date,
-            Appointment.status.in_(['reserved', 'pending'])
-        ).count()
-
-        # Count current reserved and pending appointments for the week
-        weekly_count = Appointment.query.filter(
-            Appointment.host_id == appointment.host_id,
-            func.date(Appointment.appointment_date).between(start_of_week, end_of_week),
-            Appointment.status.in_(['reserved', 'pending'])
-        ).count()
-        
-        parsed_appointment_date = datetime.strptime(appointment.appointment_date, '%Y-%m-%d')
-
-        # Count current reserved and pending appointments for the month
-        monthly_count = Appointment.query.filter(
-            Appointment.host_id == appointment.host_id,
-            extract('month', func.date(Appointment.appointment_date)) == parsed_appointment_date.month,
-            extract('year', func.date(Appointment.appointment_date)) == parsed_appointment_date.year,
-            Appointment.status.in_(['reserved', 'pending'])
-        ).count()
-        
-        # Check against daily and weekly limits
-        if (not instructor_limits) or (daily_count < instructor_limits.max_daily_meetings and \
-            weekly_count < instructor_limits.max_weekly_meetings and monthly_count < instructor_limits.max_monthly_meetings):
-            try:
-                appointment.attendee_id = student_id
-                appointment.course_id = course_id
-                appointment.notes = data.get('notes', None)
-                if instructor_limits.auto_approve_appointments:
-                    appointment.status = 'reserved'
-                else:
-                    appointment.status = 'pending'
-                appointment.course_id = course_id
-                    
-                # Check if this appointment hits the daily or weekly limit
-                hits_daily_limit = daily_count + 1 == instructor_limits.max_daily_meetings
-                hits_weekly_limit = weekly_count + 1 == instructor_limits.max_weekly_meetings
-                hits_monthly_limit = monthly_count + 1 == instructor_limits.max_monthly_meetings
-                db.session.commit()
-                
-                if hits_daily_limit:
-                    update_appointments_status(appointment.host_id, appointment.appointment_date, 'daily')
-                elif hits_weekly_limit:
-                    update_appointments_status(appointment.host_id, appointment.appointment_date, 'weekly')
-                elif hits_monthly_limit:
-                    update_appointments_status(appointment.host_id, appointment.appointment_date, 'monthly')
-
-                
-                if appointment.status == 'reserved':
-                    send_email_success = send_confirmation_email(appointment)
-                    if send_email_success:
-                        return jsonify({"message": "Appointment reserved and confirmation email sent", "status": appointment.status}), 201
-                    else:
-                        return jsonify({"message": "Appointment reserved but email not sent", "status": appointment.status}), 202
-                else:
-                    return jsonify({"message": "Appointment pending approval", "status": appointment.status}), 201
-            except Exception as e:
-                db.session.rollback()
-                print(f"Exception: {str(e)}")
-                return jsonify({"error": f"Exception: {str(e)}"}), 500
+        try:
+            appointment = reserve_appointment_slot(appointment_id, student_id, course_id, data.get('notes', None),
+                                                   on_reserved=send_confirmation_email,
+                                                   on_booked=enqueue_calendar_create)
+        except MeetingLimitReached as e:
+            return jsonify({"message": e.message}), e.status_code
+        except ReservationError as e:
+            return jsonify({"error": e.message}), e.status_code
+
+        if appointment.status == 'reserved':
+            return jsonify({"message": "Appointment reserved and confirmation email queued", "status": appointment.status}), 201
         else:
-            # Update remaining slots if limits are reached
-            if daily_count >= instructor_limits.max_daily_meetings:
-                update_appointments_status(appointment.host_id, appointment.appointment_date, 'daily')
-            elif weekly_count >= instructor_limits.max_weekly_meetings:
-                update_appointments_status(appointment.host_id, appointment.appointment_date, 'weekly')
-            return jsonify({"message": "Meeting limit reached"}), 409
+            return jsonify({"message": "Appointment pending approval", "status": appointment.status}), 201
     except Exception as e:
         print(f"ERM: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# reserve several appointments for a student in one request, e.g. the same weekly slot for the whole term
+@student.route('/student/appointments/reserve-batch', methods=['POST'])
+@jwt_required()
+def reserve_appointments_batch():
+    try:
+        student_id = get_jwt_identity()
+
+        student = get_user(student_id)
+        if not student or student.account_type != 'student':
+            return jsonify({"error": "Only students are allowed to book sessions!"}), 400
+
+        data = request.get_json() or {}
+        appointment_ids = data.get('appointment_ids')
+        course_id = data.get('course_id')
+
+        if not course_id or not isinstance(appointment_ids, list) or not appointment_ids \
+                or not all(isinstance(appointment_id, (int, str)) for appointment_id in appointment_ids):
+            return jsonify({"error": "provide a course_id and a list of appointment_ids"}), 400
+        if len(appointment_ids) > MAX_BATCH_RESERVATIONS:
+            return jsonify({"error": f"at most {MAX_BATCH_RESERVATIONS} appointments can be reserved at once"}), 400
+        atomic = data.get('atomic', True)
+        if not isinstance(atomic, bool):
+            return jsonify({"error": "atomic must be true or false"}), 400
+
+        results = reserve_appointment_slots(appointment_ids, student_id, course_id, data.get('notes', None),
+                                            atomic=atomic,
+                                            on_reserved=send_batch_confirmation_email,
+                                            on_booked=enqueue_calendar_create)
+
+        reserved = [result for result in results if result['status']]
+        response = {
+            "reserved": len(reserved),
+            "failed": len(results) - len(reserved),
+            "results": [
+                {
+                    "appointment_id": result['appointment_id'],
+                    "status": result['status'] or 'failed',
+                    "error": result['error'].message if result['error'] else None,
+                }
+                for result in results
+            ],
+        }
+        return jsonify(response), 201 if reserved else 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Create comments for specific appointment as a student
 @student.route('/student/appointments/<appointment_id>/comment', methods=['POST'])
 @jwt_required()
@@ -0,0 +1,159 @@
+"""
+ * token_cache.py
+ * Last Edited: 10/18/26
+ *
+ * Contains the per-account MSAL token cache. Each Microsoft account has its
+ * own SerializableTokenCache persisted in the MsalTokenCache table and kept
+ * in a bounded in-process LRU, together with the MSAL app bound to it and the
+ * last access token. While that token is valid, acquiring one is a dict
+ * lookup; the cache is only serialized and written back when MSAL reports
+ * has_state_changed (e.g. after a refresh).
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from msal import SerializableTokenCache
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy.exc import IntegrityError
+from .models import MsalTokenCache
+from . import db
+from datetime import datetime
+
+# tokens expiring sooner than this are refreshed instead of reused, in seconds
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# one account's token cache, the MSAL app using it and the last token it produced
+class TokenCacheEntry:
+    def __init__(self, cache, client_app):
+        self.cache = cache
+        self.client_app = client_app
+        self.token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def has_valid_token(self):
+        return self.token is not None and self.expires_at - TOKEN_REFRESH_MARGIN_SECONDS > time.time()
+
+# per-account token caches, persisted in the database and kept in an LRU of max_entries accounts
+class MsalTokenStore:
+    def __init__(self, build_client_app, max_entries=256):
+        self.build_client_app = build_client_app
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    # return a token for the account, or None when it has to sign in again
+    def acquire_token(self, account_id, scopes):
+        entry = self.get_entry(account_id)
+
+        # hot path: the last token is still good
+        if entry.has_valid_token():
+            return entry.token
+
+        with entry.lock:
+            # another request may have refreshed it while we waited
+            if entry.has_valid_token():
+                return entry.token
+
+            account = next(
+                (account for account in entry.client_app.get_accounts() if account['home_account_id'] == account_id),
+                None
+            )
+            token = entry.client_app.acquire_token_silent(scopes, account=account) if account else None
+            if token and 'access_token' in token:
+                entry.token = token
+                entry.expires_at = time.time() + int(token.get('expires_in', 0))
+            else:
+                # no token or an error such as invalid_grant, the old token must not be served again
+                entry.token = None
+                entry.expires_at = 0
+            self.save_if_changed(account_id, entry.cache)
+            return entry.token
+
+    # store a cache filled by an interactive sign-in
+    def add_account(self, account_id, cache):
+        entry = TokenCacheEntry(cache, self.build_client_app(cache))
+        self.save_if_changed(account_id, cache, force=True)
+        # a new sign-in replaces the cache and token held for the account
+        self.put_entry(account_id, entry, replace=True)
+
+    # forget an account's tokens (sign out)
+    def remove_account(self, account_id):
+        with self.lock:
+            self.entries.pop(account_id, None)
+        with db.engine.begin() as connection:
+            connection.execute(delete(MsalTokenCache).where(MsalTokenCache.account_id == account_id))
+
+    def get_entry(self, account_id):
+        with self.lock:
+            entry = self.entries.get(account_id)
+            if entry is not None:
+                self.entries.move_to_end(account_id)
+                return entry
+
+        cache = SerializableTokenCache()
+        data = self.load(account_id)
+        if data:
+            cache.deserialize(data)
+        return self.put_entry(account_id, TokenCacheEntry(cache, self.build_client_app(cache)))
+
+    def put_entry(self, account_id, entry, replace=False):
+        with self.lock:
+            if replace:
+                self.entries[account_id] = entry
+            else:
+                # keep the entry another request loaded first
+                entry = self.entries.setdefault(account_id, entry)
+            self.entries.move_to_end(account_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return entry
+
+    # runs on its own connection so saving tokens never commits the request's db.session
+    def load(self, account_id):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(MsalTokenCache.cache_data).where(MsalTokenCache.account_id == account_id)
+            ).first()
+        return row.cache_data if row else None
+
+    def save_if_changed(self, account_id, cache, force=False):
+        if not (force or cache.has_state_changed):
+            return False
+        values = {'cache_data': cache.serialize(), 'updated_at': datetime.utcnow()}
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                update(MsalTokenCache).where(MsalTokenCache.account_id == account_id).values(**values)
+            ).rowcount
+        if not updated:
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(insert(MsalTokenCache).values(account_id=account_id, **values))
+            except IntegrityError:
+                # another process stored the account first
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        update(MsalTokenCache).where(MsalTokenCache.account_id == account_id).values(**values)
+                    )
+        cache.has_state_changed = False
+        return True
+
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+""             Backend Only Functions              ""
+"""""""""""""""""""""""""""""""""""""""""""""""""""""
+
+# the app's token store, created on first use
+def get_token_store(build_client_app):
+    store = current_app.extensions.get('msal_token_store')
+    if store is None:
+        store = current_app.extensions.setdefault(
+            'msal_token_store',
+            MsalTokenStore(build_client_app, current_app.config.get('MSAL_TOKEN_CACHE_SIZE', 256))
+        )
+    return store
@@ -12,10 +12,14 @@
 
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity, \
-    set_access_cookies, get_jwt, create_access_token
+    set_access_cookies, get_jwt, create_access_token, get_current_user
 from .models import User, Appointment, ProgramDetails, CourseDetails, CourseMembers, ProgramTimes, CourseTimes
-from . import db
-from .mail import send_email
+from . import db, jwt
+from .outbox import enqueue_email
+from .reservations import apply_status_change
+from .calendar_jobs import enqueue_calendar_update, enqueue_calendar_status_change
+from .open_slots import refresh_availability_open_slots
+from .cache import cached, COURSES, PROGRAMS
 from ics import Calendar, Event
 from datetime import datetime, timedelta, timezone
 
@@ -40,108 +44,138 @@ def refresh_expiring_jwts(response):
 ""             Backend Only Functions              ""
 """""""""""""""""""""""""""""""""""""""""""""""""""""
 
+# load the signed-in user once per request (flask_jwt_extended keeps it in g as current_user)
+@jwt.user_lookup_loader
+def load_current_user(jwt_header, jwt_data):
+    return User.query.get(jwt_data["sub"])
+
+# the token belongs to a user that no longer exists
+@jwt.user_lookup_error_loader
+def current_user_not_found(jwt_header, jwt_data):
+    return jsonify({"error": "User not found"}), 404
+
+# return a user, reusing the signed-in user instead of querying it again
+def get_user(user_id):
+    try:
+        user = get_current_user()
+    except RuntimeError:
+        # outside of a request with a verified token
+        user = None
+
+    if user is not None and str(user.id) == str(user_id):
+        return user
+    return User.query.get(user_id)
+
 # check if user is an instructor
 def is_instructor(user_id):
-    instructor = User.query.get(user_id)
+    instructor = get_user(user_id)
     return instructor.account_type == 'instructor' if instructor else False
 
 # check if user is an student
 def is_student(user_id):
-    student = User.query.get(user_id)
+    student = get_user(user_id)
     return student.account_type == 'student' if student else False
 
 # convert a military time object to a standard time object
 def convert_to_standard_time(military_time):
-    military_time_obj = datetime.strptime(military_time, "%H:%M")
-    formatted_hours = military_time_obj.strftime("%I").lstrip("0")
-    standard_time = military_time_obj.strftime(f"{formatted_hours}:%M %p")
+    formatted_hours = military_time.strftime("%I").lstrip("0")
+    standard_time = military_time.strftime(f"{formatted_hours}:%M %p")
 
     return standard_time
 
 # based on the given program id and name, print the times for the program in a string format
 def findStandardTimes(id, name):
     try:
-        # search through CourseTimes
-        if name == "Course Details":
-            tuples = (
-                CourseTimes.query
-                .join(CourseDetails, CourseTimes.course_id == CourseDetails.id)
-                .filter(CourseDetails.id == id)
-            )
-            details = tuples.first().course_details if tuples.first() else None
-
-        # search through ProgramTimes
-        else:
-            tuples = (
-                ProgramTimes.query
-                .join(ProgramDetails, ProgramTimes.program_id == ProgramDetails.id)
-                .filter(ProgramDetails.course_id == id, ProgramDetails.name == name)
-            )
-            details = tuples.first().program_details if tuples.first() else None
-
-        # set physical_location and link
-        times = ""
-        physical_location = details.physical_location if details else "No Location"
-        link = details.meeting_url if details else "No URL"
-
-        tuples = tuples.all()
-
-        if tuples:
-            # convert the times to a string format
-            tempString = ""
-            for obj in tuples:
-                if tempString:
-                    tempString += "/"
-                tempString += (
-                    obj.day + " " + convert_to_standard_time(obj.start_time) + "-" +
-                    convert_to_standard_time(obj.end_time)
-                )
-            times = tempString
-        else:
-            times = "No Known Times"
-
-        return {'times': times, 'physical_location': physical_location, 'link': link }
+        namespace = COURSES if name == "Course Details" else PROGRAMS
+        return cached(namespace, ('standard_times', str(id), name), lambda: load_standard_times(id, name))
     except Exception as e:
         return {"error": str(e)}, 404
 
-# based on the given program name and instructor_id, print the times for their office hours in a string format
-def findInstructorOfficeHours(name, instructor_id):
-    try:
-        # search through ProgramTimes
-        program = (
+# load the times, location and link of a course or one of its programs
+def load_standard_times(id, name):
+    # search through CourseTimes
+    if name == "Course Details":
+        tuples = (
+            CourseTimes.query
+            .join(CourseDetails, CourseTimes.course_id == CourseDetails.id)
+            .filter(CourseDetails.id == id)
+        )
+        details = tuples.first().course_details if tuples.first() else None
+
+    # search through ProgramTimes
+    else:
+        tuples = (
             ProgramTimes.query
             .join(ProgramDetails, ProgramTimes.program_id == ProgramDetails.id)
-            .filter(ProgramDetails.course_id == None, ProgramDetails.name == name, ProgramDetails.instructor_id == instructor_id)
+            .filter(ProgramDetails.course_id == id, ProgramDetails.name == name)
         )
+        details = tuples.first().program_details if tuples.first() else None
+
+    # set physical_location and link
+    times = ""
+    physical_location = details.physical_location if details else "No Location"
+    link = details.meeting_url if details else "No URL"
+
+    tuples = tuples.all()
+
+    if tuples:
+        # convert the times to a string format
+        tempString = ""
+        for obj in tuples:
+            if tempString:
+                tempString += "/"
+            tempString += (
+                obj.day + " " + convert_to_standard_time(obj.start_time) + "-" +
+                convert_to_standard_time(obj.end_time)
+            )
+        times = tempString
+    else:
+        times = "No Known Times"
 
-        program_details = program.first().program_details if program.first() else None
-
-        # set physical_location and link
-        times = ""
-        physical_location = program_details.physical_location if program_details else "No Location"
-        link = program_details.meeting_url if program_details else "No URL"
-        
-        program = program.all()
-
-        if len(program) > 0:
-            # convert the times to a string format
-            tempString = ""
-            for obj in program:
-                if tempString != "":
-                    tempString += "/"
-                tempString += (obj.day + " " + convert_to_standard_time(obj.start_time) + "-" + convert_to_standard_time(obj.end_time))
-            times = tempString
-        else:
-            times = "No Known Times"
+    return {'times': times, 'physical_location': physical_location, 'link': link }
 
-        return {'times': times, 'physical_location': physical_location, 'link': link }
+# based on the given program name and instructor_id, print the times for their office hours in a string format
+def findInstructorOfficeHours(name, instructor_id):
+    try:
+        return cached(PROGRAMS, ('office_hours', str(instructor_id), name), lambda: load_instructor_office_hours(name, instructor_id))
     except Exception as e:
         return jsonify({"error": str(e)}), 401
 
+# load the times, location and link of a instructor's global program
+def load_instructor_office_hours(name, instructor_id):
+    # search through ProgramTimes
+    program = (
+        ProgramTimes.query
+        .join(ProgramDetails, ProgramTimes.program_id == ProgramDetails.id)
+        .filter(ProgramDetails.course_id == None, ProgramDetails.name == name, ProgramDetails.instructor_id == instructor_id)
+    )
+
+    program_details = program.first().program_details if program.first() else None
+
+    # set physical_location and link
+    times = ""
+    physical_location = program_details.physical_location if program_details else "No Location"
+    link = program_details.meeting_url if program_details else "No URL"
+
+    program = program.all()
+
+    if len(program) > 0:
+        # convert the times to a string format
+        tempString = ""
+        for obj in program:
+            if tempString != "":
+                tempString += "/"
+            tempString += (obj.day + " " + convert_to_standard_time(obj.start_time) + "-" + convert_to_standard_time(obj.end_time))
+        times = tempString
+    else:
+        times = "No Known Times"
+
+    return {'times': times, 'physical_location': physical_location, 'link': link }
+
 # get all of the attributes of a user_id from the User table
 def get_user_data(user_id):
     try:
-        user = User.query.get(user_id)
+        user = get_user(user_id)
 
         if user:
             return {
@@ -166,25 +200,25 @@ def send_confirmation_email(appointment):
     host = User.query.get(appointment.host_id)
 
     if attendee and host:
+        appointment_date = appointment.appointment_date.isoformat()
+        start_time = appointment.start_time.strftime('%H:%M')
+
         attendee_email_subject = f'{appointment.availability.program_details.name} Status Update'
         if appointment.status == 'reserved':
-            attendee_email_content = f'Your {appointment.availability.program_details.name} appointment with {host.name} has been reserved for {appointment.appointment_date} at {appointment.start_time}.'
+            attendee_email_content = f'Your {appointment.availability.program_details.name} appointment with {host.name} has been reserved for {appointment_date} at {start_time}.'
         else:
-            attendee_email_content = f'Your {appointment.availability.program_details.name} appointment has been rejected for unknown reason {appointment.appointment_date} at {appointment.start_time}.'
-        attendee_email_content = f'Your {appointment.availability.program_details.name} appointment with {host.name} is confirmed for {appointment.appointment_date} at {appointment.start_time}.'
+            attendee_email_content = f'Your {appointment.availability.program_details.name} appointment has been rejected for unknown reason {appointment_date} at {start_time}.'
+        attendee_email_content = f'Your {appointment.availability.program_details.name} appointment with {host.name} is confirmed for {appointment_date} at {start_time}.'
 
-        host_email_subject = f'{appointment.availability.program_details.name} confirmation: {appointment.appointment_date} at {appointment.start_time}.'
-        host_email_content = f'Your {appointment.availability.program_details.name} appointment with {attendee.name} is confirmed for {appointment.appointment_date} at {appointment.start_time}.'
+        host_email_subject = f'{appointment.availability.program_details.name} confirmation: {appointment_date} at {start_time}.'
+        host_email_content = f'Your {appointment.availability.program_details.name} appointment with {attendee.name} is confirmed for {appointment_date} at {start_time}.'
 
         # Create datetime objs for ics file
         timezone_offset = "-08:00"  # PST timezone offset
-        date_obj = datetime.strptime(appointment.appointment_date, "%Y-%m-%d")
-        start_time_obj = datetime.strptime(appointment.start_time, "%H:%M")
-        end_time_obj = datetime.strptime(appointment.end_time, "%H:%M")
 
         # Combine date and time
-        combined_start_datetime = date_obj + timedelta(hours=start_time_obj.hour, minutes=start_time_obj.minute)
-        combined_end_datetime = date_obj + timedelta(hours=end_time_obj.hour, minutes=end_time_obj.minute)
+        combined_start_datetime = datetime.combine(appointment.appointment_date, appointment.start_time)
+        combined_end_datetime = datetime.combine(appointment.appointment_date, appointment.end_time)
 
         # Format the combined datetime with timezone offset
         formatted_start_datetime = combined_start_datetime.strftime("%Y-%m-%dT%H:%M:%S") + timezone_offset
@@ -199,8 +233,8 @@ def send_confirmation_email(appointment):
         cal.events.add(event)
         ics_data = cal.serialize()
         
-        # Attach the .ics file to the email
-        send_email(attendee.email, attendee_email_subject, attendee_email_content, ics_data)
+        # Attach the .ics file to the email, sent by the outbox worker once the status change commits
+        enqueue_email(attendee.email, attendee_email_subject, attendee_email_content, ics_data)
         return True
     return False
 
@@ -214,7 +248,7 @@ def send_confirmation_email(appointment):
 def get_user_courses():
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_user(user_id)
         
         if user:
             user_courses_info = CourseDetails.query.join(CourseMembers, CourseDetails.id == CourseMembers.course_id).filter_by(user_id=user_id).all()
@@ -284,7 +318,7 @@ def update_user_profile():
     try:
         data = request.get_json()
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
+        user = get_user(user_id)
         
         if not user:
             return jsonify({"error": "User doesn't exist"}), 404
@@ -327,6 +361,7 @@ def update_meeting():
                 appointment.notes = notes
             if meeting_url is not None:
                 appointment.meeting_url = meeting_url
+            enqueue_calendar_update(appointment)
             db.session.commit()
             return jsonify({"message": "Meeting updated successfully"}), 200
         else:
@@ -347,10 +382,14 @@ def update_meeting_status():
         appointment = Appointment.query.get(appointment_id)
 
         if appointment:
+            apply_status_change(appointment, appointment.status, status)
+            enqueue_calendar_status_change(appointment, status)
             appointment.status = status
-            db.session.commit()
+            if appointment.availability_id:
+                refresh_availability_open_slots([appointment.availability_id])
             if appointment.status == 'reserved':
                 send_confirmation_email(appointment)
+            db.session.commit()
             return jsonify({"message": "status updated successfully"}), 200
         else:
             return jsonify({"error": "appointment not found"}), 404
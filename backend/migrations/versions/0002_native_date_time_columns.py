@@ -0,0 +1,87 @@
+"""native DATE/TIME columns for appointment, availability and times tables
+
+Revision ID: 0002_native_date_time
+Revises: 0001_baseline
+Create Date: 2026-10-18 15:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_native_date_time'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+# (table, date columns, time columns) that were stored as String(150)
+TEMPORAL_COLUMNS = [
+    ('appointment', ['appointment_date'], ['start_time', 'end_time']),
+    ('availability', ['date'], ['start_time', 'end_time']),
+    ('course_times', [], ['start_time', 'end_time']),
+    ('program_times', [], ['start_time', 'end_time']),
+]
+
+
+def convert_sqlite_column(table, column, type_):
+    # a batch type change would CAST the ISO strings through SQLite's numeric affinity,
+    # so copy the untouched text into a column of the new type instead
+    op.add_column(table, sa.Column(f'{column}_converted', type_, nullable=True))
+    op.execute(f"UPDATE {table} SET {column}_converted = {column}")
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.drop_column(column)
+        batch_op.alter_column(f'{column}_converted', new_column_name=column)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    for table, date_columns, time_columns in TEMPORAL_COLUMNS:
+        for column in date_columns + time_columns:
+            # empty strings cannot be cast to DATE/TIME
+            op.execute(f"UPDATE {table} SET {column} = NULL WHERE {column} = ''")
+
+        if dialect == 'sqlite':
+            # SQLAlchemy's SQLite TIME type expects HH:MM:SS, rows were stored as HH:MM
+            for column in time_columns:
+                op.execute(sa.text(f"UPDATE {table} SET {column} = {column} || :seconds WHERE length({column}) = 5")
+                           .bindparams(seconds=':00'))
+            for column in date_columns:
+                convert_sqlite_column(table, column, sa.Date())
+            for column in time_columns:
+                convert_sqlite_column(table, column, sa.Time())
+            continue
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in date_columns:
+                batch_op.alter_column(column,
+                                      existing_type=sa.String(length=150),
+                                      type_=sa.Date(),
+                                      existing_nullable=True,
+                                      postgresql_using=f'{column}::date')
+            for column in time_columns:
+                batch_op.alter_column(column,
+                                      existing_type=sa.String(length=150),
+                                      type_=sa.Time(),
+                                      existing_nullable=True,
+                                      postgresql_using=f'{column}::time')
+
+
+def downgrade():
+    for table, date_columns, time_columns in TEMPORAL_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in date_columns:
+                batch_op.alter_column(column,
+                                      existing_type=sa.Date(),
+                                      type_=sa.String(length=150),
+                                      existing_nullable=True)
+            for column in time_columns:
+                batch_op.alter_column(column,
+                                      existing_type=sa.Time(),
+                                      type_=sa.String(length=150),
+                                      existing_nullable=True)
+
+        # restore the HH:MM format the application used to store
+        for column in time_columns:
+            op.execute(f"UPDATE {table} SET {column} = SUBSTR({column}, 1, 5)")
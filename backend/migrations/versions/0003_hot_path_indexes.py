@@ -0,0 +1,47 @@
+"""indexes for the booking and listing hot paths
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_native_date_time
+Create Date: 2026-10-18 16:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_path_indexes'
+down_revision = '0002_native_date_time'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # keep the oldest row of any duplicated enrollment so the unique constraint can be added
+    op.execute(
+        "DELETE FROM course_members WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MIN(id) AS id FROM course_members GROUP BY user_id, course_id) AS keep)"
+    )
+    with op.batch_alter_table('course_members', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_course_members_user_course', ['user_id', 'course_id'])
+
+    op.create_index('ix_appointment_host_date_status', 'appointment', ['host_id', 'appointment_date', 'status'], unique=False)
+    op.create_index('ix_appointment_attendee_status_date', 'appointment', ['attendee_id', 'status', 'appointment_date'], unique=False)
+    op.create_index('ix_appointment_availability_id', 'appointment', ['availability_id'], unique=False)
+    op.create_index('ix_availability_user_program_date', 'availability', ['user_id', 'program_id', 'date'], unique=False)
+    op.create_index('ix_program_details_course_instructor', 'program_details', ['course_id', 'instructor_id'], unique=False)
+    op.create_index('ix_appointment_comment_appointment_id', 'appointment_comment', ['appointment_id'], unique=False)
+    op.create_index('ix_feedback_appointment_id', 'feedback', ['appointment_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_feedback_appointment_id', table_name='feedback')
+    op.drop_index('ix_appointment_comment_appointment_id', table_name='appointment_comment')
+    op.drop_index('ix_program_details_course_instructor', table_name='program_details')
+    op.drop_index('ix_availability_user_program_date', table_name='availability')
+    op.drop_index('ix_appointment_availability_id', table_name='appointment')
+    op.drop_index('ix_appointment_attendee_status_date', table_name='appointment')
+    op.drop_index('ix_appointment_host_date_status', table_name='appointment')
+
+    with op.batch_alter_table('course_members', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_course_members_user_course', type_='unique')
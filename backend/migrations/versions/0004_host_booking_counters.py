@@ -0,0 +1,36 @@
+"""per host and program booking counters for meeting limits
+
+Revision ID: 0004_host_booking_counter
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18 17:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_host_booking_counter'
+down_revision = '0003_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # rows are created from the appointment table the first time a period is booked, so no backfill is needed
+    op.create_table('host_booking_counter',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('host_id', sa.Integer(), nullable=False),
+    sa.Column('program_id', sa.Integer(), nullable=False),
+    sa.Column('period_kind', sa.String(length=10), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['host_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['program_id'], ['program_details.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('host_id', 'program_id', 'period_kind', 'period_start', name='uq_host_booking_counter_period')
+    )
+
+
+def downgrade():
+    op.drop_table('host_booking_counter')
@@ -0,0 +1,41 @@
+"""slot location on availabilities and one appointment per slot
+
+Revision ID: 0006_virtual_slots
+Revises: 0005_email_outbox
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_virtual_slots'
+down_revision = '0005_email_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('availability', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('physical_location', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('meeting_url', sa.String(length=255), nullable=True))
+
+    # fill the new columns from the slots already generated for each availability
+    op.execute(
+        "UPDATE availability SET "
+        "physical_location = (SELECT MAX(appointment.physical_location) FROM appointment WHERE appointment.availability_id = availability.id), "
+        "meeting_url = (SELECT MAX(appointment.meeting_url) FROM appointment WHERE appointment.availability_id = availability.id)"
+    )
+
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_appointment_availability_start', ['availability_id', 'start_time'])
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_appointment_availability_start', type_='unique')
+
+    with op.batch_alter_table('availability', schema=None) as batch_op:
+        batch_op.drop_column('meeting_url')
+        batch_op.drop_column('physical_location')
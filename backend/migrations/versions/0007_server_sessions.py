@@ -0,0 +1,31 @@
+"""server-side session table replacing the filesystem session store
+
+Revision ID: 0007_server_sessions
+Revises: 0006_virtual_slots
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_server_sessions'
+down_revision = '0006_virtual_slots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('server_session',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.Text(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_server_session_expires_at', 'server_session', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_server_session_expires_at', table_name='server_session')
+    op.drop_table('server_session')
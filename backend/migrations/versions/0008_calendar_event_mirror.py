@@ -0,0 +1,45 @@
+"""local mirror of Outlook calendars kept current with Graph delta queries
+
+Revision ID: 0008_calendar_mirror
+Revises: 0007_server_sessions
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_calendar_mirror'
+down_revision = '0007_server_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_event_mirror',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('owner_id', sa.String(length=255), nullable=False),
+    sa.Column('event_id', sa.String(length=255), nullable=False),
+    sa.Column('start_at', sa.DateTime(), nullable=True),
+    sa.Column('end_at', sa.DateTime(), nullable=True),
+    sa.Column('data', sa.Text(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('owner_id', 'event_id', name='uq_calendar_event_mirror_owner_event')
+    )
+    op.create_index('ix_calendar_event_mirror_owner_start', 'calendar_event_mirror', ['owner_id', 'start_at'], unique=False)
+    op.create_table('calendar_sync_state',
+    sa.Column('owner_id', sa.String(length=255), nullable=False),
+    sa.Column('delta_link', sa.Text(), nullable=True),
+    sa.Column('window_start', sa.DateTime(), nullable=True),
+    sa.Column('window_end', sa.DateTime(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+
+
+def downgrade():
+    op.drop_table('calendar_sync_state')
+    op.drop_index('ix_calendar_event_mirror_owner_start', table_name='calendar_event_mirror')
+    op.drop_table('calendar_event_mirror')
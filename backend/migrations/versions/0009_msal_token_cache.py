@@ -0,0 +1,29 @@
+"""per-account MSAL token cache replacing the token cache stored in the session
+
+Revision ID: 0009_msal_token_cache
+Revises: 0008_calendar_mirror
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_msal_token_cache'
+down_revision = '0008_calendar_mirror'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('msal_token_cache',
+    sa.Column('account_id', sa.String(length=255), nullable=False),
+    sa.Column('cache_data', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('account_id')
+    )
+
+
+def downgrade():
+    op.drop_table('msal_token_cache')
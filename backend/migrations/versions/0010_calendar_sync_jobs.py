@@ -0,0 +1,43 @@
+"""queue of appointment changes to write to Outlook calendars
+
+Revision ID: 0010_calendar_sync_jobs
+Revises: 0009_msal_token_cache
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_calendar_sync_jobs'
+down_revision = '0009_msal_token_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_sync_job',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.String(length=255), nullable=False),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('event_id', sa.String(length=255), nullable=True),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index('ix_calendar_sync_job_status_next_attempt', 'calendar_sync_job', ['status', 'next_attempt_at'], unique=False)
+    op.create_index('ix_calendar_sync_job_appointment', 'calendar_sync_job', ['appointment_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_calendar_sync_job_appointment', table_name='calendar_sync_job')
+    op.drop_index('ix_calendar_sync_job_status_next_attempt', table_name='calendar_sync_job')
+    op.drop_table('calendar_sync_job')
@@ -0,0 +1,130 @@
+"""open slot read model behind the student browse endpoints
+
+Revision ID: 0011_open_slots
+Revises: 0010_calendar_sync_jobs
+Create Date: 2026-10-19 09:00:00.000000
+
+The upgrade lists the slots and drop-ins of an existing database, the same
+rows `flask --app main open-slots rebuild` writes.
+
+"""
+from datetime import datetime, timedelta
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_open_slots'
+down_revision = '0010_calendar_sync_jobs'
+branch_labels = None
+depends_on = None
+
+# the tables as of this revision, so the backfill does not depend on later models
+program_details = sa.table('program_details',
+    sa.column('id', sa.Integer), sa.column('course_id', sa.Integer), sa.column('instructor_id', sa.Integer),
+    sa.column('name', sa.String), sa.column('duration', sa.Integer), sa.column('isDropins', sa.Boolean),
+    sa.column('physical_location', sa.String), sa.column('meeting_url', sa.String))
+availability = sa.table('availability',
+    sa.column('id', sa.Integer), sa.column('program_id', sa.Integer), sa.column('date', sa.Date),
+    sa.column('start_time', sa.Time), sa.column('end_time', sa.Time), sa.column('status', sa.String),
+    sa.column('physical_location', sa.String), sa.column('meeting_url', sa.String))
+appointment = sa.table('appointment',
+    sa.column('id', sa.Integer), sa.column('availability_id', sa.Integer), sa.column('appointment_date', sa.Date),
+    sa.column('start_time', sa.Time), sa.column('end_time', sa.Time), sa.column('status', sa.String),
+    sa.column('physical_location', sa.String), sa.column('meeting_url', sa.String))
+open_slot = sa.table('open_slot',
+    sa.column('course_id', sa.Integer), sa.column('program_id', sa.Integer), sa.column('instructor_id', sa.Integer),
+    sa.column('availability_id', sa.Integer), sa.column('appointment_id', sa.Integer), sa.column('is_dropin', sa.Boolean),
+    sa.column('program_name', sa.String), sa.column('date', sa.Date), sa.column('start_time', sa.Time),
+    sa.column('end_time', sa.Time), sa.column('physical_location', sa.String), sa.column('meeting_url', sa.String))
+OPEN_SLOT_COLUMNS = ['course_id', 'program_id', 'instructor_id', 'availability_id', 'appointment_id', 'is_dropin',
+                     'program_name', 'date', 'start_time', 'end_time', 'physical_location', 'meeting_url']
+
+
+# split an availability into windows of duration minutes, as api/slots.py did at this revision
+def get_slot_windows(day, start_time, end_time, duration):
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    step = timedelta(minutes=duration) if duration else end - start
+    windows = []
+    while step and start + step <= end:
+        windows.append((start.time(), (start + step).time()))
+        start += step
+    return windows
+
+
+def backfill_open_slots():
+    program_join = availability.join(program_details, availability.c.program_id == program_details.c.id)
+    is_dropin = sa.func.coalesce(program_details.c.isDropins, sa.false())
+
+    # drop-ins are listed per availability
+    op.execute(open_slot.insert().from_select(OPEN_SLOT_COLUMNS, sa.select(
+        program_details.c.course_id, program_details.c.id, program_details.c.instructor_id, availability.c.id,
+        sa.null(), sa.true(), program_details.c.name, availability.c.date, availability.c.start_time, availability.c.end_time,
+        sa.func.coalesce(availability.c.physical_location, program_details.c.physical_location),
+        sa.func.coalesce(availability.c.meeting_url, program_details.c.meeting_url)
+    ).select_from(program_join).where(is_dropin == sa.true())))
+
+    # stored slots that are still open
+    op.execute(open_slot.insert().from_select(OPEN_SLOT_COLUMNS, sa.select(
+        program_details.c.course_id, program_details.c.id, program_details.c.instructor_id, availability.c.id,
+        appointment.c.id, sa.false(), program_details.c.name, appointment.c.appointment_date, appointment.c.start_time,
+        appointment.c.end_time, appointment.c.physical_location, appointment.c.meeting_url
+    ).select_from(appointment.join(program_join, appointment.c.availability_id == availability.c.id)).where(
+        appointment.c.status == 'posted', is_dropin == sa.false()
+    )))
+
+    # virtual slots are the windows of active availabilities that have no appointment row yet
+    if not current_app.config.get('VIRTUAL_APPOINTMENT_SLOTS', False):
+        return
+    bind = op.get_bind()
+    materialized = set(bind.execute(sa.select(appointment.c.availability_id, appointment.c.start_time)).all())
+    rows = []
+    for slot in bind.execute(sa.select(
+        program_details.c.course_id, program_details.c.id.label('program_id'), program_details.c.instructor_id,
+        program_details.c.name, program_details.c.duration, availability.c.id, availability.c.date,
+        availability.c.start_time, availability.c.end_time,
+        sa.func.coalesce(availability.c.physical_location, program_details.c.physical_location).label('physical_location'),
+        sa.func.coalesce(availability.c.meeting_url, program_details.c.meeting_url).label('meeting_url')
+    ).select_from(program_join).where(availability.c.status == 'active', is_dropin == sa.false())):
+        for start_time, end_time in get_slot_windows(slot.date, slot.start_time, slot.end_time, slot.duration):
+            if (slot.id, start_time) in materialized:
+                continue
+            rows.append({'course_id': slot.course_id, 'program_id': slot.program_id, 'instructor_id': slot.instructor_id,
+                         'availability_id': slot.id, 'appointment_id': None, 'is_dropin': False, 'program_name': slot.name,
+                         'date': slot.date, 'start_time': start_time, 'end_time': end_time,
+                         'physical_location': slot.physical_location, 'meeting_url': slot.meeting_url})
+    if rows:
+        op.bulk_insert(open_slot, rows)
+
+
+def upgrade():
+    op.create_table('open_slot',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=True),
+    sa.Column('program_id', sa.Integer(), nullable=False),
+    sa.Column('instructor_id', sa.Integer(), nullable=True),
+    sa.Column('availability_id', sa.Integer(), nullable=False),
+    sa.Column('appointment_id', sa.Integer(), nullable=True),
+    sa.Column('is_dropin', sa.Boolean(), nullable=False),
+    sa.Column('program_name', sa.String(length=150), nullable=True),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('physical_location', sa.String(length=255), nullable=True),
+    sa.Column('meeting_url', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_open_slot_course_program_date', 'open_slot', ['course_id', 'program_id', 'date', 'start_time'], unique=False)
+    op.create_index('ix_open_slot_availability_start', 'open_slot', ['availability_id', 'start_time'], unique=False)
+    op.create_index('ix_open_slot_dropin_instructor', 'open_slot', ['is_dropin', 'instructor_id', 'course_id'], unique=False)
+
+    backfill_open_slots()
+
+
+def downgrade():
+    op.drop_index('ix_open_slot_dropin_instructor', table_name='open_slot')
+    op.drop_index('ix_open_slot_availability_start', table_name='open_slot')
+    op.drop_index('ix_open_slot_course_program_date', table_name='open_slot')
+    op.drop_table('open_slot')
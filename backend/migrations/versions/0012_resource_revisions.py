@@ -0,0 +1,32 @@
+"""revision stamps on courses and programs for conditional GET requests
+
+Revision ID: 0012_resource_revisions
+Revises: 0011_open_slots
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_resource_revisions'
+down_revision = '0011_open_slots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('course_details', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('program_details', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('program_details', schema=None) as batch_op:
+        batch_op.drop_column('revision')
+
+    with op.batch_alter_table('course_details', schema=None) as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,56 @@
+"""recurring availability rules expanded into availabilities on demand
+
+Revision ID: 0013_availability_rules
+Revises: 0012_resource_revisions
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_availability_rules'
+down_revision = '0012_resource_revisions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('availability_rule',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('program_id', sa.Integer(), nullable=True),
+    sa.Column('day', sa.String(length=50), nullable=True),
+    sa.Column('rrule', sa.String(length=255), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=True),
+    sa.Column('end_time', sa.Time(), nullable=True),
+    sa.Column('exdates', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('physical_location', sa.String(length=255), nullable=True),
+    sa.Column('meeting_url', sa.String(length=255), nullable=True),
+    sa.Column('expanded_until', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['program_id'], ['program_details.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_availability_rule_program_id', 'availability_rule', ['program_id'], unique=False)
+    op.create_index('ix_availability_rule_status_expanded', 'availability_rule', ['status', 'expanded_until'], unique=False)
+
+    with op.batch_alter_table('availability', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rule_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_availability_rule_id', 'availability_rule', ['rule_id'], ['id'])
+        batch_op.create_unique_constraint('uq_availability_rule_date', ['rule_id', 'date'])
+
+
+def downgrade():
+    with op.batch_alter_table('availability', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_availability_rule_date', type_='unique')
+        batch_op.drop_constraint('fk_availability_rule_id', type_='foreignkey')
+        batch_op.drop_column('rule_id')
+
+    op.drop_index('ix_availability_rule_status_expanded', table_name='availability_rule')
+    op.drop_index('ix_availability_rule_program_id', table_name='availability_rule')
+    op.drop_table('availability_rule')
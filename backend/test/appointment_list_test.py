@@ -0,0 +1,130 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, Appointment, Availability, CourseDetails, ProgramDetails
+
+
+# Listing endpoints run a constant number of statements however many appointments there are, and page with cursors
+class AppointmentListTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', title='Dr.', email='instructor@uw.edu', account_type='instructor', status='active')
+        db.session.add(instructor)
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30)
+        db.session.add(program)
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.course_id = course.id
+        self.program_id = program.id
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # add reserved appointments, each with its own student and availability
+    def add_appointments(self, count):
+        first_day = date.today() + timedelta(days=1)
+        existing = Appointment.query.count()
+        for index in range(existing, existing + count):
+            student = User(name=f'Student {index}', email=f'student{index}@uw.edu', account_type='student', status='active')
+            availability = Availability(user_id=self.instructor_id, program_id=self.program_id,
+                                        date=first_day + timedelta(days=index), start_time=time(9, 0), end_time=time(10, 0),
+                                        status='active')
+            db.session.add_all([student, availability])
+            db.session.flush()
+            db.session.add(Appointment(host_id=self.instructor_id, attendee_id=student.id, course_id=self.course_id,
+                                       availability_id=availability.id, appointment_date=availability.date,
+                                       start_time=time(9, 0), end_time=time(9, 30), status='reserved'))
+        db.session.commit()
+
+    # number of statements one GET runs
+    def count_statements(self, url, user_id):
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(user_id)))
+        db.session.expunge_all()
+        with QueryCounter() as counter:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return counter.count, response.get_json()
+
+    def test_instructor_appointments_query_count_is_constant(self):
+        self.add_appointments(2)
+        few, _ = self.count_statements('/instructor/appointments', self.instructor_id)
+        self.add_appointments(40)
+        many, body = self.count_statements('/instructor/appointments', self.instructor_id)
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(body['instructor_appointments']), 42)
+        first = body['instructor_appointments'][0]
+        self.assertEqual((first['name'], first['course_name']), ('Tutoring', 'CSS 101'))
+        self.assertTrue(first['attendee']['email'].startswith('student'))
+
+    def test_student_appointments_query_count_is_constant(self):
+        self.add_appointments(1)
+        student_id = User.query.filter_by(email='student0@uw.edu').one().id
+        few, _ = self.count_statements('/student/appointments', student_id)
+
+        # move 40 more appointments onto the same student
+        self.add_appointments(40)
+        Appointment.query.update({Appointment.attendee_id: student_id})
+        db.session.commit()
+        many, body = self.count_statements('/student/appointments', student_id)
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(body['student_appointments']), 41)
+        first = body['student_appointments'][0]
+        self.assertEqual((first['name'], first['course_name']), ('Tutoring', 'CSS 101'))
+        self.assertEqual(first['host']['title'], 'Dr.')
+
+    def test_instructor_appointments_paginate_with_cursor(self):
+        self.add_appointments(25)
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(self.instructor_id)))
+
+        seen = []
+        url = '/instructor/appointments?limit=10'
+        while url:
+            body = self.client.get(url).get_json()
+            self.assertLessEqual(len(body['instructor_appointments']), 10)
+            seen.extend((appt['date'], appt['appointment_id']) for appt in body['instructor_appointments'])
+            url = f"/instructor/appointments?limit=10&cursor={body['next_cursor']}" if body['next_cursor'] else None
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_instructor_appointments_filters(self):
+        self.add_appointments(10)
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(self.instructor_id)))
+        first_day = date.today() + timedelta(days=1)
+
+        body = self.client.get(f'/instructor/appointments?date_from={(first_day + timedelta(days=2)).isoformat()}'
+                               f'&date_to={(first_day + timedelta(days=4)).isoformat()}').get_json()
+        self.assertEqual(len(body['instructor_appointments']), 3)
+        self.assertIsNone(body['next_cursor'])
+
+        self.assertEqual(len(self.client.get(f'/instructor/appointments?program_id={self.program_id}')
+                             .get_json()['instructor_appointments']), 10)
+        self.assertEqual(self.client.get('/instructor/appointments?course_id=999').get_json()['instructor_appointments'], [])
+
+    def test_bad_pagination_arguments_are_rejected(self):
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(self.instructor_id)))
+        self.assertEqual(self.client.get('/instructor/appointments?cursor=nope').status_code, 400)
+        self.assertEqual(self.client.get('/instructor/appointments?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/instructor/appointments?date_from=10/18').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
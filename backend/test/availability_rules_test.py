@@ -0,0 +1,195 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, sign_in_admin, QueryCounter
+from api import db
+from api.models import User, CourseDetails, CourseMembers, ProgramDetails, ProgramTimes, Availability, AvailabilityRule, \
+    Appointment, OpenSlot
+from api.availability_rules import get_rule_dates, expand_availability_rules
+from api.cache import invalidate_metadata, PROGRAMS
+
+
+class AvailabilityRuleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app(AVAILABILITY_RULE_HORIZON_DAYS=14)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30)
+        db.session.add_all([program, CourseMembers(course_id=course.id, user_id=student.id)])
+        db.session.commit()
+        db.session.add_all([
+            ProgramTimes(program_id=program.id, day='Monday', start_time=time(9), end_time=time(10)),
+            ProgramTimes(program_id=program.id, day='Wednesday', start_time=time(13), end_time=time(14)),
+        ])
+        db.session.commit()
+
+        # a ten week term starting next Monday
+        self.term_start = date.today() + timedelta(days=7 - date.today().weekday())
+        self.instructor_id = instructor.id
+        self.course_id = course.id
+        self.program_id = program.id
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(instructor.id)))
+        self.student_token = create_access_token(identity=str(student.id))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def post_rules(self, **overrides):
+        payload = {
+            'start_date': self.term_start.isoformat(),
+            'end_date': (self.term_start + timedelta(weeks=10, days=-1)).isoformat(),
+            'exdates': [(self.term_start + timedelta(days=2)).isoformat()],
+            'physical_location': 'Room 1',
+        }
+        payload.update(overrides)
+        return self.client.post(f'/instructor/programs/{self.program_id}/availability-rules', json=payload)
+
+    def test_term_is_stored_as_rules_and_expanded_to_the_horizon(self):
+        response = self.post_rules()
+
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual([rule['rrule'] for rule in body['availability_rules']], ['FREQ=WEEKLY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=WE'])
+        self.assertEqual(AvailabilityRule.query.count(), 2)
+
+        # only the dates within 14 days are stored, without the first Wednesday
+        horizon = date.today() + timedelta(days=14)
+        dates = sorted(availability.date for availability in Availability.query.all())
+        self.assertTrue(dates)
+        self.assertTrue(all(availability_date <= horizon for availability_date in dates))
+        self.assertNotIn(self.term_start + timedelta(days=2), dates)
+        self.assertEqual(body['availabilities_added'], len(dates))
+        self.assertEqual(Appointment.query.count(), len(dates) * 2)
+        self.assertEqual(OpenSlot.query.count(), len(dates) * 2)
+        self.assertEqual(Appointment.query.first().physical_location, 'Room 1')
+
+    def test_reads_expand_rules_as_the_window_moves(self):
+        self.post_rules()
+        stored = Availability.query.count()
+
+        # the window grows to cover the whole term
+        self.app.config['AVAILABILITY_RULE_HORIZON_DAYS'] = 90
+        student = self.app.test_client()
+        student.set_cookie('access_token_cookie', self.student_token)
+        response = student.get(f'/student/appointments/available/{self.program_id}/{self.course_id}')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(Availability.query.count(), 10 * 2 - 1)
+        self.assertGreater(Availability.query.count(), stored)
+        self.assertEqual(len(response.get_json()['available_appointments']), (10 * 2 - 1) * 2)
+        self.assertTrue(all(rule.expanded_until == self.term_start + timedelta(weeks=10, days=-1)
+                            for rule in AvailabilityRule.query.all()))
+
+        # the next read skips the expansion check until the cache is dropped
+        with QueryCounter() as cached_read:
+            student.get(f'/student/appointments/available/{self.program_id}/{self.course_id}')
+        invalidate_metadata(PROGRAMS)
+        with QueryCounter() as checked_read:
+            student.get(f'/student/appointments/available/{self.program_id}/{self.course_id}')
+        self.assertEqual(checked_read.count, cached_read.count + 1)
+
+    def test_reads_expand_only_the_rules_they_list(self):
+        other = ProgramDetails(course_id=self.course_id, instructor_id=self.instructor_id, name='Office Hours', duration=30)
+        db.session.add(other)
+        db.session.commit()
+        db.session.add(ProgramTimes(program_id=other.id, day='Friday', start_time=time(9), end_time=time(10)))
+        db.session.commit()
+        self.post_rules()
+        self.client.post(f'/instructor/programs/{other.id}/availability-rules', json={
+            'start_date': self.term_start.isoformat(), 'end_date': (self.term_start + timedelta(weeks=10, days=-1)).isoformat(),
+        })
+        other_stored = Availability.query.filter_by(program_id=other.id).count()
+
+        self.app.config['AVAILABILITY_RULE_HORIZON_DAYS'] = 90
+        student = self.app.test_client()
+        student.set_cookie('access_token_cookie', self.student_token)
+        self.assertEqual(student.get(f'/student/appointments/available/{self.program_id}/{self.course_id}').status_code, 200)
+
+        self.assertEqual(Availability.query.filter_by(program_id=self.program_id).count(), 10 * 2 - 1)
+        self.assertEqual(Availability.query.filter_by(program_id=other.id).count(), other_stored)
+
+        # the instructor's own read extends all of their rules
+        self.assertEqual(self.client.get(f'/instructor/availability/{self.course_id}').status_code, 200)
+        self.assertEqual(Availability.query.filter_by(program_id=other.id).count(), 10)
+
+    def test_changing_program_times_retires_its_rules(self):
+        self.post_rules()
+        stored = Availability.query.count()
+        times_url = f'/course/programs/times/{self.program_id}'
+
+        # the same times again keep the rules
+        same_times = {str(self.program_id): {'Monday': {'start_time': '09:00', 'end_time': '10:00'},
+                                             'Wednesday': {'start_time': '13:00', 'end_time': '14:00'}}}
+        self.assertEqual(self.client.post(times_url, json=same_times).get_json()['availability_rules_retired'], 0)
+
+        response = self.client.post(times_url, json={str(self.program_id): {'Tuesday': {'start_time': '09:00', 'end_time': '10:00'}}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['availability_rules_retired'], 2)
+
+        # the stored dates stay, but the old weekly slots are not expanded any further
+        self.assertEqual({rule.status for rule in AvailabilityRule.query.all()}, {'inactive'})
+        self.assertEqual(expand_availability_rules(date.today() + timedelta(days=90)), 0)
+        self.assertEqual(Availability.query.count(), stored)
+
+    def test_expansion_is_idempotent(self):
+        self.post_rules()
+        stored = Availability.query.count()
+
+        self.assertEqual(expand_availability_rules(), 0)
+        self.assertEqual(Availability.query.count(), stored)
+
+    def test_rule_dates_skip_exdates_and_stay_in_the_term(self):
+        start = date(2026, 1, 5)  # a Monday
+        dates = get_rule_dates('FREQ=WEEKLY;BYDAY=MO', start, date(2026, 1, 26), '2026-01-12')
+        self.assertEqual(dates, (date(2026, 1, 5), date(2026, 1, 19), date(2026, 1, 26)))
+
+    def test_posted_availabilities_replace_rules(self):
+        self.post_rules()
+
+        response = self.client.post(f'/instructor/availability/{self.course_id}', json={
+            'availabilities': [{'id': self.program_id, 'date': (self.term_start + timedelta(days=1)).isoformat(),
+                                'start_time': '09:00', 'end_time': '10:00'}],
+            'duration': 30, 'physical_location': None, 'meeting_url': None, 'isDropins': False, 'program_id': self.program_id,
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AvailabilityRule.query.count(), 0)
+        self.assertEqual(Availability.query.count(), 1)
+
+    def test_admin_program_delete_stops_expansion(self):
+        self.post_rules()
+
+        sign_in_admin(self.client)
+        self.assertEqual(self.client.delete(f'/program/{self.program_id}').status_code, 200)
+
+        self.assertEqual(AvailabilityRule.query.count(), 0)
+        self.assertEqual(expand_availability_rules(date.today() + timedelta(days=90)), 0)
+        self.assertEqual(Availability.query.count(), 0)
+
+    def test_invalid_rules_are_rejected(self):
+        self.assertEqual(self.post_rules(end_date='not-a-date').status_code, 400)
+        self.assertEqual(self.post_rules(end_date=(self.term_start - timedelta(days=1)).isoformat()).status_code, 400)
+        self.assertEqual(self.post_rules(exdates=['2026-13-01']).status_code, 400)
+
+        ProgramTimes.query.delete()
+        db.session.commit()
+        self.assertEqual(self.post_rules().status_code, 400)
+        self.assertEqual(AvailabilityRule.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+from datetime import date, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database
+from api import db
+from api.models import User, Appointment, Availability, AppointmentComment, CourseDetails, ProgramDetails, OpenSlot
+
+
+class BulkAvailabilityTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        db.session.add(instructor)
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=15)
+        db.session.add(program)
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.course_id = course.id
+        self.program_id = program.id
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(instructor.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # post a term of weekday availabilities starting next week
+    def post_term(self, days=70, start_time='09:00', end_time='17:00', **overrides):
+        first_day = date.today() + timedelta(days=7)
+        payload = {
+            'availabilities': [
+                {'id': self.program_id, 'date': (first_day + timedelta(days=day)).isoformat(),
+                 'start_time': start_time, 'end_time': end_time}
+                for day in range(days)
+            ],
+            'duration': 15,
+            'physical_location': 'Room 1',
+            'meeting_url': None,
+            'isDropins': False,
+            'program_id': self.program_id,
+        }
+        payload.update(overrides)
+        return self.client.post(f'/instructor/availability/{self.course_id}', json=payload)
+
+    def test_post_inserts_availabilities_and_slots(self):
+        response = self.post_term()
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual(body['availabilities_added'], 70)
+        self.assertEqual(body['appointments_added'], 70 * 32)
+        self.assertIn('elapsed_ms', body)
+
+        self.assertEqual(Availability.query.count(), 70)
+        self.assertEqual(Appointment.query.filter_by(status='posted', physical_location='Room 1').count(), 70 * 32)
+
+    def test_post_replaces_previous_availabilities(self):
+        self.post_term()
+        appointment = Appointment.query.first()
+        db.session.add(AppointmentComment(appointment_id=appointment.id, user_id=self.instructor_id, appointment_comment='hi'))
+        db.session.commit()
+
+        body = self.post_term(days=5, start_time='10:00', end_time='11:00').get_json()
+        self.assertEqual(body['availabilities_deleted'], 70)
+        self.assertEqual(Availability.query.count(), 5)
+        self.assertEqual(Appointment.query.count(), 5 * 4)
+        self.assertEqual(AppointmentComment.query.count(), 0)
+
+    def test_invalid_entry_rejects_whole_payload(self):
+        self.post_term(days=3)
+
+        response = self.post_term(days=3, end_time='09:10')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('availability 0', response.get_json()['error'])
+        # nothing was deleted
+        self.assertEqual(Availability.query.count(), 3)
+
+    def test_past_and_overlapping_entries_are_skipped(self):
+        payload = {
+            'availabilities': [
+                {'id': self.program_id, 'date': (date.today() - timedelta(days=1)).isoformat(), 'start_time': '09:00', 'end_time': '10:00'},
+                {'id': self.program_id, 'date': (date.today() + timedelta(days=7)).isoformat(), 'start_time': '09:00', 'end_time': '10:00'},
+                {'id': self.program_id, 'date': (date.today() + timedelta(days=7)).isoformat(), 'start_time': '09:30', 'end_time': '11:00'},
+            ],
+        }
+        body = self.post_term(**payload).get_json()
+        self.assertEqual((body['availabilities_added'], body['skipped']), (1, 2))
+
+    def test_dropins_have_no_slots(self):
+        body = self.post_term(days=2, isDropins=True).get_json()
+        self.assertEqual((body['availabilities_added'], body['appointments_added']), (2, 0))
+
+    def test_no_duration_creates_one_slot_per_availability(self):
+        body = self.post_term(days=2, duration=0).get_json()
+        self.assertEqual(body['appointments_added'], 2)
+
+    def test_missing_program_id_still_adds_the_entries(self):
+        response = self.post_term(days=2, program_id=None)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['availabilities_added'], 2)
+        self.assertEqual(OpenSlot.query.filter_by(program_id=self.program_id).count(), 2 * 32)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,350 @@
+import unittest
+import sys
+import os
+import re
+import gc
+import json
+import tracemalloc
+from collections import Counter
+from statistics import median
+from time import perf_counter
+from datetime import date, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter, StubGraphServer
+from api import db
+from api.models import User, ProgramDetails, Availability, Appointment, AppointmentComment, OpenSlot
+from api.cache import invalidate_metadata, COURSES, PROGRAMS
+from api.perf import seed_synthetic_term
+
+# recorded latency, statement count and peak memory of every route, updated with BENCHMARK_UPDATE=1
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+UPDATE_BASELINE = os.environ.get('BENCHMARK_UPDATE', '').lower() in ('1', 'true', 'yes')
+
+# allowed growth over the baseline; latency depends on the machine, BENCHMARK_LATENCY_FACTOR=0 skips it
+LATENCY_FACTOR = float(os.environ.get('BENCHMARK_LATENCY_FACTOR', '5'))
+LATENCY_SLACK_MS = 100
+MEMORY_FACTOR = 2
+MEMORY_SLACK_KIB = 256
+
+# timed runs of each read route, after one warm-up run
+READ_REPEAT = 5
+
+# a four week term with two weeks in the past
+TERM = dict(seed=1, instructors=2, courses_per_instructor=2, students=12, courses_per_student=2, programs_per_course=2,
+            weeks=4, slots_per_day=4, booked_fraction=0.5)
+
+BLUEPRINTS = ('student', 'instructor', 'programs', 'user', 'feedback', 'admin', 'auth')
+
+# (method, path, user, json body) per blueprint, reads first; later writes see the rows earlier ones changed
+ROUTES = {
+    'student': [
+        ('GET', '/course/programs/dropins/{course_id}', 'student', None),
+        ('GET', '/student/appointments?type=upcoming', 'student', None),
+        ('GET', '/student/appointments?type=past', 'student', None),
+        ('GET', '/student/programs/descriptions', 'student', None),
+        ('GET', '/student/appointments/{appointment_id}', 'student', None),
+        ('GET', '/student/programs/appointment-based', 'student', None),
+        ('GET', '/student/appointments/available/{program_id}/{course_id}', 'student', None),
+        ('GET', '/student/appointments/{appointment_id}/comment', 'student', None),
+        ('PUT', '/student/appointments/update/{appointment_id}', 'student', {'notes': 'Bringing my laptop'}),
+        ('POST', '/student/appointments/update_event_id/{appointment_id}', 'student', {'event_id': 'event-1'}),
+        ('POST', '/student/appointments/reserve/{open_appointment_id}/{course_id}', 'student', {'notes': 'Question about lab 2'}),
+        ('POST', '/student/appointments/reserve-batch', 'student', {'course_id': '{course_id}', 'notes': 'Weekly check-in',
+                                                                    'appointment_ids': '{batch_appointment_ids}'}),
+        ('POST', '/student/appointments/{appointment_id}/comment', 'student', {'appointment_comment': 'See you then'}),
+        ('DELETE', '/student/appointments/{appointment_id}/comment/{student_comment_id}', 'student', None),
+        ('POST', '/student/appointments/cancel/{appointment_id}', 'student', None),
+    ],
+    'instructor': [
+        ('GET', '/instructor/programs', 'instructor', None),
+        ('GET', '/instructor/programs/descriptions', 'instructor', None),
+        ('GET', '/instructor/appointments?type=upcoming', 'instructor', None),
+        ('GET', '/instructor/appointments?type=past', 'instructor', None),
+        ('GET', '/instructor/appointments/{appointment_id}/comment', 'instructor', None),
+        ('GET', '/instructor/availability/{course_id}', 'instructor', None),
+        ('GET', '/instructor/programs/{program_id}/availability-rules', 'instructor', None),
+        ('POST', '/instructor/appointments/{appointment_id}/comment', 'instructor', {'appointment_comment': 'Room changed'}),
+        ('DELETE', '/instructor/appointments/{appointment_id}/comment/{instructor_comment_id}', 'instructor', None),
+        ('POST', '/instructor/appointments/cancel/{appointment_id}', 'instructor', None),
+        ('POST', '/instructor/availability/status', 'instructor', {'availability_id': '{availability_id}', 'status': 'inactive'}),
+        ('DELETE', '/instructor/availability/{availability_id}/delete', 'instructor', None),
+        ('POST', '/instructor/availability/{course_id}', 'instructor', {
+            'availabilities': [{'id': '{program_id}', 'date': '{next_week}', 'start_time': '19:00', 'end_time': '21:00'}],
+            'duration': 30, 'physical_location': 'Room 1', 'meeting_url': None, 'isDropins': False, 'program_id': '{program_id}',
+        }),
+        ('POST', '/instructor/programs/{program_id}/availability-rules', 'instructor', {
+            'start_date': '{next_week}', 'end_date': '{term_end}', 'exdates': [], 'physical_location': 'Room 1',
+        }),
+    ],
+    'programs': [
+        ('GET', '/course/details/{course_id}', 'instructor', None),
+        ('GET', '/course/tree', 'instructor', None),
+        ('GET', '/course/times/{course_id}', 'instructor', None),
+        ('GET', '/course/programs/{course_id}', 'instructor', None),
+        ('GET', '/course/programs/times/{course_id}', 'instructor', None),
+        ('POST', '/course/details', 'instructor', {'id': '{course_id}', 'quarter': 'Winter', 'name': 'PERF 100',
+                                                   'physical_location': 'Room 2', 'comments': 'Bring a laptop'}),
+        ('POST', '/course/times/{course_id}', 'instructor', {'{course_id}': {'Monday': {'start_time': '10:00', 'end_time': '11:30'}}}),
+        ('POST', '/course/programs/times/{program_id}', 'instructor', {'{program_id}': {'Tuesday': {'start_time': '13:00', 'end_time': '14:00'}}}),
+        ('POST', '/program/create', 'instructor', {'name': 'Review Session', 'course_id': '{course_id}', 'isDropins': False,
+                                                   'isRangeBased': False}),
+        ('POST', '/program/details', 'instructor', {'course_id': '{course_id}', 'data': {
+            'id': '{program_id}', 'name': 'Tutoring', 'description': 'One on one help', 'duration': 30, 'isDropins': False,
+            'auto_approve_appointments': True}}),
+        ('POST', '/course/create', 'instructor', {'name': 'PERF 900', 'user_id': '{instructor_id}', 'student_ids': ['{student_id}']}),
+        ('POST', '/course/add/user', 'instructor', {'course_id': '{course_id}', 'user_id': '{newcomer_id}'}),
+        ('DELETE', '/program/delete/{program_id}', 'instructor', None),
+    ],
+    'user': [
+        ('GET', '/user/courses', 'student', None),
+        ('GET', '/user/profile/{instructor_id}', 'student', None),
+        ('POST', '/user/profile', 'student', {'name': 'Student Renamed', 'pronouns': 'they/them'}),
+        ('POST', '/appointment/update', 'instructor', {'appointment_id': '{appointment_id}', 'notes': 'Moved online'}),
+        ('POST', '/appointment/update/status', 'instructor', {'appointment_id': '{open_appointment_id}', 'status': 'reserved'}),
+    ],
+    'feedback': [
+        ('GET', '/feedback/all', 'admin', None),
+        ('GET', '/feedback/{completed_appointment_id}', 'student', None),
+        ('POST', '/feedback/add', 'student', {'appointment_id': '{completed_appointment_id}', 'satisfaction': '5',
+                                              'additional_comments': 'Very helpful'}),
+    ],
+    'admin': [
+        ('GET', '/admin/all-users', 'admin', None),
+        ('GET', '/admin/admins', 'admin', None),
+        ('GET', '/admin/students', 'admin', None),
+        ('GET', '/admin/instructors', 'admin', None),
+        ('GET', '/admin/metadata-cache', 'admin', None),
+        ('POST', '/admin/change-account-type', 'admin', {'user_id': '{newcomer_id}', 'new_account_type': 'instructor'}),
+        ('POST', '/admin/change-account-status', 'admin', {'user_id': '{newcomer_id}', 'new_account_status': 'inactive'}),
+        ('POST', '/profile/update/{newcomer_id}', 'admin', {'name': 'Newcomer Renamed'}),
+        ('POST', '/program', 'admin', {'name': 'Writing Center', 'description': 'Essay help', 'duration': 30}),
+        ('POST', '/program/{study_group_id}', 'admin', {'description': 'Weekly study group'}),
+        ('DELETE', '/program/{study_group_id}', 'admin', None),
+    ],
+    'auth': [
+        ('GET', '/profile', 'student', None),
+        ('POST', '/sign-up', None, {'email': 'newstudent@uw.edu', 'name': 'New Student', 'password': 'benchmark-password',
+                                    'verifyPassword': 'benchmark-password', 'userType': 'student'}),
+        ('POST', '/login', None, {'email': os.environ['ADMIN_EMAIL'], 'password': os.environ['ADMIN_PASSWORD']}),
+        ('POST', '/logout', 'student', None),
+    ],
+}
+
+
+# fill '{name}' placeholders in a path or json body, whole placeholders keep the id's type
+def fill(value, ids):
+    if isinstance(value, dict):
+        return {fill(key, ids): fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    if isinstance(value, str):
+        whole = re.fullmatch(r'\{(\w+)\}', value)
+        if whole:
+            return ids[whole.group(1)]
+        return value.format(**ids)
+    return value
+
+# '/program/<int:program_id>' and '/program/{study_group_id}?x=1' -> '/program/{}'
+def get_route_shape(path):
+    return re.sub(r'<[^>]+>|\{\w+\}', '{}', path.split('?')[0])
+
+
+class RouteBenchmarkTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(BASELINE_PATH) as baseline_file:
+            cls.baseline = json.load(baseline_file)
+        cls.recorded = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE_BASELINE and cls.recorded:
+            cls.baseline.update(cls.recorded)
+            with open(BASELINE_PATH, 'w') as baseline_file:
+                json.dump(dict(sorted(cls.baseline.items())), baseline_file, indent=2)
+                baseline_file.write('\n')
+
+    def setUp(self):
+        self.graph = StubGraphServer()
+        self.addCleanup(self.graph.stop)
+        # session gc is off so statement counts do not depend on chance,
+        # and a route that raises is recorded as the 500 it would return in production
+        self.app = create_test_app(MAIL_BACKEND='fake', PERF_INSTRUMENTATION=False, SESSION_GC_EVERY_N_REQUESTS=0,
+                                   PROPAGATE_EXCEPTIONS=False, GRAPH_API_ENDPOINT=self.graph.url)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        today = date.today()
+        seed_synthetic_term(start_date=today - timedelta(days=today.weekday() + 14), **TERM)
+        self.ids = self.find_term_ids()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # the rows the routes are called with: a student with a past meeting and an upcoming one, its instructor and course
+    def find_term_ids(self):
+        today = date.today()
+        booked = Appointment.query.filter(Appointment.attendee_id.isnot(None)).order_by(Appointment.id).all()
+        completed = {}
+        upcoming = {}
+        for appointment in booked:
+            if appointment.status == 'completed':
+                completed.setdefault(appointment.attendee_id, appointment)
+            elif appointment.status == 'reserved' and appointment.appointment_date > today:
+                upcoming.setdefault(appointment.attendee_id, appointment)
+        student_id = min(set(completed) & set(upcoming))
+        appointment = upcoming[student_id]
+        availability = db.session.get(Availability, appointment.availability_id)
+        # an open slot whose availability keeps other open slots once it is booked
+        open_slots = OpenSlot.query.filter(OpenSlot.program_id == availability.program_id, OpenSlot.appointment_id.isnot(None),
+                                           OpenSlot.date > today).order_by(OpenSlot.id).all()
+        per_availability = Counter(slot.availability_id for slot in open_slots)
+        open_slot = next(slot for slot in open_slots if per_availability[slot.availability_id] > 1)
+        batch_slots = [slot for slot in open_slots if slot.availability_id != open_slot.availability_id][:3]
+
+        admin = User.query.filter_by(account_type='admin').first()
+        newcomer = User(name='Newcomer', email='newcomer@uw.edu', account_type='student', status='active')
+        study_group = ProgramDetails(name='Study Group', description='Open study group', duration=60)
+        db.session.add_all([newcomer, study_group])
+        db.session.flush()
+        student_comment = AppointmentComment(appointment_id=appointment.id, user_id=student_id, appointment_comment='Is the room the same?')
+        instructor_comment = AppointmentComment(appointment_id=appointment.id, user_id=appointment.host_id, appointment_comment='Yes')
+        db.session.add_all([student_comment, instructor_comment])
+        db.session.commit()
+
+        return {
+            'student_id': student_id,
+            'instructor_id': appointment.host_id,
+            'admin_id': admin.id,
+            'newcomer_id': newcomer.id,
+            'course_id': appointment.course_id,
+            'program_id': availability.program_id,
+            'availability_id': availability.id,
+            'appointment_id': appointment.id,
+            'open_appointment_id': open_slot.appointment_id,
+            'batch_appointment_ids': [slot.appointment_id for slot in batch_slots],
+            'completed_appointment_id': completed[student_id].id,
+            'student_comment_id': student_comment.id,
+            'instructor_comment_id': instructor_comment.id,
+            'study_group_id': study_group.id,
+            'next_week': (today + timedelta(days=7 - today.weekday())).isoformat(),
+            # a two week term, short enough to be expanded whole whatever the weekday
+            'term_end': (today + timedelta(days=7 - today.weekday() + 13)).isoformat(),
+        }
+
+    # send one request and return its status, latency, statement count and peak traced memory
+    def measure(self, method, path, body):
+        # every request starts with an empty session and a cold metadata cache, as in a fresh worker
+        db.session.remove()
+        invalidate_metadata(COURSES, PROGRAMS)
+        # collector pauses are left out of the timing, as timeit does
+        gc.disable()
+        tracemalloc.start()
+        try:
+            with QueryCounter() as counter:
+                started = perf_counter()
+                response = self.client.open(path, method=method, json=body)
+                seconds = perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            gc.enable()
+        return response.status_code, seconds * 1000, counter.count, peak / 1024
+
+    # measure a route as the given user; reads are warmed up and repeated, writes run once
+    def benchmark(self, method, path, user, body):
+        if user:
+            self.client.set_cookie('access_token_cookie', create_access_token(identity=str(self.ids[f'{user}_id'])))
+        else:
+            self.client.delete_cookie('access_token_cookie')
+
+        path = fill(path, self.ids)
+        body = fill(body, self.ids)
+        if method == 'GET':
+            self.measure(method, path, body)
+            samples = [self.measure(method, path, body) for _ in range(READ_REPEAT)]
+        else:
+            samples = [self.measure(method, path, body)]
+
+        statuses, latencies, statements, peaks = zip(*samples)
+        if method == 'GET':
+            self.assertEqual(len(set(statements)), 1, f"{path}: statement count changed between runs {statements}")
+        return {
+            'status': statuses[-1],
+            'sql': statements[-1],
+            'ms': round(median(latencies), 2),
+            'peak_kib': round(median(peaks), 1),
+        }
+
+    # differences between a route's measurement and its baseline, empty when within budget
+    def compare(self, label, result):
+        expected = self.baseline.get(label)
+        if expected is None:
+            return [f"{label}: no baseline, record one with BENCHMARK_UPDATE=1"]
+
+        problems = []
+        if result['status'] != expected['status']:
+            problems.append(f"{label}: status {result['status']}, baseline {expected['status']}")
+        if result['sql'] != expected['sql']:
+            problems.append(f"{label}: {result['sql']} SQL statements, baseline {expected['sql']} "
+                            f"({result['sql'] - expected['sql']:+d})")
+        if LATENCY_FACTOR and result['ms'] > expected['ms'] * LATENCY_FACTOR + LATENCY_SLACK_MS:
+            problems.append(f"{label}: {result['ms']}ms, baseline {expected['ms']}ms")
+        if result['peak_kib'] > expected['peak_kib'] * MEMORY_FACTOR + MEMORY_SLACK_KIB:
+            problems.append(f"{label}: peak {result['peak_kib']}KiB allocated, baseline {expected['peak_kib']}KiB")
+        return problems
+
+    # benchmark every route of a blueprint in order and fail with every regression at once
+    def run_blueprint(self, blueprint):
+        problems = []
+        for method, path, user, body in ROUTES[blueprint]:
+            label = f'{method} {path}'
+            result = self.benchmark(method, path, user, body)
+            route_problems = self.compare(label, result)
+            # only new routes and routes off their baseline are rewritten, so timing noise stays out of the file
+            if route_problems:
+                self.recorded[label] = result
+            if not UPDATE_BASELINE:
+                problems.extend(route_problems)
+
+        self.assertEqual(self.graph.requests, [])
+        if problems:
+            self.fail("routes over their baseline (rerun with BENCHMARK_UPDATE=1 if the change is intended):\n  "
+                      + "\n  ".join(problems))
+
+    def test_student_routes(self):
+        self.run_blueprint('student')
+
+    def test_instructor_routes(self):
+        self.run_blueprint('instructor')
+
+    def test_programs_routes(self):
+        self.run_blueprint('programs')
+
+    def test_user_routes(self):
+        self.run_blueprint('user')
+
+    def test_feedback_routes(self):
+        self.run_blueprint('feedback')
+
+    def test_admin_routes(self):
+        self.run_blueprint('admin')
+
+    def test_auth_routes(self):
+        self.run_blueprint('auth')
+
+    def test_every_route_is_benchmarked(self):
+        benchmarked = {(method, get_route_shape(path)) for routes in ROUTES.values() for method, path, user, body in routes}
+        for rule in self.app.url_map.iter_rules():
+            if rule.endpoint.split('.')[0] not in BLUEPRINTS:
+                continue
+            for method in rule.methods - {'HEAD', 'OPTIONS'}:
+                self.assertIn((method, get_route_shape(rule.rule)), benchmarked, f"{method} {rule.rule} has no benchmark")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,181 @@
+import unittest
+import sys
+import os
+from datetime import date, datetime, time, timedelta
+from unittest.mock import patch
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, StubGraphServer
+from api import db
+from api.models import User, Appointment, Availability, CourseDetails, CourseMembers, ProgramDetails, CalendarSyncJob
+from api.calendar_jobs import drain_calendar_jobs
+from api.outlook import outlook_calendar_service
+
+
+# token store with one signed-in Microsoft account
+class FakeTokenStore:
+    def __init__(self):
+        self.signed_in = True
+
+    def acquire_token(self, account_id, scopes):
+        return {'access_token': f'token-for-{account_id}'} if self.signed_in else None
+
+
+class CalendarSyncJobTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = StubGraphServer()
+        self.app = create_test_app(GRAPH_API_ENDPOINT=self.graph.url, MAIL_BACKEND='fake', GRAPH_BATCH_MAX_RETRIES=0,
+                                   CALENDAR_SYNC_BACKOFF_SECONDS=30, CALENDAR_SYNC_MAX_ATTEMPTS=3)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30,
+                                 auto_approve_appointments=True)
+        db.session.add_all([program, CourseMembers(course_id=course.id, user_id=student.id)])
+        db.session.commit()
+
+        day = date.today() + timedelta(days=7)
+        availability = Availability(user_id=instructor.id, program_id=program.id, date=day,
+                                    start_time=time(9, 0), end_time=time(12, 0), status='active')
+        db.session.add(availability)
+        db.session.flush()
+        appointments = [
+            Appointment(host_id=instructor.id, availability_id=availability.id, appointment_date=day,
+                        start_time=time(9 + index, 0), end_time=time(9 + index, 30), status='posted',
+                        physical_location='Room 1')
+            for index in range(3)
+        ]
+        db.session.add_all(appointments)
+        db.session.commit()
+
+        self.course_id = course.id
+        self.day = day
+        self.appointment_ids = [appointment.id for appointment in appointments]
+        self.token_store = FakeTokenStore()
+        self.token_patch = patch.object(outlook_calendar_service, 'get_token_store', return_value=self.token_store)
+        self.token_patch.start()
+
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(student.id)))
+        with self.client.session_transaction() as session:
+            session['msal_account_id'] = 'student-account'
+
+    def tearDown(self):
+        self.token_patch.stop()
+        self.ctx.pop()
+        drop_test_database(self.app)
+        self.graph.stop()
+
+    def reserve(self, appointment_id):
+        return self.client.post(f'/student/appointments/reserve/{appointment_id}/{self.course_id}', json={'notes': 'hi'})
+
+    def cancel(self, appointment_id):
+        return self.client.post(f'/student/appointments/cancel/{appointment_id}')
+
+    # move every queued job's next attempt into the past
+    def make_due(self):
+        CalendarSyncJob.query.update({CalendarSyncJob.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+    def test_booking_queues_event_and_worker_sets_event_id(self):
+        self.assertEqual(self.reserve(self.appointment_ids[0]).status_code, 201)
+
+        # nothing is sent to Graph on the booking request
+        job = CalendarSyncJob.query.one()
+        self.assertEqual((job.action, job.account_id, job.status), ('create', 'student-account', 'pending'))
+        self.assertEqual(self.graph.batches, [])
+
+        self.assertEqual(drain_calendar_jobs(), {'done': 1, 'retried': 0, 'failed': 0})
+        request = self.graph.batches[0][0]
+        self.assertEqual((request['method'], request['url']), ('POST', '/me/events'))
+        self.assertEqual(request['body']['subject'], 'CSS 101 - Tutoring')
+        self.assertEqual(request['body']['start'], {'dateTime': f'{self.day.isoformat()}T09:00:00', 'timeZone': 'America/Los_Angeles'})
+        self.assertEqual(request['body']['location'], {'displayName': 'Room 1'})
+        self.assertEqual(request['body']['transactionId'], job.idempotency_key)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Appointment, self.appointment_ids[0]).event_id, 'event-1')
+        self.assertEqual(db.session.get(CalendarSyncJob, job.id).status, 'done')
+
+    def test_booking_without_outlook_account_queues_nothing(self):
+        with self.client.session_transaction() as session:
+            session.clear()
+        self.assertEqual(self.reserve(self.appointment_ids[0]).status_code, 201)
+        self.assertEqual(CalendarSyncJob.query.count(), 0)
+
+    def test_jobs_for_one_account_share_a_batch_request(self):
+        for appointment_id in self.appointment_ids:
+            self.reserve(appointment_id)
+        self.assertEqual(drain_calendar_jobs()['done'], 3)
+        self.assertEqual([len(requests) for requests in self.graph.batches], [3])
+
+    def test_cancel_before_sync_drops_the_queued_event(self):
+        self.reserve(self.appointment_ids[0])
+        self.assertEqual(self.cancel(self.appointment_ids[0]).status_code, 200)
+
+        self.assertEqual(CalendarSyncJob.query.one().status, 'cancelled')
+        self.assertEqual(drain_calendar_jobs(), {'done': 0, 'retried': 0, 'failed': 0})
+        self.assertEqual(self.graph.batches, [])
+
+    def test_cancel_after_sync_deletes_the_event(self):
+        self.reserve(self.appointment_ids[0])
+        drain_calendar_jobs()
+        self.cancel(self.appointment_ids[0])
+
+        job = CalendarSyncJob.query.filter_by(action='delete').one()
+        self.assertEqual(job.event_id, 'event-1')
+        self.assertEqual(drain_calendar_jobs()['done'], 1)
+        self.assertEqual(self.graph.batches[1], [{'id': '1', 'method': 'DELETE', 'url': '/me/events/event-1'}])
+
+    def test_update_patches_the_event(self):
+        self.reserve(self.appointment_ids[0])
+        drain_calendar_jobs()
+
+        response = self.client.post('/appointment/update', json={'appointment_id': self.appointment_ids[0], 'notes': 'bring notes'})
+        self.assertEqual(response.status_code, 200)
+        self.client.post('/appointment/update', json={'appointment_id': self.appointment_ids[0], 'meeting_url': 'https://zoom.us/j/1'})
+
+        # the second change is folded into the queued update
+        self.assertEqual(CalendarSyncJob.query.filter_by(action='update').count(), 1)
+        drain_calendar_jobs()
+        request = self.graph.batches[1][0]
+        self.assertEqual((request['method'], request['url']), ('PATCH', '/me/events/event-1'))
+        self.assertEqual(request['body']['body']['content'], 'bring notes<p><a href="https://zoom.us/j/1">https://zoom.us/j/1</a></p>')
+
+    def test_failed_create_is_retried_with_the_same_idempotency_key(self):
+        self.reserve(self.appointment_ids[0])
+        self.graph.batch_failures['/me/events'] = [503]
+
+        self.assertEqual(drain_calendar_jobs(), {'done': 0, 'retried': 1, 'failed': 0})
+        job = CalendarSyncJob.query.one()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('pending', 1, 'stub failure 503'))
+        self.assertGreater(job.next_attempt_at, datetime.utcnow() + timedelta(seconds=25))
+
+        self.make_due()
+        self.assertEqual(drain_calendar_jobs()['done'], 1)
+        first, second = self.graph.batches
+        self.assertEqual(first[0]['body']['transactionId'], second[0]['body']['transactionId'])
+
+    def test_job_fails_after_max_attempts_without_token(self):
+        self.reserve(self.appointment_ids[0])
+        self.token_store.signed_in = False
+
+        for _ in range(3):
+            self.make_due()
+            drain_calendar_jobs()
+
+        job = CalendarSyncJob.query.one()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('failed', 3, 'No Outlook token for account'))
+        self.assertIsNone(db.session.get(Appointment, self.appointment_ids[0]).event_id)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
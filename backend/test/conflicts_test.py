@@ -0,0 +1,151 @@
+import unittest
+import sys
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, ProgramDetails, ProgramTimes, Availability, AvailabilityRule, Appointment
+from api.conflicts import IntervalIndex, find_availability_conflicts
+
+
+class IntervalIndexTestCase(unittest.TestCase):
+
+    def test_overlaps_match_a_linear_scan(self):
+        rng = random.Random(5)
+        start = datetime(2026, 1, 5, 8)
+        intervals = []
+        for item in range(300):
+            interval_start = start + timedelta(minutes=15 * rng.randint(0, 2000))
+            intervals.append((interval_start, interval_start + timedelta(minutes=15 * rng.randint(1, 12)), item))
+        index = IntervalIndex(intervals)
+
+        for _ in range(500):
+            query_start = start + timedelta(minutes=15 * rng.randint(0, 2000))
+            query_end = query_start + timedelta(minutes=15 * rng.randint(1, 8))
+            overlap = index.find_overlap(query_start, query_end)
+            expected = any(interval_start < query_end and interval_end > query_start for interval_start, interval_end, _ in intervals)
+            self.assertEqual(overlap is not None, expected)
+            if overlap:
+                self.assertTrue(overlap[0] < query_end and overlap[1] > query_start)
+
+    def test_touching_intervals_do_not_overlap(self):
+        index = IntervalIndex([(datetime(2026, 1, 5, 9), datetime(2026, 1, 5, 10), 'a')])
+        self.assertIsNone(index.find_overlap(datetime(2026, 1, 5, 10), datetime(2026, 1, 5, 11)))
+        self.assertIsNone(index.find_overlap(datetime(2026, 1, 5, 8), datetime(2026, 1, 5, 9)))
+        self.assertEqual(index.find_overlap(datetime(2026, 1, 5, 9, 30), datetime(2026, 1, 5, 9, 45))[2], 'a')
+        self.assertIsNone(IntervalIndex([]).find_overlap(datetime(2026, 1, 5, 9), datetime(2026, 1, 5, 10)))
+
+
+class AvailabilityConflictTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        courses = [CourseDetails(instructor_id=instructor.id, name=name) for name in ('CSS 101', 'CSS 202')]
+        db.session.add_all(courses)
+        db.session.commit()
+        tutoring = ProgramDetails(course_id=courses[0].id, instructor_id=instructor.id, name='Tutoring', duration=30)
+        office_hours = ProgramDetails(course_id=courses[1].id, instructor_id=instructor.id, name='Office Hours', duration=30)
+        db.session.add_all([tutoring, office_hours])
+        db.session.commit()
+
+        # office hours of the other course next Monday 09:00-10:00
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        availability = Availability(user_id=instructor.id, program_id=office_hours.id, date=self.monday,
+                                    start_time=time(9), end_time=time(10), status='active')
+        db.session.add(availability)
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.student_id = student.id
+        self.course_id = courses[0].id
+        self.program_id = tutoring.id
+        self.office_hours_id = office_hours.id
+        self.availability_id = availability.id
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(instructor.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def post_availabilities(self, entries):
+        return self.client.post(f'/instructor/availability/{self.course_id}', json={
+            'availabilities': [{'id': self.program_id, 'date': day.isoformat(), 'start_time': start_time, 'end_time': end_time}
+                               for day, start_time, end_time in entries],
+            'duration': 30, 'physical_location': None, 'meeting_url': None, 'isDropins': False, 'program_id': self.program_id,
+        })
+
+    def test_overlap_with_another_course_is_skipped(self):
+        response = self.post_availabilities([
+            (self.monday, '09:30', '10:30'),
+            (self.monday, '10:30', '11:30'),
+            (self.monday + timedelta(days=1), '09:00', '10:00'),
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual((body['availabilities_added'], body['skipped']), (2, 1))
+        self.assertEqual(len(body['conflicts']), 1)
+        conflict = body['conflicts'][0]
+        self.assertEqual((conflict['date'], conflict['start_time']), (self.monday.isoformat(), '09:30'))
+        self.assertEqual(conflict['conflict'], {'type': 'availability', 'id': self.availability_id, 'program_id': self.office_hours_id,
+                                                'date': self.monday.isoformat(), 'start_time': '09:00', 'end_time': '10:00'})
+
+    def test_booked_meeting_conflicts_after_its_availability_is_turned_off(self):
+        availability = db.session.get(Availability, self.availability_id)
+        availability.status = 'inactive'
+        db.session.add(Appointment(host_id=self.instructor_id, attendee_id=self.student_id, availability_id=availability.id,
+                                   appointment_date=self.monday, start_time=time(9), end_time=time(9, 30), status='reserved'))
+        db.session.commit()
+
+        body = self.post_availabilities([(self.monday, '09:00', '10:00')]).get_json()
+
+        self.assertEqual(body['availabilities_added'], 0)
+        self.assertEqual(body['conflicts'][0]['conflict']['type'], 'appointment')
+
+    def test_replaced_program_does_not_conflict_with_itself(self):
+        self.post_availabilities([(self.monday, '11:00', '12:00')])
+
+        body = self.post_availabilities([(self.monday, '11:00', '12:00')]).get_json()
+
+        self.assertEqual((body['availabilities_added'], body['conflicts']), (1, []))
+
+    def test_payload_is_checked_with_a_fixed_number_of_queries(self):
+        entries = [(self.monday + timedelta(days=day), time(13), time(14)) for day in range(1, 60)]
+
+        with QueryCounter() as small:
+            find_availability_conflicts(self.instructor_id, [(self.program_id, *entry) for entry in entries[:2]], [self.program_id])
+        with QueryCounter() as large:
+            kept, conflicts = find_availability_conflicts(self.instructor_id, [(self.program_id, *entry) for entry in entries], [self.program_id])
+
+        self.assertEqual(small.count, large.count)
+        self.assertEqual((len(kept), conflicts), (59, []))
+
+    def test_recurring_dates_that_conflict_become_exdates(self):
+        db.session.add(ProgramTimes(program_id=self.program_id, day='Monday', start_time=time(9, 30), end_time=time(10, 30)))
+        db.session.commit()
+
+        response = self.client.post(f'/instructor/programs/{self.program_id}/availability-rules', json={
+            'start_date': self.monday.isoformat(), 'end_date': (self.monday + timedelta(weeks=3)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual([conflict['date'] for conflict in body['conflicts']], [self.monday.isoformat()])
+        self.assertEqual(body['availability_rules'][0]['exdates'], [self.monday.isoformat()])
+        self.assertNotIn(self.monday, [availability.date for availability in Availability.query.filter_by(program_id=self.program_id)])
+        self.assertEqual(AvailabilityRule.query.one().exdates, self.monday.isoformat())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
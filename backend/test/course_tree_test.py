@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+from datetime import time
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, CourseMembers, CourseTimes, ProgramDetails, ProgramTimes
+
+
+class CourseTreeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        self.instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        self.other = User(name='Other', email='other@uw.edu', account_type='instructor', status='active')
+        self.student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([self.instructor, self.other, self.student])
+        db.session.commit()
+
+        # office hours for every course of the instructor, and one the student can't see
+        office_hours = ProgramDetails(instructor_id=self.instructor.id, name='Office Hours', isDropins=True)
+        hidden = ProgramDetails(instructor_id=self.other.id, name='Hidden')
+        db.session.add_all([office_hours, hidden])
+        db.session.commit()
+        db.session.add(ProgramTimes(program_id=office_hours.id, day='Friday', start_time=time(10), end_time=time(11)))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(self.student.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # add a course with two programs and times for the student
+    def add_course(self, name):
+        course = CourseDetails(instructor_id=self.instructor.id, name=name)
+        db.session.add(course)
+        db.session.commit()
+
+        programs = [
+            ProgramDetails(course_id=course.id, instructor_id=self.instructor.id, name='Tutoring', duration=30, isDropins=False),
+            ProgramDetails(course_id=course.id, instructor_id=self.instructor.id, name='Lab', isDropins=True),
+        ]
+        db.session.add_all(programs + [
+            CourseMembers(course_id=course.id, user_id=self.student.id),
+            CourseTimes(course_id=course.id, day='Monday', start_time=time(9), end_time=time(10)),
+        ])
+        db.session.commit()
+        db.session.add_all([
+            ProgramTimes(program_id=program.id, day='Tuesday', start_time=time(13), end_time=time(14))
+            for program in programs
+        ])
+        db.session.commit()
+        return course
+
+    def count_queries(self):
+        with QueryCounter() as counter:
+            response = self.client.get('/course/tree')
+        self.assertEqual(response.status_code, 200)
+        return counter.count, response.get_json()
+
+    def test_tree_lists_courses_programs_and_times(self):
+        course = self.add_course('CSS 101')
+
+        count, tree = self.count_queries()
+
+        self.assertEqual(len(tree), 1)
+        self.assertEqual(tree[0]['id'], course.id)
+        self.assertEqual(tree[0]['course_name'], 'CSS 101')
+        self.assertEqual(tree[0]['times'], [{'day': 'Monday', 'start_time': '09:00', 'end_time': '10:00'}])
+        self.assertEqual([program['name'] for program in tree[0]['programs']], ['Tutoring', 'Lab'])
+        self.assertEqual(tree[0]['programs'][0]['times'][0]['day'], 'Tuesday')
+        self.assertEqual([program['name'] for program in tree[0]['global_programs']], ['Office Hours'])
+        self.assertEqual(tree[0]['global_programs'][0]['times'][0]['day'], 'Friday')
+
+    def test_query_count_does_not_grow_with_courses(self):
+        self.add_course('CSS 101')
+        one_course, _ = self.count_queries()
+
+        for index in range(4):
+            self.add_course(f'CSS 20{index}')
+        five_courses, tree = self.count_queries()
+
+        self.assertEqual(len(tree), 5)
+        self.assertEqual(one_course, five_courses)
+
+    def test_tree_revalidates_with_etag(self):
+        course = self.add_course('CSS 101')
+        first = self.client.get('/course/tree')
+
+        response = self.client.get('/course/tree', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        self.add_course('CSS 102')
+        response = self.client.get('/course/tree', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['id'] for entry in response.get_json()][0], course.id)
+
+    def test_user_without_courses_gets_empty_tree(self):
+        _, tree = self.count_queries()
+        self.assertEqual(tree, [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, ProgramDetails, ProgramTimes, Availability, Appointment, \
+    AppointmentComment, Feedback, HostBookingCounter, OpenSlot
+
+
+class DeleteProgramTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.student_id = student.id
+        self.course_id = course.id
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(instructor.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # add a program with a term of history: availabilities, booked appointments, comments and feedback
+    def add_program(self, name, days):
+        program = ProgramDetails(course_id=self.course_id, instructor_id=self.instructor_id, name=name, duration=30)
+        db.session.add(program)
+        db.session.commit()
+        db.session.add(ProgramTimes(program_id=program.id, day='Monday', start_time=time(9), end_time=time(10)))
+
+        for day in range(days):
+            appointment_date = date.today() - timedelta(days=day + 1)
+            availability = Availability(user_id=self.instructor_id, program_id=program.id, date=appointment_date,
+                                        start_time=time(9), end_time=time(10), status='active')
+            db.session.add(availability)
+            db.session.flush()
+            for hour in (9, 10):
+                appointment = Appointment(host_id=self.instructor_id, attendee_id=self.student_id, course_id=self.course_id,
+                                          availability_id=availability.id, appointment_date=appointment_date,
+                                          start_time=time(hour), end_time=time(hour, 30), status='completed')
+                db.session.add(appointment)
+                db.session.flush()
+                db.session.add_all([
+                    AppointmentComment(appointment_id=appointment.id, user_id=self.student_id, appointment_comment='thanks'),
+                    Feedback(appointment_id=appointment.id, attendee_id=self.student_id, host_id=self.instructor_id,
+                             attendee_rating='5'),
+                ])
+            db.session.add(OpenSlot(course_id=self.course_id, program_id=program.id, instructor_id=self.instructor_id,
+                                    availability_id=availability.id, date=appointment_date,
+                                    start_time=time(9), end_time=time(9, 30)))
+
+        db.session.add(HostBookingCounter(host_id=self.instructor_id, program_id=program.id, period_kind='daily',
+                                          period_start=date.today(), count=1))
+        db.session.commit()
+        return program.id
+
+    def count_rows(self):
+        return {
+            model.__name__: model.query.count()
+            for model in (ProgramDetails, ProgramTimes, Availability, Appointment, AppointmentComment, Feedback,
+                          HostBookingCounter, OpenSlot)
+        }
+
+    def delete_program(self, program_id):
+        with QueryCounter() as counter:
+            response = self.client.delete(f'/program/delete/{program_id}')
+        self.assertEqual(response.status_code, 200)
+        return counter.count
+
+    def test_delete_removes_program_history(self):
+        kept_id = self.add_program('Kept', days=1)
+        kept_rows = self.count_rows()
+        program_id = self.add_program('Tutoring', days=3)
+
+        self.delete_program(program_id)
+
+        self.assertEqual(self.count_rows(), kept_rows)
+        self.assertIsNotNone(ProgramDetails.query.get(kept_id))
+        self.assertIsNone(ProgramDetails.query.get(program_id))
+
+    def test_statement_count_does_not_grow_with_history(self):
+        small = self.delete_program(self.add_program('Small', days=1))
+        large = self.delete_program(self.add_program('Large', days=20))
+
+        self.assertEqual(small, large)
+
+    def test_missing_program_returns_404(self):
+        response = self.client.delete('/program/delete/999')
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
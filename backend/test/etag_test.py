@@ -0,0 +1,174 @@
+import unittest
+import sys
+import os
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, CourseMembers, ProgramDetails
+
+
+class ETagTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30)
+        db.session.add_all([
+            program,
+            CourseMembers(course_id=course.id, user_id=instructor.id),
+            CourseMembers(course_id=course.id, user_id=student.id),
+        ])
+        db.session.commit()
+
+        self.course_id = course.id
+        self.program_id = program.id
+        self.instructor_token = create_access_token(identity=str(instructor.id))
+        self.student_token = create_access_token(identity=str(student.id))
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # fetch a url, then fetch it again with the returned ETag
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNotNone(first.headers.get('ETag'))
+        self.assertEqual(first.headers['Cache-Control'], 'private, no-cache')
+        return first, self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    def test_unchanged_resources_return_not_modified(self):
+        self.client.set_cookie('access_token_cookie', self.student_token)
+        urls = [
+            f'/course/details/{self.course_id}',
+            f'/course/times/{self.course_id}',
+            f'/course/programs/{self.course_id}',
+            '/student/programs/descriptions',
+        ]
+
+        for url in urls:
+            first, second = self.revalidate(url)
+            self.assertEqual(second.status_code, 304, url)
+            self.assertEqual(second.data, b'', url)
+            self.assertEqual(second.headers['ETag'], first.headers['ETag'], url)
+
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+        for url in [f'/course/programs/times/{self.course_id}', '/instructor/programs']:
+            first, second = self.revalidate(url)
+            self.assertEqual(second.status_code, 304, url)
+
+    def test_not_modified_skips_the_full_query(self):
+        url = '/instructor/programs'
+        first = self.client.get(url)
+
+        with QueryCounter() as counter:
+            second = self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+        full_count = counter.count
+
+        with QueryCounter() as counter:
+            self.client.get(url)
+        self.assertLess(full_count, counter.count)
+
+    def test_course_changes_invalidate_etag(self):
+        _, details = self.revalidate(f'/course/details/{self.course_id}')
+        _, times = self.revalidate(f'/course/times/{self.course_id}')
+        details_etag = details.headers['ETag']
+        times_etag = times.headers['ETag']
+
+        self.client.post('/course/details', json={'id': self.course_id, 'name': 'CSS 102'})
+        response = self.client.get(f'/course/details/{self.course_id}', headers={'If-None-Match': details_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['name'], 'CSS 102')
+
+        self.client.post(f'/course/times/{self.course_id}', json={
+            str(self.course_id): {'Monday': {'start_time': '10:00', 'end_time': '11:00'}}
+        })
+        response = self.client.get(f'/course/times/{self.course_id}', headers={'If-None-Match': times_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 1)
+
+    def test_program_changes_invalidate_etag(self):
+        url = f'/course/programs/times/{self.course_id}'
+        first = self.client.get(url)
+        etag = first.headers['ETag']
+
+        # replacing the times bumps the program's revision
+        response = self.client.post(f'/course/programs/times/{self.program_id}', json={
+            str(self.program_id): {'Tuesday': {'start_time': '13:00', 'end_time': '14:00'}}
+        })
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['day'], 'Tuesday')
+        etag = response.headers['ETag']
+
+        # editing the program bumps it again
+        self.client.post('/program/details', json={'course_id': self.course_id, 'data': {
+            'id': self.program_id, 'name': 'Office Hours', 'description': None, 'duration': 30,
+            'physical_location': None, 'meeting_url': None, 'isDropins': False,
+        }})
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['name'], 'Office Hours')
+
+    def test_created_and_deleted_programs_invalidate_etag(self):
+        url = f'/course/programs/{self.course_id}'
+        etag = self.client.get(url).headers['ETag']
+
+        response = self.client.post('/program/create', json={'name': 'Review', 'course_id': self.course_id})
+        new_program_id = response.get_json()['program_id']
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+        etag = response.headers['ETag']
+
+        self.client.delete(f'/program/delete/{new_program_id}')
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 1)
+
+    # SQLite hands the id of a deleted newest row to the next insert, so the recreated program looks the same to a row fingerprint
+    def test_recreated_program_with_the_same_id_invalidates_etag(self):
+        for course_id in (self.course_id, None):
+            program_id = self.client.post('/program/create', json={'name': 'Office Hours', 'course_id': course_id}).get_json()['program_id']
+            urls = ['/instructor/programs', f'/course/programs/{self.course_id}',
+                    f'/course/programs/times/{self.course_id if course_id else "null"}']
+            etags = {url: self.client.get(url).headers['ETag'] for url in urls}
+
+            self.assertEqual(self.client.delete(f'/program/delete/{program_id}').status_code, 200)
+            response = self.client.post('/program/create', json={'name': 'Office Hours', 'course_id': course_id})
+            self.assertEqual(response.get_json()['program_id'], program_id)
+
+            for url in urls:
+                response = self.client.get(url, headers={'If-None-Match': etags[url]})
+                self.assertEqual(response.status_code, 200, url)
+
+    def test_etag_is_per_user(self):
+        instructor_etag = self.client.get('/instructor/programs').headers['ETag']
+
+        other = User(name='Other', email='other@uw.edu', account_type='instructor', status='active')
+        db.session.add(other)
+        db.session.commit()
+        db.session.add(CourseMembers(course_id=self.course_id, user_id=other.id))
+        db.session.commit()
+
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(other.id)))
+        response = self.client.get('/instructor/programs', headers={'If-None-Match': instructor_etag})
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from unittest.mock import patch
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, StubGraphServer
+from api import db
+from api.models import User, Appointment
+from api.graph_batch import GraphBatch, apply_batch_results
+from api.outlook import outlook_calendar_service
+
+
+class GraphBatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = StubGraphServer()
+        self.app = create_test_app(GRAPH_API_ENDPOINT=self.graph.url)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        host = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        other = User(name='Other', email='other@uw.edu', account_type='instructor', status='active')
+        db.session.add_all([host, other])
+        db.session.commit()
+        day = date.today() + timedelta(days=7)
+        appointments = [
+            Appointment(host_id=host.id, appointment_date=day + timedelta(days=index), start_time=time(9), end_time=time(10),
+                        status='reserved')
+            for index in range(45)
+        ]
+        db.session.add_all(appointments)
+        db.session.commit()
+        self.appointment_ids = [appointment.id for appointment in appointments]
+        self.day = day
+        self.host_id = host.id
+        self.other_id = other.id
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+        self.graph.stop()
+
+    def event(self, hour):
+        return {'summary': 'Office hours', 'start': f'{self.day}T{hour:02d}:00:00Z', 'end': f'{self.day}T{hour + 1:02d}:00:00Z'}
+
+    def test_operations_are_sent_in_batches_of_twenty(self):
+        batch = GraphBatch()
+        for appointment_id in self.appointment_ids:
+            batch.create({'subject': 'Office hours'}, appointment_id)
+        results = batch.execute('access-token')
+
+        self.assertEqual([len(requests) for requests in self.graph.batches], [20, 20, 5])
+        self.assertTrue(all(result['ok'] for result in results))
+        self.assertEqual(results[44]['event_id'], 'event-45')
+
+        self.assertEqual(apply_batch_results(results), 45)
+        db.session.commit()
+        self.assertEqual(db.session.get(Appointment, self.appointment_ids[0]).event_id, 'event-1')
+
+    def test_throttled_operations_are_retried(self):
+        self.graph.batch_failures['/me/events/b'] = [429]
+        batch = GraphBatch()
+        batch.delete('a')
+        batch.delete('b')
+        results = batch.execute('access-token')
+
+        self.assertEqual([len(requests) for requests in self.graph.batches], [2, 1])
+        self.assertEqual([result['status'] for result in results], [204, 204])
+
+    def test_failed_operations_leave_event_id_unchanged(self):
+        appointment = db.session.get(Appointment, self.appointment_ids[0])
+        appointment.event_id = 'existing'
+        db.session.commit()
+        self.graph.batch_failures['/me/events/existing'] = [403]
+
+        batch = GraphBatch()
+        batch.delete('existing', appointment.id)
+        results = batch.execute('access-token')
+
+        self.assertEqual((results[0]['ok'], results[0]['error']), (False, 'stub failure 403'))
+        self.assertEqual(apply_batch_results(results), 0)
+        self.assertEqual(db.session.get(Appointment, appointment.id).event_id, 'existing')
+
+    def signed_in_client(self, user_id):
+        client = self.app.test_client()
+        client.set_cookie('access_token_cookie', create_access_token(identity=str(user_id)))
+        with client.session_transaction() as session:
+            session['msal_account_id'] = 'owner'
+        return client
+
+    def test_endpoint_maps_results_to_appointments(self):
+        first, second, third = self.appointment_ids[:3]
+        db.session.get(Appointment, second).event_id = 'old-event'
+        db.session.get(Appointment, third).event_id = 'moved-event'
+        db.session.commit()
+
+        client = self.signed_in_client(self.host_id)
+
+        with patch.object(outlook_calendar_service, 'get_calendar_service', return_value='access-token'):
+            response = client.post('/api/batch_events', json={'operations': [
+                {'action': 'create', 'appointment_id': first, 'event': self.event(9)},
+                {'action': 'delete', 'appointment_id': second},
+                {'action': 'update', 'appointment_id': third, 'event': {'physical_location': 'Room 2'}},
+            ]})
+            self.assertEqual(response.status_code, 200)
+            results = response.get_json()['results']
+            self.assertEqual([result['status'] for result in results], [201, 204, 200])
+
+            # one round trip for all three operations
+            self.assertEqual(len(self.graph.batches), 1)
+            self.assertEqual(self.graph.batches[0][2], {'id': '3', 'method': 'PATCH', 'url': '/me/events/moved-event',
+                                                        'headers': {'Content-Type': 'application/json'},
+                                                        'body': {'location': {'displayName': 'Room 2'}}})
+
+            db.session.expire_all()
+            self.assertEqual([db.session.get(Appointment, appointment_id).event_id for appointment_id in (first, second, third)],
+                             ['event-1', None, 'moved-event'])
+
+            response = client.post('/api/batch_events', json={'operations': [{'action': 'delete', 'appointment_id': first + 100}]})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(client.post('/api/batch_events', json={'operations': []}).status_code, 400)
+
+    def test_endpoint_rejects_appointments_of_other_users(self):
+        appointment = db.session.get(Appointment, self.appointment_ids[0])
+        appointment.event_id = 'existing'
+        db.session.commit()
+
+        # signed in to Outlook but not to the app
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['msal_account_id'] = 'owner'
+        operations = [{'action': 'delete', 'appointment_id': appointment.id}]
+        self.assertEqual(client.post('/api/batch_events', json={'operations': operations}).status_code, 401)
+
+        client = self.signed_in_client(self.other_id)
+        with patch.object(outlook_calendar_service, 'get_calendar_service', return_value='access-token'):
+            response = client.post('/api/batch_events', json={'operations': operations})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.graph.batches, [])
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Appointment, appointment.id).event_id, 'existing')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,133 @@
+"""
+ * helpers.py
+ * Last Edited: 10/18/26
+ *
+ * Contains shared setup for tests that run against a real database
+ * (in-memory SQLite unless TEST_DATABASE_URI is set) instead of mocked queries,
+ * and a local stub of the Microsoft Graph endpoints the calendar code calls
+ *
+ * Known Bugs:
+ * -
+ *
+"""
+
+import os
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from api import create_app, db
+from api.models import User
+
+# values create_app() expects from the .env file
+os.environ.setdefault('ADMIN_NAME', 'admin')
+os.environ.setdefault('ADMIN_EMAIL', 'admin@uw.edu')
+os.environ.setdefault('ADMIN_PASSWORD', 'admin-password')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-secret-key-with-enough-length')
+
+# create an app bound to a throwaway database
+def create_test_app(database_uri=None, **config):
+    test_config = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_uri or os.environ.get('TEST_DATABASE_URI', 'sqlite://'),
+        'JWT_COOKIE_CSRF_PROTECT': False,
+    }
+    test_config.update(config)
+    return create_app(test_config)
+
+# drop every table created for the test
+def drop_test_database(app):
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+# add an admin and sign a test client in as them (create_app already seeds ADMIN_EMAIL, so another address is used)
+def sign_in_admin(client):
+    admin = User(name='Admin', email='admin-user@uw.edu', account_type='admin', status='active')
+    db.session.add(admin)
+    db.session.commit()
+    client.set_cookie('access_token_cookie', create_access_token(identity=str(admin.id)))
+    return admin.id
+
+# count the SQL statements executed inside a with block
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self.increment)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self.increment)
+
+    def increment(self, *args):
+        self.count += 1
+
+# local stand-in for Microsoft Graph's calendarView delta and $batch endpoints
+class StubGraphServer:
+    def __init__(self):
+        self.pages = {}  # delta token or page name -> (status, body)
+        self.requests = []
+        self.batches = []  # request lists received by /$batch
+        self.batch_failures = {}  # operation url -> statuses to answer with before succeeding
+        self.created = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                stub.requests.append((self.path, self.headers.get('Authorization'), self.headers.get('Prefer')))
+                key = query.get('$deltatoken', query.get('page', ['initial']))[0]
+                self.reply(*stub.pages.get(key, (404, {'error': {'code': 'NotFound'}})))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.batches.append(body['requests'])
+                self.reply(200, {'responses': [stub.answer(request) for request in body['requests']]})
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/v1.0'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    # answer one $batch operation the way Graph would
+    def answer(self, request):
+        failures = self.batch_failures.get(request['url'])
+        if failures:
+            status = failures.pop(0)
+            return {'id': request['id'], 'status': status, 'headers': {'Retry-After': '0'},
+                    'body': {'error': {'code': str(status), 'message': f'stub failure {status}'}}}
+        if request['method'] == 'POST':
+            self.created += 1
+            return {'id': request['id'], 'status': 201, 'body': dict(request['body'], id=f'event-{self.created}')}
+        if request['method'] == 'PATCH':
+            return {'id': request['id'], 'status': 200, 'body': dict(request['body'], id=request['url'].rsplit('/', 1)[1])}
+        return {'id': request['id'], 'status': 204, 'body': None}
+
+    def delta_link(self, token):
+        return self.url + '/me/calendarView/delta?$deltatoken=' + token
+
+    def page_link(self, name):
+        return self.url + '/me/calendarView/delta?page=' + name
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
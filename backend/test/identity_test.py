@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, ProgramDetails
+
+
+# The signed-in user is loaded once per request and reused by the role checks
+class RequestIdentityTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        db.session.add(ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring'))
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.student_id = student.id
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def get(self, url, user_id):
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(user_id)))
+        db.session.expunge_all()
+        with QueryCounter() as counter:
+            response = self.client.get(url)
+        return response, counter.count
+
+    def test_role_check_reuses_loaded_user(self):
+        response, statements = self.get('/instructor/programs/descriptions', self.instructor_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([program['name'] for program in response.get_json()], ['Tutoring'])
+        # one SELECT for the user, one for the programs
+        self.assertEqual(statements, 2)
+
+    def test_wrong_role_is_rejected(self):
+        response, _ = self.get('/instructor/programs/descriptions', self.student_id)
+        self.assertEqual(response.status_code, 404)
+
+    def test_token_of_deleted_user_is_rejected(self):
+        db.session.delete(db.session.get(User, self.student_id))
+        db.session.commit()
+        response, _ = self.get('/user/courses', self.student_id)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"error": "User not found"})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
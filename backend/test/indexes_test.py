@@ -0,0 +1,142 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from sqlalchemy import text
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database
+from api import db
+from api.models import User, Appointment, Availability, CourseDetails, CourseMembers, ProgramDetails, \
+    AppointmentComment, Feedback
+from api.reservations import get_week_range
+
+
+# Each hot query must be answered through an index instead of a table scan
+class HotPathIndexMixin:
+    database_uri = None
+
+    def setUp(self):
+        self.app = create_test_app(self.database_uri)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.seed()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # enough rows that the MySQL optimizer does not short-circuit to a const/full scan
+    def seed(self):
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30)
+        db.session.add_all([program, CourseMembers(course_id=course.id, user_id=student.id)])
+        db.session.commit()
+
+        start_date = date.today()
+        for day in range(60):
+            availability = Availability(user_id=instructor.id, program_id=program.id, date=start_date + timedelta(days=day),
+                                        start_time=time(9, 0), end_time=time(12, 0), status='active')
+            db.session.add(availability)
+            db.session.flush()
+            for slot in range(6):
+                db.session.add(Appointment(host_id=instructor.id, availability_id=availability.id,
+                                           appointment_date=availability.date,
+                                           start_time=time(9 + slot // 2, 30 * (slot % 2)),
+                                           end_time=time(9 + (slot + 1) // 2, 30 * ((slot + 1) % 2)),
+                                           attendee_id=student.id if slot == 0 else None,
+                                           status='reserved' if slot == 0 else 'posted'))
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.student_id = student.id
+        self.course_id = course.id
+        self.program_id = program.id
+        self.appointment_date = start_date + timedelta(days=7)
+
+    # return the index names the database plans to use for a query
+    def plan(self, query):
+        statement = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+        if db.engine.dialect.name == 'sqlite':
+            rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+            return ' '.join(row[-1] for row in rows)
+        rows = db.session.execute(text(f'EXPLAIN {statement}')).mappings().all()
+        return ' '.join(str(row['key']) for row in rows)
+
+    def test_host_limit_counts_use_index(self):
+        start_of_week, end_of_week = get_week_range(self.appointment_date)
+        query = Appointment.query.filter(
+            Appointment.host_id == self.instructor_id,
+            Appointment.appointment_date.between(start_of_week, end_of_week),
+            Appointment.status.in_(['reserved', 'pending'])
+        )
+        self.assertIn('ix_appointment_host_date_status', self.plan(query))
+
+    def test_student_appointments_use_index(self):
+        query = Appointment.query.filter(
+            Appointment.attendee_id == self.student_id,
+            Appointment.status == 'reserved',
+            Appointment.appointment_date > self.appointment_date
+        )
+        self.assertIn('ix_appointment_attendee_status_date', self.plan(query))
+
+    def test_appointments_by_availability_use_index(self):
+        query = Appointment.query.filter_by(availability_id=1)
+        self.assertIn('ix_appointment_availability_id', self.plan(query))
+
+    def test_availability_lookup_uses_index(self):
+        query = Availability.query.filter_by(user_id=self.instructor_id, program_id=self.program_id, date=self.appointment_date)
+        self.assertIn('ix_availability_user_program_date', self.plan(query))
+
+    def test_course_membership_uses_unique_index(self):
+        query = CourseMembers.query.filter(CourseMembers.user_id == self.student_id, CourseMembers.course_id == self.course_id)
+        # SQLite backs unique constraints with an automatically named index
+        self.assertRegex(self.plan(query), 'uq_course_members_user_course|sqlite_autoindex_course_members')
+
+    # repeated or existing members are skipped or refused instead of failing on the unique constraint
+    def test_course_membership_is_never_duplicated(self):
+        client = self.app.test_client()
+        newcomer = User(name='Newcomer', email='newcomer@uw.edu', account_type='student', status='active')
+        db.session.add(newcomer)
+        db.session.commit()
+
+        response = client.post('/course/create', json={'name': 'CSS 102', 'user_id': self.instructor_id,
+                                                       'student_ids': [self.student_id, self.student_id, self.instructor_id]})
+        self.assertEqual(response.status_code, 200)
+        course = CourseDetails.query.filter_by(name='CSS 102').one()
+        self.assertEqual(sorted(member.user_id for member in CourseMembers.query.filter_by(course_id=course.id)),
+                         sorted([self.instructor_id, self.student_id]))
+
+        response = client.post('/course/add/user', json={'course_id': self.course_id, 'user_id': self.student_id})
+        self.assertEqual(response.status_code, 409)
+        response = client.post('/course/add/user', json={'course_id': self.course_id, 'user_id': newcomer.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CourseMembers.query.filter_by(course_id=self.course_id).count(), 2)
+
+    def test_course_programs_use_index(self):
+        query = ProgramDetails.query.filter_by(course_id=self.course_id, instructor_id=self.instructor_id)
+        self.assertIn('ix_program_details_course_instructor', self.plan(query))
+
+    def test_comments_and_feedback_use_index(self):
+        self.assertIn('ix_appointment_comment_appointment_id', self.plan(AppointmentComment.query.filter_by(appointment_id=1)))
+        self.assertIn('ix_feedback_appointment_id', self.plan(Feedback.query.filter_by(appointment_id=1)))
+
+
+class SQLiteHotPathIndexTestCase(HotPathIndexMixin, unittest.TestCase):
+    database_uri = 'sqlite://'
+
+
+@unittest.skipUnless(os.environ.get('MYSQL_TEST_DATABASE_URI'), 'set MYSQL_TEST_DATABASE_URI to run against MySQL')
+class MySQLHotPathIndexTestCase(HotPathIndexMixin, unittest.TestCase):
+    database_uri = os.environ.get('MYSQL_TEST_DATABASE_URI')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import json
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter, StubGraphServer
+from api import db
+from api.models import User, CourseDetails, CourseMembers
+from api.calendar_sync import graph_session
+from api.instrumentation import start_request_metrics, get_request_metrics
+from api.mail import send_email
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app(MAIL_BACKEND='fake')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        user = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add(user)
+        db.session.commit()
+        course = CourseDetails(instructor_id=user.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        db.session.add(CourseMembers(course_id=course.id, user_id=user.id))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(user.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # the Server-Timing entries of a response by name
+    def server_timing(self, response):
+        entries = {}
+        for entry in response.headers['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_response_has_server_timing(self):
+        with QueryCounter() as counter:
+            response = self.client.get('/course/tree')
+        self.assertEqual(response.status_code, 200)
+
+        timing = self.server_timing(response)
+        self.assertGreater(float(timing['app']['dur']), 0)
+        self.assertEqual(timing['db']['desc'], f'"{counter.count} queries"')
+        self.assertLessEqual(float(timing['db']['dur']), float(timing['app']['dur']))
+
+    def test_request_is_logged_as_json(self):
+        with self.assertLogs('api.instrumentation', level='INFO') as logs:
+            self.client.get('/course/tree')
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['event'], 'request')
+        self.assertEqual(line['endpoint'], 'programs.get_user_course_tree')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['sql_count'], 0)
+
+    def test_outbound_calls_are_timed(self):
+        graph = StubGraphServer()
+        self.addCleanup(graph.stop)
+
+        with self.app.test_request_context('/'):
+            start_request_metrics()
+            graph_session.get(graph.delta_link('missing'))
+            send_email('student@uw.edu', 'Booked', '<p>Booked</p>', None)
+
+            metrics = get_request_metrics()
+            self.assertEqual(metrics.http['graph'][0], 1)
+            self.assertEqual(metrics.http['sendgrid'][0], 1)
+
+    def test_slow_queries_are_logged_with_caller(self):
+        self.app.config['PERF_SLOW_QUERY_MS'] = 0
+
+        with self.assertLogs('api.instrumentation', level='WARNING') as logs:
+            self.client.get('/course/tree')
+
+        slow = [json.loads(record.getMessage()) for record in logs.records if record.levelname == 'WARNING']
+        self.assertTrue(slow)
+        self.assertEqual(slow[0]['event'], 'slow_query')
+        self.assertEqual(slow[0]['path'], '/course/tree')
+        self.assertIn('SELECT', slow[0]['statement'])
+        self.assertTrue(any(line['caller'] and line['caller'].startswith('api' + os.sep) for line in slow))
+
+    def test_instrumentation_can_be_turned_off(self):
+        app = create_test_app(PERF_INSTRUMENTATION=False)
+        self.addCleanup(drop_test_database, app)
+
+        response = app.test_client().get('/course/tree')
+        self.assertNotIn('Server-Timing', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+from unittest import mock
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, CourseMembers, ProgramDetails
+from api.cache import MetadataCache, get_metadata_cache, PROGRAMS, COURSES
+from api.programs import get_program_name, get_course_name
+from api.user import findStandardTimes
+
+
+class MetadataCacheTestCase(unittest.TestCase):
+
+    def test_entries_expire_after_ttl(self):
+        cache = MetadataCache(ttl_seconds=10)
+        loads = []
+
+        with mock.patch('api.cache.time.monotonic', return_value=100):
+            cache.get_or_load(PROGRAMS, 1, lambda: loads.append(1) or 'a')
+            cache.get_or_load(PROGRAMS, 1, lambda: loads.append(1) or 'a')
+        with mock.patch('api.cache.time.monotonic', return_value=111):
+            cache.get_or_load(PROGRAMS, 1, lambda: loads.append(1) or 'a')
+
+        self.assertEqual(len(loads), 2)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_invalidate_only_drops_its_namespace(self):
+        cache = MetadataCache()
+        cache.get_or_load(PROGRAMS, 1, lambda: 'program')
+        cache.get_or_load(COURSES, 1, lambda: 'course')
+
+        cache.invalidate(PROGRAMS)
+
+        self.assertEqual(cache.get_or_load(PROGRAMS, 1, lambda: 'renamed'), 'renamed')
+        self.assertEqual(cache.get_or_load(COURSES, 1, lambda: 'other'), 'course')
+
+    def test_value_loaded_during_invalidation_is_not_stored(self):
+        cache = MetadataCache()
+
+        # a write commits and invalidates while the old value is being loaded
+        def load():
+            cache.invalidate(PROGRAMS)
+            return 'old'
+
+        self.assertEqual(cache.get_or_load(PROGRAMS, 1, load), 'old')
+        self.assertEqual(cache.get_or_load(PROGRAMS, 1, lambda: 'new'), 'new')
+
+    def test_least_recently_used_entry_is_dropped(self):
+        cache = MetadataCache(max_entries=2)
+        cache.get_or_load(PROGRAMS, 1, lambda: 'a')
+        cache.get_or_load(PROGRAMS, 2, lambda: 'b')
+        cache.get_or_load(PROGRAMS, 1, lambda: 'a')
+        cache.get_or_load(PROGRAMS, 3, lambda: 'c')
+
+        self.assertEqual(cache.get_or_load(PROGRAMS, 1, lambda: 'reloaded'), 'a')
+        self.assertEqual(cache.get_or_load(PROGRAMS, 2, lambda: 'reloaded'), 'reloaded')
+
+
+class MetadataCacheEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        admin = User(name='Admin', email='cache-admin@uw.edu', account_type='admin', status='active')
+        db.session.add_all([instructor, admin])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30)
+        db.session.add_all([program, CourseMembers(course_id=course.id, user_id=instructor.id)])
+        db.session.commit()
+
+        self.course_id = course.id
+        self.program_id = program.id
+        self.admin_token = create_access_token(identity=str(admin.id))
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(instructor.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def test_repeated_lookups_are_served_from_cache(self):
+        self.assertEqual(get_program_name(self.program_id), 'Tutoring')
+
+        with QueryCounter() as counter:
+            self.assertEqual(get_program_name(str(self.program_id)), 'Tutoring')
+            self.assertEqual(get_program_name(self.program_id), 'Tutoring')
+        self.assertEqual(counter.count, 0)
+        self.assertEqual(get_metadata_cache().stats()['hits'], 2)
+
+    def test_program_writes_invalidate_cache(self):
+        self.assertEqual(get_program_name(self.program_id), 'Tutoring')
+        self.assertEqual(findStandardTimes(self.course_id, 'Tutoring')['times'], 'No Known Times')
+
+        response = self.client.post(f'/course/programs/times/{self.program_id}', json={
+            str(self.program_id): {'Monday': {'start_time': '13:00', 'end_time': '14:00'}}
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(findStandardTimes(self.course_id, 'Tutoring')['times'], 'Monday 1:00 PM-2:00 PM')
+
+        self.client.post('/program/details', json={'course_id': self.course_id, 'data': {
+            'id': self.program_id, 'name': 'Office Hours', 'description': None, 'duration': 30,
+            'physical_location': None, 'meeting_url': None, 'isDropins': False,
+        }})
+        self.assertEqual(get_program_name(self.program_id), 'Office Hours')
+
+        self.client.delete(f'/program/delete/{self.program_id}')
+        self.assertIsNone(get_program_name(self.program_id))
+
+    def test_course_writes_invalidate_cache(self):
+        self.assertEqual(get_course_name(self.course_id), 'CSS 101')
+
+        self.client.post('/course/details', json={'id': self.course_id, 'name': 'CSS 102'})
+        self.assertEqual(get_course_name(self.course_id), 'CSS 102')
+
+    def test_created_global_program_is_listed(self):
+        self.assertEqual(self.client.get('/instructor/programs').get_json()[-1]['id'], self.course_id)
+
+        self.client.post('/program/create', json={'name': 'Office Hours', 'course_id': None})
+
+        courses = self.client.get('/instructor/programs').get_json()
+        self.assertEqual(courses[-1]['course_name'], 'All Courses')
+
+    def test_admin_can_read_stats(self):
+        get_program_name(self.program_id)
+        get_program_name(self.program_id)
+
+        response = self.client.get('/admin/metadata-cache')
+        self.assertEqual(response.status_code, 401)
+
+        self.client.set_cookie('access_token_cookie', self.admin_token)
+        stats = self.client.get('/admin/metadata-cache').get_json()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
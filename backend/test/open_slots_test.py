@@ -0,0 +1,163 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, sign_in_admin, QueryCounter
+from api import db
+from api.models import User, Availability, CourseDetails, CourseMembers, ProgramDetails, OpenSlot
+from api.open_slots import rebuild_open_slots
+
+
+class OpenSlotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app(MAIL_BACKEND='fake')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        other = User(name='Other', email='other@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, other, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30,
+                                 auto_approve_appointments=True, max_daily_meetings=2)
+        db.session.add_all([program, CourseMembers(course_id=course.id, user_id=student.id)])
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.other_id = other.id
+        self.course_id = course.id
+        self.program_id = program.id
+        self.day = date.today() + timedelta(days=7)
+        self.instructor_token = create_access_token(identity=str(instructor.id))
+        self.student_token = create_access_token(identity=str(student.id))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def post_availability(self, program_id, days=1, isDropins=False, start_time='09:00', end_time='11:00'):
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+        response = self.client.post(f'/instructor/availability/{self.course_id}', json={
+            'availabilities': [{'id': program_id, 'date': (self.day + timedelta(days=day)).isoformat(),
+                                'start_time': start_time, 'end_time': end_time} for day in range(days)],
+            'duration': 30,
+            'physical_location': 'Room 1',
+            'meeting_url': None,
+            'isDropins': isDropins,
+            'program_id': program_id,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.client.set_cookie('access_token_cookie', self.student_token)
+
+    def available(self):
+        response = self.client.get(f'/student/appointments/available/{self.program_id}/{self.course_id}')
+        return response.get_json()['available_appointments']
+
+    def add_dropin_program(self, instructor_id, name, course_id=None):
+        program = ProgramDetails(course_id=course_id, instructor_id=instructor_id, name=name, isDropins=True)
+        db.session.add(program)
+        db.session.commit()
+        return program.id
+
+    def test_posting_lists_slots_from_read_model(self):
+        self.post_availability(self.program_id, days=2)
+        self.assertEqual(OpenSlot.query.count(), 8)
+
+        slots = self.available()
+        self.assertEqual([(slot['date'], slot['start_time']) for slot in slots[:3]],
+                         [(self.day.isoformat(), '09:00'), (self.day.isoformat(), '09:30'), (self.day.isoformat(), '10:00')])
+        self.assertIsInstance(slots[0]['appointment_id'], int)
+        self.assertEqual(slots[0]['physical_location'], 'Room 1')
+
+    def test_reserving_and_reaching_the_limit_update_the_listing(self):
+        self.post_availability(self.program_id)
+        first, second = [slot['appointment_id'] for slot in self.available()[:2]]
+
+        self.client.post(f'/student/appointments/reserve/{first}/{self.course_id}', json={})
+        self.assertNotIn(first, [slot['appointment_id'] for slot in self.available()])
+        self.assertEqual(len(self.available()), 3)
+
+        # the second booking reaches the daily limit and closes the day
+        self.client.post(f'/student/appointments/reserve/{second}/{self.course_id}', json={})
+        self.assertEqual(self.available(), [])
+
+    def test_inactive_availability_is_removed_from_listing(self):
+        self.post_availability(self.program_id)
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+        self.client.post('/instructor/availability/status', json={'availability_id': Availability.query.first().id, 'status': 'inactive'})
+        self.client.set_cookie('access_token_cookie', self.student_token)
+        self.assertEqual(self.available(), [])
+
+    def test_dropins_of_course_and_global_programs_in_one_read(self):
+        course_dropin = self.add_dropin_program(self.instructor_id, 'Lab hours', self.course_id)
+        global_dropin = self.add_dropin_program(self.instructor_id, 'Office hours')
+        other_dropin = self.add_dropin_program(self.other_id, 'Not mine')
+        # the instructor's own drop-ins must not overlap each other
+        self.post_availability(course_dropin, days=5, isDropins=True)
+        self.post_availability(global_dropin, days=5, isDropins=True, start_time='13:00', end_time='15:00')
+        self.post_availability(other_dropin, days=5, isDropins=True)
+
+        with QueryCounter() as counter:
+            response = self.client.get(f'/course/programs/dropins/{self.course_id}')
+        dropins = response.get_json()
+        self.assertEqual(len(dropins), 10)
+        self.assertEqual({dropin['name'] for dropin in dropins}, {'Lab hours', 'Office hours'})
+        self.assertLessEqual(counter.count, 5)
+
+    def test_renaming_a_program_updates_its_dropins(self):
+        program_id = self.add_dropin_program(self.instructor_id, 'Lab hours', self.course_id)
+        self.post_availability(program_id, isDropins=True)
+
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+        response = self.client.post('/program/details', json={'course_id': self.course_id, 'data': {
+            'id': program_id, 'name': 'Lab drop-ins', 'isDropins': True, 'duration': ''}})
+        self.assertEqual(response.status_code, 200)
+        self.client.set_cookie('access_token_cookie', self.student_token)
+
+        self.assertEqual([dropin['name'] for dropin in self.client.get(f'/course/programs/dropins/{self.course_id}').get_json()],
+                         ['Lab drop-ins'])
+
+    def test_admin_program_update_refreshes_its_dropins(self):
+        program_id = self.add_dropin_program(self.instructor_id, 'Lab hours', self.course_id)
+        self.post_availability(program_id, isDropins=True)
+
+        sign_in_admin(self.client)
+        response = self.client.post(f'/program/{program_id}', json={'name': 'Lab drop-ins'})
+        self.assertEqual(response.status_code, 200)
+        self.client.set_cookie('access_token_cookie', self.student_token)
+
+        self.assertEqual([dropin['name'] for dropin in self.client.get(f'/course/programs/dropins/{self.course_id}').get_json()],
+                         ['Lab drop-ins'])
+
+    def test_admin_program_delete_removes_its_dropins(self):
+        program_id = self.add_dropin_program(self.instructor_id, 'Lab hours', self.course_id)
+        self.post_availability(program_id, isDropins=True)
+
+        sign_in_admin(self.client)
+        self.assertEqual(self.client.delete(f'/program/{program_id}').status_code, 200)
+        self.client.set_cookie('access_token_cookie', self.student_token)
+
+        self.assertEqual(self.client.get(f'/course/programs/dropins/{self.course_id}').get_json(), [])
+        self.assertEqual(OpenSlot.query.filter_by(program_id=program_id).count(), 0)
+        self.assertEqual(Availability.query.count(), 0)
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.post_availability(self.program_id, days=3)
+        first = self.available()[0]['appointment_id']
+        self.client.post(f'/student/appointments/reserve/{first}/{self.course_id}', json={})
+
+        incremental = self.available()
+        rebuild_open_slots()
+        self.assertEqual(self.available(), incremental)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
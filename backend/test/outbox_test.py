@@ -0,0 +1,115 @@
+import unittest
+import sys
+import os
+from datetime import date, datetime, time, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database
+from api import db
+from api.mail import fake_sendgrid
+from api.models import User, Appointment, Availability, CourseDetails, ProgramDetails, EmailOutbox
+from api.outbox import enqueue_email, drain_outbox
+from api.reservations import reserve_appointment_slot
+from api.student import send_confirmation_email
+
+
+class EmailOutboxTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app(MAIL_BACKEND='fake', OUTBOX_BACKOFF_SECONDS=30, OUTBOX_MAX_ATTEMPTS=3)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        fake_sendgrid.clear()
+
+    def tearDown(self):
+        fake_sendgrid.clear()
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # move every queued email's next attempt into the past
+    def make_due(self):
+        EmailOutbox.query.update({EmailOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+    def test_drain_sends_queued_emails_in_batches(self):
+        for index in range(5):
+            enqueue_email(f'student{index}@uw.edu', 'Subject', '<p>Body</p>', 'BEGIN:VCALENDAR')
+        db.session.commit()
+
+        self.assertEqual(drain_outbox(batch_size=2), {'sent': 5, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(fake_sendgrid.messages), 5)
+        self.assertEqual(fake_sendgrid.messages[0]['attachments'][0]['filename'], 'Appointment.ics')
+        self.assertEqual(EmailOutbox.query.filter_by(status='sent').count(), 5)
+        self.assertEqual(drain_outbox(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_failed_send_is_retried_with_backoff(self):
+        enqueue_email('student@uw.edu', 'Subject', '<p>Body</p>')
+        db.session.commit()
+        fake_sendgrid.fail_next(2)
+
+        self.assertEqual(drain_outbox(), {'sent': 0, 'retried': 1, 'failed': 0})
+        email = EmailOutbox.query.one()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, datetime.utcnow() + timedelta(seconds=25))
+
+        # not due yet, so nothing is sent
+        self.assertEqual(drain_outbox(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+        self.make_due()
+        drain_outbox()
+        email = EmailOutbox.query.one()
+        # the second failure waits twice as long
+        self.assertGreater(email.next_attempt_at, datetime.utcnow() + timedelta(seconds=55))
+
+        self.make_due()
+        self.assertEqual(drain_outbox(), {'sent': 1, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(fake_sendgrid.messages), 1)
+
+    def test_email_fails_after_max_attempts(self):
+        enqueue_email('student@uw.edu', 'Subject', '<p>Body</p>')
+        db.session.commit()
+        fake_sendgrid.fail_next(3)
+
+        for _ in range(3):
+            self.make_due()
+            drain_outbox()
+
+        email = EmailOutbox.query.one()
+        self.assertEqual((email.status, email.attempts), ('failed', 3))
+        self.assertEqual(email.last_error, 'fake SendGrid failure')
+
+    def test_booking_queues_confirmation_in_same_transaction(self):
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30,
+                                 auto_approve_appointments=True)
+        db.session.add(program)
+        db.session.commit()
+
+        availability = Availability(user_id=instructor.id, program_id=program.id, date=date.today() + timedelta(days=7),
+                                    start_time=time(9, 0), end_time=time(10, 0), status='active')
+        db.session.add(availability)
+        db.session.flush()
+        appointment = Appointment(host_id=instructor.id, availability_id=availability.id, appointment_date=availability.date,
+                                  start_time=time(9, 0), end_time=time(9, 30), status='posted')
+        db.session.add(appointment)
+        db.session.commit()
+
+        reserve_appointment_slot(appointment.id, student.id, course.id, on_reserved=send_confirmation_email)
+
+        # queued with the booking, but nothing is sent until the worker runs
+        email = EmailOutbox.query.one()
+        self.assertEqual((email.to_email, email.status), ('instructor@uw.edu', 'pending'))
+        self.assertEqual(fake_sendgrid.messages, [])
+
+        self.assertEqual(drain_outbox()['sent'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
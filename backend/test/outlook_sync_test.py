@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, StubGraphServer
+from api import db
+from api.models import CalendarEventMirror, CalendarSyncState
+from api.calendar_sync import sync_calendar, get_mirrored_events, get_sync_window
+from api.outlook import outlook_calendar_service
+
+
+def make_event(event_id, subject, day, hour):
+    return {
+        'id': event_id,
+        'subject': subject,
+        'start': {'dateTime': f'{day}T{hour:02d}:00:00.0000000', 'timeZone': 'UTC'},
+        'end': {'dateTime': f'{day}T{hour + 1:02d}:00:00.0000000', 'timeZone': 'UTC'},
+    }
+
+
+class CalendarDeltaSyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = StubGraphServer()
+        self.app = create_test_app(GRAPH_API_ENDPOINT=self.graph.url)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        day = get_sync_window()[0].date().isoformat()
+        self.day = day
+        # initial sync: two pages, then a delta link
+        self.graph.pages['initial'] = (200, {
+            'value': [make_event('b', 'Office hours', day, 14), make_event('a', 'Lecture', day, 9)],
+            '@odata.nextLink': self.graph.page_link('2'),
+        })
+        self.graph.pages['2'] = (200, {
+            'value': [make_event('c', 'Lab', day, 11)],
+            '@odata.deltaLink': self.graph.delta_link('token-1'),
+        })
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+        self.graph.stop()
+
+    def subjects(self):
+        return [event['subject'] for event in get_mirrored_events('owner')]
+
+    def test_initial_sync_follows_pages_and_stores_delta_link(self):
+        self.assertEqual(sync_calendar('owner', 'access-token'), 3)
+        self.assertEqual(self.subjects(), ['Lecture', 'Lab', 'Office hours'])
+        self.assertEqual(db.session.get(CalendarSyncState, 'owner').delta_link, self.graph.delta_link('token-1'))
+
+        path, authorization, prefer = self.graph.requests[0]
+        self.assertTrue(path.startswith('/v1.0/me/calendarView/delta?startDateTime='))
+        self.assertEqual(authorization, 'Bearer access-token')
+        self.assertEqual(prefer, 'outlook.timezone="UTC"')
+
+    def test_incremental_sync_only_applies_changes(self):
+        sync_calendar('owner', 'access-token')
+        self.graph.pages['token-1'] = (200, {
+            'value': [
+                make_event('a', 'Lecture (moved)', self.day, 16),
+                {'id': 'c', '@removed': {'reason': 'deleted'}},
+                make_event('d', 'Review', self.day, 8),
+            ],
+            '@odata.deltaLink': self.graph.delta_link('token-2'),
+        })
+        self.graph.requests.clear()
+
+        self.assertEqual(sync_calendar('owner', 'access-token'), 3)
+        self.assertEqual([path for path, _, _ in self.graph.requests], ['/v1.0/me/calendarView/delta?$deltatoken=token-1'])
+        self.assertEqual(self.subjects(), ['Review', 'Office hours', 'Lecture (moved)'])
+        self.assertEqual(db.session.get(CalendarSyncState, 'owner').delta_link, self.graph.delta_link('token-2'))
+
+        # nothing changed since token-2
+        self.graph.pages['token-2'] = (200, {'value': [], '@odata.deltaLink': self.graph.delta_link('token-2')})
+        self.assertEqual(sync_calendar('owner', 'access-token'), 0)
+        self.assertEqual(CalendarEventMirror.query.count(), 3)
+
+    def test_expired_delta_link_triggers_full_resync(self):
+        sync_calendar('owner', 'access-token')
+        CalendarEventMirror.query.filter_by(event_id='a').delete()
+        db.session.commit()
+        self.graph.pages['token-1'] = (410, {'error': {'code': 'SyncStateNotFound'}})
+
+        self.assertEqual(sync_calendar('owner', 'access-token'), 3)
+        self.assertEqual(self.subjects(), ['Lecture', 'Lab', 'Office hours'])
+
+    def test_failed_sync_keeps_previous_mirror(self):
+        sync_calendar('owner', 'access-token')
+        self.graph.pages['token-1'] = (200, {
+            'value': [{'id': 'a', '@removed': {'reason': 'deleted'}}],
+            '@odata.nextLink': self.graph.page_link('missing'),
+        })
+
+        with self.assertRaises(Exception):
+            sync_calendar('owner', 'access-token')
+        self.assertEqual(len(self.subjects()), 3)
+        self.assertEqual(db.session.get(CalendarSyncState, 'owner').delta_link, self.graph.delta_link('token-1'))
+
+    def test_mirrors_are_kept_per_owner(self):
+        sync_calendar('owner', 'access-token')
+        self.assertEqual(get_mirrored_events('someone-else'), [])
+
+    def test_endpoint_serves_from_mirror_between_syncs(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['msal_account_id'] = 'owner'
+
+        with patch.object(outlook_calendar_service, 'get_calendar_service', return_value='access-token'):
+            response = client.get('/api/get_calendar_events')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([event['id'] for event in response.get_json()], ['a', 'c', 'b'])
+            self.assertEqual(len(self.graph.requests), 2)
+
+            # synced moments ago, so Graph is not called
+            self.assertEqual(len(client.get('/api/get_calendar_events').get_json()), 3)
+            self.assertEqual(len(self.graph.requests), 2)
+
+            self.graph.pages['token-1'] = (200, {'value': [], '@odata.deltaLink': self.graph.delta_link('token-1')})
+            client.get('/api/get_calendar_events?refresh=true')
+            self.assertEqual(len(self.graph.requests), 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
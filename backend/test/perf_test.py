@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+from datetime import date, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database
+from api import db
+from api.models import User, CourseMembers, ProgramDetails, Availability, Appointment
+from api.perf import seed_synthetic_term, run_load, get_percentile
+
+# a small term starting last week so it has past and upcoming slots
+SMALL_TERM = dict(instructors=2, courses_per_instructor=2, students=20, courses_per_student=2,
+                  programs_per_course=1, weeks=2, slots_per_day=4, booked_fraction=0.4)
+
+
+class PerfTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app(MAIL_BACKEND='fake', PERF_INSTRUMENTATION=False)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.start_date = date.today() - timedelta(days=date.today().weekday() + 7)
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # the seeded rows that matter to the endpoints, without generated ids
+    def snapshot(self):
+        return (
+            sorted((user.email, user.account_type) for user in User.query.all()),
+            CourseMembers.query.count(),
+            sorted((program.name, program.isDropins, program.auto_approve_appointments) for program in ProgramDetails.query.all()),
+            sorted((availability.date, availability.start_time, availability.end_time) for availability in Availability.query.all()),
+            sorted((appointment.appointment_date, appointment.start_time, appointment.status, appointment.attendee_id is None)
+                   for appointment in Appointment.query.all()),
+        )
+
+    def test_seed_is_deterministic(self):
+        counts = seed_synthetic_term(seed=7, start_date=self.start_date, **SMALL_TERM)
+        first = self.snapshot()
+
+        # weekdays x appointment programs x slots
+        self.assertEqual(counts['appointment'], 10 * 4 * 4)
+        self.assertEqual(counts['course_details'], 4)
+        self.assertGreater(counts['open_slot'], 0)
+
+        other = create_test_app(MAIL_BACKEND='fake', PERF_INSTRUMENTATION=False)
+        self.addCleanup(drop_test_database, other)
+        with other.app_context():
+            self.assertEqual(seed_synthetic_term(seed=7, start_date=self.start_date, **SMALL_TERM), counts)
+            self.assertEqual(self.snapshot(), first)
+
+    def test_seed_refuses_to_run_twice(self):
+        seed_synthetic_term(seed=7, start_date=self.start_date, **SMALL_TERM)
+
+        with self.assertRaises(ValueError):
+            seed_synthetic_term(seed=7, start_date=self.start_date, **SMALL_TERM)
+
+    def test_seed_command(self):
+        result = self.app.test_cli_runner().invoke(args=['perf', 'seed', '--instructors', '1', '--students', '5',
+                                                         '--weeks', '1', '--slots-per-day', '2',
+                                                         '--start-date', self.start_date.isoformat()])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('appointment: 40', result.output)
+
+    def test_load_reports_every_endpoint(self):
+        seed_synthetic_term(seed=7, start_date=self.start_date, **SMALL_TERM)
+
+        report = run_load(self.app, duration=60, concurrency=1, seed=3, max_requests=120)
+
+        self.assertEqual(report['requests'], sum(stats['requests'] for stats in report['endpoints'].values()))
+        self.assertIn('GET /course/tree', report['endpoints'])
+        self.assertIn('GET /instructor/programs', report['endpoints'])
+        for label, stats in report['endpoints'].items():
+            self.assertEqual(stats['errors'], 0, label)
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+            self.assertTrue(all(int(status) < 500 for status in stats['statuses']), label)
+
+    def test_load_without_seed_fails(self):
+        with self.assertRaises(ValueError):
+            run_load(self.app, duration=1, concurrency=1)
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(get_percentile(values, 50), 50)
+        self.assertEqual(get_percentile(values, 99), 99)
+        self.assertEqual(get_percentile([5], 95), 5)
+        self.assertIsNone(get_percentile([], 50))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
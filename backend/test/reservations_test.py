@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, sign_in_admin
+from api import db
+from api.models import User, Appointment, Availability, CourseDetails, ProgramDetails, HostBookingCounter
+from api.reservations import reserve_appointment_slot, reserve_appointment_slots, apply_status_change, \
+    get_booking_counts, ReservationError, MeetingLimitReached
+
+
+class ReservationEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.seed()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    # one instructor with two days of four slots each, limited to two meetings a day and three a week
+    def seed(self):
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30,
+                                 auto_approve_appointments=True, max_daily_meetings=2, max_weekly_meetings=3,
+                                 max_monthly_meetings=10)
+        db.session.add(program)
+        db.session.commit()
+
+        # a Monday far enough ahead that both days fall in the same week
+        monday = date.today() + timedelta(days=7 - date.today().weekday() + 7)
+        self.slots = {}
+        for day in range(2):
+            availability = Availability(user_id=instructor.id, program_id=program.id, date=monday + timedelta(days=day),
+                                        start_time=time(9, 0), end_time=time(11, 0), status='active')
+            db.session.add(availability)
+            db.session.flush()
+            self.slots[day] = []
+            for slot in range(4):
+                appointment = Appointment(host_id=instructor.id, availability_id=availability.id,
+                                          appointment_date=availability.date,
+                                          start_time=time(9 + slot // 2, 30 * (slot % 2)),
+                                          end_time=time(9 + (slot + 1) // 2, 30 * ((slot + 1) % 2)),
+                                          status='posted')
+                db.session.add(appointment)
+                db.session.flush()
+                self.slots[day].append(appointment.id)
+        db.session.commit()
+
+        self.instructor_id = instructor.id
+        self.student_id = student.id
+        self.course_id = course.id
+        self.program_id = program.id
+        self.monday = monday
+
+    def test_reserve_claims_slot_and_counts_it(self):
+        appointment = reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id, 'notes')
+        self.assertEqual(appointment.status, 'reserved')
+        self.assertEqual(appointment.attendee_id, self.student_id)
+        self.assertEqual(get_booking_counts(self.instructor_id, self.program_id, self.monday),
+                         {'daily': 1, 'weekly': 1, 'monthly': 1})
+
+    def test_reserved_slot_cannot_be_booked_twice(self):
+        reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id)
+        with self.assertRaises(ReservationError) as error:
+            reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id)
+        self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(HostBookingCounter.query.filter_by(period_kind='daily').one().count, 1)
+
+    def test_daily_limit_closes_remaining_slots_of_the_day(self):
+        reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id)
+        reserve_appointment_slot(self.slots[0][1], self.student_id, self.course_id)
+
+        statuses = [Appointment.query.get(appointment_id).status for appointment_id in self.slots[0]]
+        self.assertEqual(statuses, ['reserved', 'reserved', 'inactive', 'inactive'])
+        self.assertTrue(all(Appointment.query.get(appointment_id).status == 'posted' for appointment_id in self.slots[1]))
+
+    def test_weekly_limit_raises_when_counter_is_full(self):
+        reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id)
+        reserve_appointment_slot(self.slots[1][0], self.student_id, self.course_id)
+        reserve_appointment_slot(self.slots[1][1], self.student_id, self.course_id)
+
+        # the slot was still posted, but the week is already full
+        Appointment.query.get(self.slots[0][1]).status = 'posted'
+        db.session.commit()
+        with self.assertRaises(MeetingLimitReached) as error:
+            reserve_appointment_slot(self.slots[0][1], self.student_id, self.course_id)
+        self.assertEqual(error.exception.scope, 'weekly')
+        self.assertEqual(Appointment.query.get(self.slots[0][1]).status, 'inactive')
+        self.assertEqual(get_booking_counts(self.instructor_id, self.program_id, self.monday)['weekly'], 3)
+
+    def test_status_change_releases_counter(self):
+        appointment = reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id)
+        apply_status_change(appointment, appointment.status, 'canceled')
+        appointment.status = 'canceled'
+        db.session.commit()
+        self.assertEqual(get_booking_counts(self.instructor_id, self.program_id, self.monday),
+                         {'daily': 0, 'weekly': 0, 'monthly': 0})
+
+    def test_admin_program_delete_removes_its_counters(self):
+        reserve_appointment_slot(self.slots[0][0], self.student_id, self.course_id)
+        self.assertEqual(HostBookingCounter.query.filter_by(program_id=self.program_id).count(), 3)
+
+        client = self.app.test_client()
+        sign_in_admin(client)
+
+        self.assertEqual(client.delete(f'/program/{self.program_id}').status_code, 200)
+        self.assertEqual(HostBookingCounter.query.count(), 0)
+        self.assertIsNone(db.session.get(ProgramDetails, self.program_id))
+
+    def test_batch_books_until_a_limit_is_reached(self):
+        results = reserve_appointment_slots(self.slots[0][:3] + self.slots[1][:2], self.student_id, self.course_id,
+                                            atomic=False)
+
+        self.assertEqual([result['status'] for result in results], ['reserved', 'reserved', None, 'reserved', None])
+        self.assertEqual([result['error'].scope for result in results if result['error']], ['daily', 'weekly'])
+        self.assertEqual(get_booking_counts(self.instructor_id, self.program_id, self.monday),
+                         {'daily': 2, 'weekly': 3, 'monthly': 3})
+        # the full day and the full week are closed
+        statuses = [Appointment.query.get(appointment_id).status for appointment_id in self.slots[0] + self.slots[1]]
+        self.assertEqual(statuses, ['reserved', 'reserved', 'inactive', 'inactive', 'reserved', 'inactive', 'inactive', 'inactive'])
+
+    def test_atomic_batch_books_nothing_when_one_slot_fails(self):
+        reserve_appointment_slot(self.slots[1][3], self.student_id, self.course_id)
+
+        results = reserve_appointment_slots([self.slots[0][0], self.slots[1][3]], self.student_id, self.course_id)
+
+        self.assertEqual([result['status'] for result in results], [None, None])
+        self.assertEqual(results[0]['error'].status_code, 409)
+        self.assertEqual(results[1]['error'].message, "Appointment is not available for reservation")
+        self.assertEqual(Appointment.query.get(self.slots[0][0]).status, 'posted')
+        self.assertEqual(get_booking_counts(self.instructor_id, self.program_id, self.monday)['weekly'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import User, CourseDetails, CourseMembers, ProgramDetails, Availability, Appointment, EmailOutbox, OpenSlot
+from api.open_slots import rebuild_open_slots
+
+
+class ReserveBatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        db.session.add(CourseMembers(course_id=course.id, user_id=student.id))
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30,
+                                 auto_approve_appointments=True)
+        db.session.add(program)
+        db.session.commit()
+
+        # a term of Tuesdays with two slots each, starting next week
+        tuesday = date.today() + timedelta(days=7 - date.today().weekday() + 1)
+        self.tuesday_slots = []
+        for week in range(8):
+            availability = Availability(user_id=instructor.id, program_id=program.id, date=tuesday + timedelta(weeks=week),
+                                        start_time=time(9), end_time=time(10), status='active')
+            db.session.add(availability)
+            db.session.flush()
+            slots = [Appointment(host_id=instructor.id, availability_id=availability.id, appointment_date=availability.date,
+                                 start_time=start_time, end_time=end_time, status='posted')
+                     for start_time, end_time in ((time(9), time(9, 30)), (time(9, 30), time(10)))]
+            db.session.add_all(slots)
+            db.session.flush()
+            self.tuesday_slots.append([slot.id for slot in slots])
+        db.session.commit()
+        rebuild_open_slots()
+
+        self.course_id = course.id
+        self.program_id = program.id
+        self.client = self.app.test_client()
+        self.client.set_cookie('access_token_cookie', create_access_token(identity=str(student.id)))
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def reserve_batch(self, appointment_ids, **options):
+        return self.client.post('/student/appointments/reserve-batch',
+                                json=dict(appointment_ids=appointment_ids, course_id=self.course_id, **options))
+
+    def test_series_is_reserved_with_one_confirmation(self):
+        series = [slots[0] for slots in self.tuesday_slots]
+
+        response = self.reserve_batch(series, notes='Weekly check-in')
+
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual((body['reserved'], body['failed']), (8, 0))
+        self.assertTrue(all(Appointment.query.get(appointment_id).status == 'reserved' for appointment_id in series))
+        self.assertEqual(OpenSlot.query.filter(OpenSlot.appointment_id.in_(series)).count(), 0)
+
+        # one email for the student and one for the instructor, each with every meeting
+        emails = {email.to_email: email for email in EmailOutbox.query.all()}
+        self.assertEqual(set(emails), {'student@uw.edu', 'instructor@uw.edu'})
+        self.assertEqual(emails['student@uw.edu'].ics_data.count('BEGIN:VEVENT'), 8)
+        self.assertEqual(emails['student@uw.edu'].subject, '8 appointments confirmed')
+
+    def test_statement_count_is_below_single_reservations(self):
+        with QueryCounter() as single:
+            for slots in self.tuesday_slots[:4]:
+                response = self.client.post(f'/student/appointments/reserve/{slots[0]}/{self.course_id}', json={})
+                self.assertEqual(response.status_code, 201)
+
+        with QueryCounter() as batch:
+            response = self.reserve_batch([slots[0] for slots in self.tuesday_slots[4:]])
+        self.assertEqual(response.status_code, 201)
+
+        self.assertLess(batch.count, single.count / 2)
+
+    def test_partial_batch_reports_each_slot(self):
+        first, second = self.tuesday_slots[0]
+        self.client.post(f'/student/appointments/reserve/{first}/{self.course_id}', json={})
+
+        response = self.reserve_batch([first, second, 999, 'not-a-slot'], atomic=False)
+
+        self.assertEqual(response.status_code, 201)
+        results = response.get_json()['results']
+        self.assertEqual([result['status'] for result in results], ['failed', 'reserved', 'failed', 'failed'])
+        self.assertEqual(results[0]['error'], "Appointment is not available for reservation")
+        self.assertIsNone(results[1]['error'])
+
+    def test_atomic_batch_fails_as_a_whole(self):
+        program = ProgramDetails.query.get(self.program_id)
+        program.max_daily_meetings = 1
+        db.session.commit()
+
+        response = self.reserve_batch([self.tuesday_slots[1][0], self.tuesday_slots[0][0], self.tuesday_slots[0][1]])
+
+        self.assertEqual(response.status_code, 409)
+        results = response.get_json()['results']
+        self.assertEqual([result['status'] for result in results], ['failed'] * 3)
+        self.assertEqual(results[2]['error'], "Meeting limit reached")
+        self.assertEqual(Appointment.query.filter_by(status='reserved').count(), 0)
+        self.assertEqual(EmailOutbox.query.count(), 0)
+
+    def test_invalid_request_is_rejected(self):
+        self.assertEqual(self.reserve_batch([]).status_code, 400)
+        self.assertEqual(self.reserve_batch([[1]]).status_code, 400)
+        self.assertEqual(self.reserve_batch(list(range(101))).status_code, 400)
+        # "false" is not a boolean, so it must not be read as an atomic batch
+        self.assertEqual(self.reserve_batch([1], atomic='false').status_code, 400)
+        self.assertEqual(Appointment.query.filter_by(status='reserved').count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
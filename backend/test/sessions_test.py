@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from flask import session
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database
+from api import db
+from api.models import ServerSession
+from api.sessions import LRUSessionStore
+
+
+# routes that read and write flask.session like the Outlook blueprint does
+def add_session_routes(app):
+    @app.route('/test/session/<value>', methods=['POST'])
+    def write_session(value):
+        session['token_cache'] = value
+        return 'ok'
+
+    @app.route('/test/session', methods=['GET'])
+    def read_session():
+        return session.get('token_cache', '')
+
+    @app.route('/test/session', methods=['DELETE'])
+    def clear_session():
+        session.clear()
+        return 'ok'
+
+
+class SessionStoreMixin:
+    backend = None
+
+    def setUp(self):
+        self.app = create_test_app(SESSION_BACKEND=self.backend, SESSION_GC_EVERY_N_REQUESTS=None)
+        add_session_routes(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def test_session_round_trip(self):
+        self.client.post('/test/session/cache-1')
+        self.assertEqual(self.client.get('/test/session').get_data(as_text=True), 'cache-1')
+
+        # the cookie only carries the signed session id
+        cookie = self.client.get_cookie('session').value
+        self.assertNotIn('cache-1', cookie)
+
+        # another client does not see it
+        self.assertEqual(self.app.test_client().get('/test/session').get_data(as_text=True), '')
+
+    def test_tampered_cookie_starts_new_session(self):
+        self.client.post('/test/session/cache-1')
+        self.client.set_cookie('session', self.client.get_cookie('session').value + 'x')
+        self.assertEqual(self.client.get('/test/session').get_data(as_text=True), '')
+
+    def test_cleared_session_is_deleted(self):
+        self.client.post('/test/session/cache-1')
+        self.client.delete('/test/session')
+        self.assertEqual(self.client.get('/test/session').get_data(as_text=True), '')
+
+    def test_expired_sessions_are_collected(self):
+        self.client.post('/test/session/cache-1')
+        store = self.app.session_interface.store
+        sid = self.app.session_interface.get_signer(self.app).unsign(self.client.get_cookie('session').value).decode()
+        store.set(sid, store.get(sid), datetime.utcnow() - timedelta(seconds=1))
+
+        self.assertEqual(store.delete_expired(), 1)
+        self.assertEqual(self.client.get('/test/session').get_data(as_text=True), '')
+
+
+class SQLAlchemySessionStoreTestCase(SessionStoreMixin, unittest.TestCase):
+    backend = 'sqlalchemy'
+
+    def test_session_is_stored_in_table(self):
+        self.client.post('/test/session/cache-1')
+        self.assertEqual(ServerSession.query.count(), 1)
+        self.client.delete('/test/session')
+        self.assertEqual(ServerSession.query.count(), 0)
+
+
+class MemorySessionStoreTestCase(SessionStoreMixin, unittest.TestCase):
+    backend = 'memory'
+
+
+class LRUSessionStoreTestCase(unittest.TestCase):
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = LRUSessionStore(max_entries=2)
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        store.set('a', 'data-a', expires_at)
+        store.set('b', 'data-b', expires_at)
+
+        # reading 'a' makes 'b' the least recently used
+        self.assertEqual(store.get('a'), 'data-a')
+        store.set('c', 'data-c', expires_at)
+
+        self.assertIsNone(store.get('b'))
+        self.assertEqual((store.get('a'), store.get('c')), ('data-a', 'data-c'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
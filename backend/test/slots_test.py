@@ -0,0 +1,113 @@
+import unittest
+import sys
+import os
+from datetime import date, timedelta
+from flask_jwt_extended import create_access_token
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from test.helpers import create_test_app, drop_test_database
+from api import db
+from api.models import User, Appointment, Availability, CourseDetails, CourseMembers, ProgramDetails
+
+
+class VirtualSlotsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app(VIRTUAL_APPOINTMENT_SLOTS=True, MAIL_BACKEND='fake')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+        instructor = User(name='Instructor', email='instructor@uw.edu', account_type='instructor', status='active')
+        student = User(name='Student', email='student@uw.edu', account_type='student', status='active')
+        db.session.add_all([instructor, student])
+        db.session.commit()
+        course = CourseDetails(instructor_id=instructor.id, name='CSS 101')
+        db.session.add(course)
+        db.session.commit()
+        program = ProgramDetails(course_id=course.id, instructor_id=instructor.id, name='Tutoring', duration=30,
+                                 auto_approve_appointments=True)
+        db.session.add_all([program, CourseMembers(course_id=course.id, user_id=student.id)])
+        db.session.commit()
+
+        self.course_id = course.id
+        self.program_id = program.id
+        self.day = date.today() + timedelta(days=7)
+        self.instructor_token = create_access_token(identity=str(instructor.id))
+        self.student_token = create_access_token(identity=str(student.id))
+        self.client = self.app.test_client()
+
+        # two hours of 30 minute slots
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+        self.post_response = self.client.post(f'/instructor/availability/{self.course_id}', json={
+            'availabilities': [{'id': self.program_id, 'date': self.day.isoformat(), 'start_time': '09:00', 'end_time': '11:00'}],
+            'duration': 30,
+            'physical_location': 'Room 1',
+            'meeting_url': None,
+            'isDropins': False,
+            'program_id': self.program_id,
+        })
+        self.client.set_cookie('access_token_cookie', self.student_token)
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def available(self):
+        response = self.client.get(f'/student/appointments/available/{self.program_id}/{self.course_id}')
+        return response.get_json()['available_appointments']
+
+    def reserve(self, appointment_id):
+        return self.client.post(f'/student/appointments/reserve/{appointment_id}/{self.course_id}', json={'notes': 'hi'})
+
+    def test_posting_stores_no_slots(self):
+        self.assertEqual(self.post_response.get_json()['appointments_added'], 0)
+        self.assertEqual(Availability.query.count(), 1)
+        self.assertEqual(Appointment.query.count(), 0)
+
+    def test_slots_are_listed_from_availability(self):
+        slots = self.available()
+        self.assertEqual([slot['start_time'] for slot in slots], ['09:00', '09:30', '10:00', '10:30'])
+        availability_id = Availability.query.one().id
+        self.assertEqual(slots[1]['appointment_id'], f'v-{availability_id}-0930')
+        self.assertEqual(slots[1]['end_time'], '10:00')
+        self.assertEqual(slots[1]['physical_location'], 'Room 1')
+
+    def test_reserving_materializes_only_that_slot(self):
+        slot_id = self.available()[1]['appointment_id']
+        response = self.reserve(slot_id)
+        self.assertEqual(response.status_code, 201)
+
+        appointment = Appointment.query.one()
+        self.assertEqual((appointment.status, appointment.start_time.strftime('%H:%M')), ('reserved', '09:30'))
+        self.assertEqual(appointment.physical_location, 'Room 1')
+        self.assertEqual([slot['start_time'] for slot in self.available()], ['09:00', '10:00', '10:30'])
+
+        # the same virtual slot cannot be booked again
+        self.assertEqual(self.reserve(slot_id).status_code, 400)
+        self.assertEqual(Appointment.query.count(), 1)
+
+    def test_student_cancel_returns_slot_to_listing(self):
+        slot_id = self.available()[0]['appointment_id']
+        self.reserve(slot_id)
+        appointment_id = Appointment.query.one().id
+
+        self.client.post(f'/student/appointments/cancel/{appointment_id}')
+        self.assertEqual(Appointment.query.count(), 0)
+        self.assertEqual(len(self.available()), 4)
+
+    def test_unknown_virtual_slot_is_rejected(self):
+        availability_id = Availability.query.one().id
+        self.assertEqual(self.reserve(f'v-{availability_id}-0915').status_code, 400)
+        self.assertEqual(self.reserve('v-999-0900').status_code, 400)
+        self.assertEqual(Appointment.query.count(), 0)
+
+    def test_inactive_availability_has_no_slots(self):
+        self.client.set_cookie('access_token_cookie', self.instructor_token)
+        response = self.client.post('/instructor/availability/status', json={'availability_id': Availability.query.one().id,
+                                                                            'status': 'inactive'})
+        self.assertEqual(response.status_code, 200)
+        self.client.set_cookie('access_token_cookie', self.student_token)
+        self.assertEqual(self.available(), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from msal import SerializableTokenCache
+from test.helpers import create_test_app, drop_test_database, QueryCounter
+from api import db
+from api.models import MsalTokenCache
+from api.token_cache import MsalTokenStore
+
+
+# stands in for ConfidentialClientApplication, which would call Microsoft
+class FakeClientApp:
+    def __init__(self, test, cache):
+        self.test = test
+        self.cache = cache
+
+    def get_accounts(self):
+        return [{'home_account_id': account_id} for account_id in self.test.accounts]
+
+    def acquire_token_silent(self, scopes, account=None):
+        self.test.silent_calls += 1
+        if self.test.refresh:
+            # a refresh changes the cache contents
+            self.cache.has_state_changed = True
+        if self.test.error:
+            return {'error': self.test.error, 'error_description': 'AADSTS70000: the grant is expired'}
+        return {'access_token': f'token-{self.test.silent_calls}', 'expires_in': self.test.expires_in}
+
+
+class MsalTokenStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_test_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.accounts = ['account-a', 'account-b', 'account-c']
+        self.silent_calls = 0
+        self.built_apps = 0
+        self.refresh = True
+        self.expires_in = 3600
+        self.error = None
+        self.store = MsalTokenStore(self.build_client_app, max_entries=2)
+
+    def tearDown(self):
+        self.ctx.pop()
+        drop_test_database(self.app)
+
+    def build_client_app(self, cache=None):
+        self.built_apps += 1
+        return FakeClientApp(self, cache)
+
+    def test_valid_token_is_served_from_memory(self):
+        self.assertEqual(self.store.acquire_token('account-a', ['User.Read'])['access_token'], 'token-1')
+
+        with QueryCounter() as counter:
+            token = self.store.acquire_token('account-a', ['User.Read'])
+        self.assertEqual((token['access_token'], self.silent_calls, counter.count), ('token-1', 1, 0))
+
+    def test_cache_is_written_only_when_changed(self):
+        self.store.acquire_token('account-a', ['User.Read'])
+        self.assertEqual(MsalTokenCache.query.count(), 1)
+
+        # expiring token, but MSAL served it from the cache without changing it
+        self.store.get_entry('account-a').expires_at = 0
+        self.refresh = False
+        with QueryCounter() as counter:
+            self.assertEqual(self.store.acquire_token('account-a', ['User.Read'])['access_token'], 'token-2')
+        self.assertEqual(counter.count, 0)
+
+    def test_least_recently_used_account_is_evicted_and_reloaded(self):
+        for account_id in self.accounts:
+            self.store.acquire_token(account_id, ['User.Read'])
+        self.assertEqual(list(self.store.entries), ['account-b', 'account-c'])
+        self.assertEqual(MsalTokenCache.query.count(), 3)
+
+        built_apps = self.built_apps
+        self.store.acquire_token('account-a', ['User.Read'])
+        self.assertEqual(self.built_apps, built_apps + 1)
+        self.assertEqual(list(self.store.entries), ['account-c', 'account-a'])
+
+    def test_unknown_account_gets_no_token(self):
+        self.assertIsNone(self.store.acquire_token('someone-else', ['User.Read']))
+        self.assertEqual(self.silent_calls, 0)
+
+    def test_refresh_error_asks_to_sign_in_again(self):
+        self.store.acquire_token('account-a', ['User.Read'])
+
+        # the token is about to expire and the refresh token was revoked
+        self.store.get_entry('account-a').expires_at = time.time() + 60
+        self.error = 'invalid_grant'
+        self.assertIsNone(self.store.acquire_token('account-a', ['User.Read']))
+
+        entry = self.store.get_entry('account-a')
+        self.assertEqual((entry.token, entry.expires_at), (None, 0))
+        self.assertIsNone(self.store.acquire_token('account-a', ['User.Read']))
+
+    def test_sign_in_and_sign_out(self):
+        cache = SerializableTokenCache()
+        self.store.add_account('account-a', cache)
+        self.assertEqual(db.session.get(MsalTokenCache, 'account-a').cache_data, cache.serialize())
+
+        # a new process loads the account from the database
+        other_store = MsalTokenStore(self.build_client_app)
+        self.assertEqual(other_store.acquire_token('account-a', ['User.Read'])['access_token'], 'token-1')
+
+        self.store.remove_account('account-a')
+        db.session.expire_all()
+        self.assertIsNone(db.session.get(MsalTokenCache, 'account-a'))
+        self.assertNotIn('account-a', self.store.entries)
+
+    def test_sign_in_again_replaces_the_cached_entry(self):
+        self.store.add_account('account-a', SerializableTokenCache())
+        self.assertEqual(self.store.acquire_token('account-a', ['User.Read'])['access_token'], 'token-1')
+
+        fresh = SerializableTokenCache()
+        self.store.add_account('account-a', fresh)
+
+        entry = self.store.get_entry('account-a')
+        self.assertIs(entry.cache, fresh)
+        self.assertIsNone(entry.token)
+        self.assertEqual(self.store.acquire_token('account-a', ['User.Read'])['access_token'], 'token-2')
+        self.assertEqual(db.session.get(MsalTokenCache, 'account-a').cache_data, fresh.serialize())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
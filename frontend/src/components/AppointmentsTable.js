@@ -320,19 +320,7 @@ export default function AppointmentsTable({ courseId, reloadTable }) {
           setActiveTab("upcoming");
           setSelectedAppointment(null); // Deselect the appointment as it is now cancelled
           fetchAppointments(); // Re-fetch appointments to update the list
-          
-          // delete appointment from Outlook Calendar
-          const eventID = selectedAppointment.event_id;
-          console.log('Deleting Event ID:', eventID);
-          
-          await fetch(`http://localhost:5000/api/delete_event/${eventID}`,{
-            method: "DELETE",
-            credentials: "include",
-            headers: {
-            "Content-Type": "application/json",
-          },
-          });
-          
+          // the Outlook event is deleted by the server
         } else {
           throw new Error("Failed to cancel the appointment");
         }
@@ -373,8 +361,6 @@ export default function AppointmentsTable({ courseId, reloadTable }) {
       // Handle the response (e.g., show a success message or update the UI)
       alert(updatedAppointment.message || 'Appointment updated successfully!');
       
-      const eventID = selectedAppointment.event_id;
-      
       setIsEditMode(false); // Exit edit mode
   
       console.log("UpdatedAppointment:", updatedAppointment);
@@ -383,24 +369,8 @@ export default function AppointmentsTable({ courseId, reloadTable }) {
         ...prev,
         ...updatedAppointment,
       }));
-      
-      // Update event in Outlook calendar
-      const outlookResponse = await fetch(`http://localhost:5000/api/update_event/${eventID}`, {
-        method: "PATCH",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify(formData),
-        credentials: "include",
-      });
-      
-      if (outlookResponse.ok) {
-        console.log('Event updated in Outlook calendar successfully.');
-      } else {
-        const outlookError = await outlookResponse.json();
-        console.error('Failed to update event in Outlook calendar:', outlookError);
-      }
 
+      // the Outlook event is updated by the server
     } else {
       // Handle errors from the backend
       const error = await response.json();
@@ -223,37 +223,10 @@ const ScheduleAppointmentPopup = ({ onClose, functions }) => {
           if (data) {
             setAppointmentStatus(data.status);
             setBookingConfirmed(true);
-            
-            console.log("Appointment Data:", appointmentData);
-
-            return fetch('http://localhost:5000/api/create_event', {
-              method: 'POST',
-              credentials: 'include',
-              headers: {
-                'Content-Type': 'application/json',
-                "X-CSRF-TOKEN": csrfToken,
-              },
-              body: JSON.stringify(appointmentData),
-              });
-          }
-        })
-        .then((response) => response.json())
-        .then((data) =>{
-          const eventId = data.event_id;
-          return fetch(`/student/appointments/update_event_id/${encodeURIComponent(appointmentID)}`, {
-            method: 'POST',
-            credentials: 'include',
-            headers: {
-              'Content-Type': 'application/json',
-              "X-CSRF-TOKEN": csrfToken,
-            },
-            body: JSON.stringify({ event_id: eventId }),
-          });
-        })
-        .then((response) => response.json())
-        .then((data) => {
-          // reload page
+
+            // the Outlook event is created by the server after the booking
             functions.reloadAppointments();
+          }
         })
         .catch((error) => {
           if (!isHandledError) {